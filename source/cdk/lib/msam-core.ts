@@ -212,6 +212,24 @@ export class MsamCore extends NestedStack {
         processSsmRunCommand.description = 'MSAM Lambda for processing outputs from running a command on a managed instance';
         this.applyCommonLambdaProperties(processSsmRunCommand, props.CoreIAMRole);
 
+        // RefreshNodeConnections
+        const refreshNodeConnections = coreStack.getResource('RefreshNodeConnections') as sam.CfnFunction;
+        refreshNodeConnections.environment = {
+            variables: {
+                ...(refreshNodeConnections.environment as sam.CfnFunction.FunctionEnvironmentProperty).variables,
+                ALARMS_TABLE_NAME: props.AlarmsTableName,
+                CACHE_ITEM_TTL: props.CacheItemTTL,
+                CHANNELS_TABLE_NAME: props.ChannelsTableName,
+                CONTENT_TABLE_NAME: props.ContentTableName,
+                EVENTS_TABLE_NAME: props.EventsTableName,
+                LAYOUT_TABLE_NAME: props.LayoutTableName,
+                SETTINGS_TABLE_NAME: props.SettingsTableName,
+                CLOUDWATCH_EVENTS_TABLE_NAME: props.CloudWatchEventsTableName,
+            },
+        };
+        refreshNodeConnections.description = 'MSAM Lambda for updating the connections of a node changed by a media service API call';
+        this.applyCommonLambdaProperties(refreshNodeConnections, props.CoreIAMRole);
+
         // UpdateSsmNodes
         const updateSsmNodes = coreStack.getResource('UpdateSsmNodes') as sam.CfnFunction;
         updateSsmNodes.environment = {
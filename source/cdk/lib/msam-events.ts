@@ -157,6 +157,7 @@ export class MsamEvents extends NestedStack {
                 BUILD_STAMP: 'DEV_0_0_0',
                 EVENTS_TABLE_REGION: props.EventsTableRegion,
                 ALARMS_TABLE_NAME: props.AlarmsTableName,
+                CONTENT_TABLE_NAME: props.ContentTableName,
                 SOLUTION_ID: Fn.findInMap('SolutionId', 'UserAgent', 'Extra'),
             },
         });
@@ -71,11 +71,18 @@ export class MsamIamRoles extends NestedStack {
                             effect: iam.Effect.ALLOW,
                             actions: [
                                 'cloudwatch:DescribeAlarms',
+                                'dynamodb:DeleteItem',
                                 'dynamodb:PutItem',
                                 'dynamodb:Query',
                                 'dynamodb:UpdateItem',
+                                'events:PutEvents',
+                                'mediaconnect:Describe*',
+                                'mediaconnect:List*',
                                 'mediapackage:Describe*',
-                                'medialive:Describe*'
+                                'medialive:Describe*',
+                                'mediastore:Describe*',
+                                'mediastore:List*',
+                                'mediatailor:Get*'
                             ],
                             resources: ['*'],
                         }),
@@ -168,11 +175,15 @@ export class MsamIamRoles extends NestedStack {
                                 'cloudwatch:ListMetrics',
                                 'cloudwatch:ListMetrics',
                                 'cloudwatch:PutMetricData',
+                                'config:SelectAggregateResourceConfig',
+                                'dynamodb:BatchGetItem',
+                                'dynamodb:BatchWriteItem',
                                 'dynamodb:DeleteItem',
                                 'dynamodb:GetItem',
                                 'dynamodb:PutItem',
                                 'dynamodb:Query',
                                 'dynamodb:Scan',
+                                'dynamodb:UpdateItem',
                                 'ec2:DescribeSecurityGroups',
                                 'ec2:DescribeSubnets',
                                 'ec2:DescribeVpcs',
@@ -191,6 +202,7 @@ export class MsamIamRoles extends NestedStack {
                                 'sns:ListSubscriptions',
                                 'sns:ListSubscriptionsByTopic',
                                 'sns:ListTopics',
+                                'tag:GetResources',
                                 'waf:GetWebACL',
                                 'waf:ListWebACLs',
                                 'ec2:Describe*',
@@ -22,6 +22,10 @@ ALARMS_TABLE_NAME = os.environ["ALARMS_TABLE_NAME"]
 TABLE_REGION = os.environ["EVENTS_TABLE_REGION"]
 DYNAMO_RESOURCE = boto3.resource('dynamodb', region_name=TABLE_REGION, config=MSAM_BOTO3_CONFIG)
 ALARMS_TABLE = DYNAMO_RESOURCE.Table(ALARMS_TABLE_NAME)
+CONTENT_TABLE = DYNAMO_RESOURCE.Table(os.environ["CONTENT_TABLE_NAME"])
+
+# content table item counting alarm and alert state changes, the API recomputes its health rollup when it changes
+HEALTH_VERSION_ARN = "msam-health-version"
 
 def lambda_handler(event, _):
     """
@@ -41,15 +45,21 @@ def lambda_handler(event, _):
         state_updated = int(alarm.state_updated_timestamp.timestamp())
 
         subscribers = subscribers_to_alarm(region_alarm_name)
+        changed = False
         for resource_arn in subscribers:
             # only update alarm if it's already in alarm DB through node subscription
-            ALARMS_TABLE.update_item(
+            response = ALARMS_TABLE.update_item(
                 UpdateExpression='SET StateValue = :state, Updated = :updated, StateUpdated = :stateupdated',
                 ConditionExpression=Attr('RegionAlarmName').eq(region_alarm_name),
                 Key={'RegionAlarmName': region_alarm_name, 'ResourceArn': resource_arn},
-                ExpressionAttributeValues={':state': state, ':updated': updated_timestamp, ':stateupdated': state_updated}
+                ExpressionAttributeValues={':state': state, ':updated': updated_timestamp, ':stateupdated': state_updated},
+                ReturnValues='UPDATED_OLD'
             )
+            changed = changed or response.get("Attributes", {}).get("StateValue") != state
             print(f"{resource_arn} updated via CloudWatch alarm change state event")
+        # the health rollup only changes with an alarm state
+        if changed:
+            invalidate_health()
     except ClientError as error:
         if error.response['Error']['Code']=='ConditionalCheckFailedException':
             print(f"No update made. Alarm key {region_alarm_name} does not exist in database.")
@@ -57,6 +67,14 @@ def lambda_handler(event, _):
     return True
 
 
+def invalidate_health():
+    """
+    Increment the alarm and alert state change counter read by the API health rollup.
+    """
+    CONTENT_TABLE.update_item(Key={"arn": HEALTH_VERSION_ARN}, UpdateExpression="ADD version :one",
+                              ExpressionAttributeValues={":one": 1})
+
+
 def subscribers_to_alarm(region_alarm_name):
     """
     Returns subscribed nodes of a CloudWatch alarm in a region.
@@ -10,9 +10,11 @@ import datetime
 import os
 import json
 import secrets
+import time
 from urllib.parse import unquote
 
 import boto3
+from boto3.dynamodb.conditions import Attr, Key
 from botocore.exceptions import ClientError
 from botocore.config import Config
 from jsonpath_ng import parse
@@ -27,6 +29,64 @@ DYNAMO_RESOURCE = boto3.resource('dynamodb', region_name=DYNAMO_REGION_NAME, con
 EVENTS_TABLE = DYNAMO_RESOURCE.Table(os.environ["EVENTS_TABLE_NAME"])
 CLOUDWATCH_EVENTS_TABLE = DYNAMO_RESOURCE.Table(os.environ["CLOUDWATCH_EVENTS_TABLE_NAME"])
 CONTENT_TABLE_NAME = os.environ["CONTENT_TABLE_NAME"]
+CONTENT_TABLE = DYNAMO_RESOURCE.Table(CONTENT_TABLE_NAME)
+
+# content table item counting alarm and alert state changes, the API recomputes its health rollup when it changes
+HEALTH_VERSION_ARN = "msam-health-version"
+
+# CloudTrail API calls that create, change or delete a cached node
+NODE_CHANGE_EVENTS = {
+    "aws.medialive": {
+        "CreateChannel": "medialive-channel",
+        "UpdateChannel": "medialive-channel",
+        "UpdateChannelClass": "medialive-channel",
+        "StartChannel": "medialive-channel",
+        "StopChannel": "medialive-channel",
+        "DeleteChannel": "medialive-channel",
+        "CreateInput": "medialive-input",
+        "UpdateInput": "medialive-input",
+        "DeleteInput": "medialive-input",
+        "CreateMultiplex": "medialive-multiplex",
+        "UpdateMultiplex": "medialive-multiplex",
+        "StartMultiplex": "medialive-multiplex",
+        "StopMultiplex": "medialive-multiplex",
+        "DeleteMultiplex": "medialive-multiplex"
+    },
+    "aws.mediapackage": {
+        "CreateChannel": "mediapackage-channel",
+        "UpdateChannel": "mediapackage-channel",
+        "DeleteChannel": "mediapackage-channel",
+        "CreateOriginEndpoint": "mediapackage-origin-endpoint",
+        "UpdateOriginEndpoint": "mediapackage-origin-endpoint",
+        "DeleteOriginEndpoint": "mediapackage-origin-endpoint"
+    },
+    "aws.mediaconnect": {
+        "CreateFlow": "mediaconnect-flow",
+        "UpdateFlow": "mediaconnect-flow",
+        "StartFlow": "mediaconnect-flow",
+        "StopFlow": "mediaconnect-flow",
+        "AddFlowOutputs": "mediaconnect-flow",
+        "RemoveFlowOutput": "mediaconnect-flow",
+        "UpdateFlowOutput": "mediaconnect-flow",
+        "AddFlowSources": "mediaconnect-flow",
+        "RemoveFlowSource": "mediaconnect-flow",
+        "UpdateFlowSource": "mediaconnect-flow",
+        "DeleteFlow": "mediaconnect-flow"
+    },
+    "aws.mediastore": {
+        "CreateContainer": "mediastore-container",
+        "DeleteContainer": "mediastore-container"
+    },
+    "aws.mediatailor": {
+        "PutPlaybackConfiguration": "mediatailor-configuration",
+        "DeletePlaybackConfiguration": "mediatailor-configuration"
+    }
+}
+
+# the API updates a changed node's connections when it receives this event in the table region
+NODE_CHANGE_SOURCE = "msam.events"
+NODE_CHANGE_DETAIL_TYPE = "MSAM Node Change"
+EVENTS_CLIENT = boto3.client('events', region_name=DYNAMO_REGION_NAME, config=MSAM_BOTO3_CONFIG)
 
 def find_media_services_arn(event):
     """
@@ -65,8 +125,18 @@ def handle_alerts(event):
             event["detail"]["message"] = event["detail"]["error-message"]
             del event["detail"]["error-message"]
         #print(event)
-        EVENTS_TABLE.put_item(Item=event)
+        response = EVENTS_TABLE.put_item(Item=event, ReturnValues="ALL_OLD")
         print(event["detail-type"] + " stored.")
+        # the health rollup only changes when an alert is set or cleared
+        if response.get("Attributes", {}).get("alarm_state") != event.get("alarm_state"):
+            invalidate_health()
+
+def invalidate_health():
+    """
+    Increment the alarm and alert state change counter read by the API health rollup.
+    """
+    CONTENT_TABLE.update_item(Key={"arn": HEALTH_VERSION_ARN}, UpdateExpression="ADD version :one",
+                              ExpressionAttributeValues={":one": 1})
 
 def handle_medialive_event(event):
     """
@@ -105,6 +175,179 @@ def handle_mediastore_event(event):
     temp_arn = event["resource_arn"].split('/')
     event["resource_arn"] = temp_arn[0] + "/" + temp_arn[1]
 
+def detail_value(event, section, *path):
+    """
+    Return a nested value from the request parameters or response elements of a CloudTrail event.
+    """
+    value = event["detail"].get(section)
+    for key in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+def arn_prefix(event, service_name):
+    """
+    Return the start of an ARN for a service in the event's region and account.
+    """
+    partition = boto3.session.Session().get_partition_for_region(event["region"])
+    return f"arn:{partition}:{service_name}:{event['region']}:{event['account']}"
+
+def medialive_node(event, node_type, client):
+    """
+    Describe the MediaLive channel, input or multiplex named in an API call event.
+    """
+    resource = node_type.split("-")[1]
+    resource_id = detail_value(event, "requestParameters", resource + "Id") or \
+        detail_value(event, "responseElements", resource, "id")
+    if not resource_id:
+        return None, None
+    arn = f"{arn_prefix(event, 'medialive')}:{resource}:{resource_id}"
+    if client is None:
+        return arn, None
+    if resource == "channel":
+        config = client.describe_channel(ChannelId=resource_id)
+    elif resource == "input":
+        config = client.describe_input(InputId=resource_id)
+    else:
+        config = client.describe_multiplex(MultiplexId=resource_id)
+    del config["ResponseMetadata"]
+    return arn, config
+
+def cached_arn_by_id(node_type, region, resource_id):
+    """
+    Find the ARN of a cached node by its Id for services with ARNs that do not contain the Id.
+    """
+    query_args = {
+        "IndexName": "ServiceRegionIndex",
+        "KeyConditionExpression": Key("service").eq(node_type) & Key("region").eq(region),
+        # the cached configuration is a JSON string, only items containing the Id are returned
+        "FilterExpression": Attr("data").contains(json.dumps({"Id": resource_id})[1:-1])
+    }
+    response = CONTENT_TABLE.query(**query_args)
+    while True:
+        for item in response["Items"]:
+            # nested configuration can also have an Id key
+            if json.loads(item["data"]).get("Id") == resource_id:
+                return item["arn"]
+        if "LastEvaluatedKey" not in response:
+            return None
+        response = CONTENT_TABLE.query(ExclusiveStartKey=response["LastEvaluatedKey"], **query_args)
+
+def mediapackage_node(event, node_type, client):
+    """
+    Describe the MediaPackage channel or origin endpoint named in an API call event.
+    """
+    resource_id = detail_value(event, "requestParameters", "id")
+    if not resource_id:
+        return None, None
+    if client is None:
+        return cached_arn_by_id(node_type, event["region"], resource_id), None
+    if node_type == "mediapackage-channel":
+        config = client.describe_channel(Id=resource_id)
+    else:
+        config = client.describe_origin_endpoint(Id=resource_id)
+    del config["ResponseMetadata"]
+    parse('$..Password').update(config, "XXXXXXXXXXXX")
+    return config["Arn"], config
+
+def mediaconnect_node(event, _, client):
+    """
+    Describe the MediaConnect flow named in an API call event.
+    """
+    arn = detail_value(event, "requestParameters", "flowArn") or \
+        detail_value(event, "responseElements", "flow", "flowArn")
+    if not arn or client is None:
+        return arn, None
+    config = client.describe_flow(FlowArn=arn)["Flow"]
+    if "VpcInterfaces" in config:
+        config["VpcSubnet"] = {}
+        for interface in config["VpcInterfaces"]:
+            config["VpcSubnet"][interface["Name"]] = interface["SubnetId"]
+    config["Tags"] = client.list_tags_for_resource(ResourceArn=arn)["Tags"]
+    return arn, config
+
+def mediastore_node(event, _, client):
+    """
+    Describe the MediaStore container named in an API call event.
+    """
+    name = detail_value(event, "requestParameters", "containerName")
+    if not name:
+        return None, None
+    arn = f"{arn_prefix(event, 'mediastore')}:container/{name}"
+    if client is None:
+        return arn, None
+    config = client.describe_container(ContainerName=name)["Container"]
+    config["Tags"] = client.list_tags_for_resource(Resource=arn)["Tags"]
+    config["CreationTime"] = str(config["CreationTime"])
+    return arn, config
+
+def mediatailor_node(event, _, client):
+    """
+    Describe the MediaTailor playback configuration named in an API call event.
+    """
+    name = detail_value(event, "requestParameters", "name") or \
+        detail_value(event, "requestParameters", "Name")
+    if not name:
+        return None, None
+    arn = f"{arn_prefix(event, 'mediatailor')}:playbackConfiguration/{name}"
+    if client is None:
+        return arn, None
+    config = client.get_playback_configuration(Name=name)
+    del config["ResponseMetadata"]
+    return arn, config
+
+# each returns the node ARN and configuration, or only the ARN when called without a client
+NODE_DESCRIBERS = {
+    "aws.medialive": medialive_node,
+    "aws.mediapackage": mediapackage_node,
+    "aws.mediaconnect": mediaconnect_node,
+    "aws.mediastore": mediastore_node,
+    "aws.mediatailor": mediatailor_node
+}
+
+def notify_node_change(arn, node_type, deleted=False):
+    """
+    Ask the API to update the cached connections of a changed or deleted node.
+    """
+    EVENTS_CLIENT.put_events(Entries=[{
+        "Source": NODE_CHANGE_SOURCE,
+        "DetailType": NODE_CHANGE_DETAIL_TYPE,
+        "Detail": json.dumps({"arn": arn, "service": node_type, "deleted": deleted})
+    }])
+
+def refresh_node(event):
+    """
+    Update or remove the cached node changed by a media service API call.
+    """
+    event_name = event["detail"].get("eventName")
+    node_type = NODE_CHANGE_EVENTS.get(event["source"], {}).get(event_name)
+    # ignore other events and calls that failed
+    if node_type is None or "errorCode" in event["detail"]:
+        return
+    service_name = event["source"].split(".")[1]
+    if event_name.startswith("Delete"):
+        arn, _ = NODE_DESCRIBERS[event["source"]](event, node_type, None)
+        if arn:
+            CONTENT_TABLE.delete_item(Key={"arn": arn})
+            notify_node_change(arn, node_type, deleted=True)
+            print(f"Removed node {arn}.")
+        return
+    client = boto3.client(service_name, region_name=event["region"], config=MSAM_BOTO3_CONFIG)
+    arn, config = NODE_DESCRIBERS[event["source"]](event, node_type, client)
+    if arn:
+        now = int(time.time())
+        CONTENT_TABLE.put_item(Item={
+            "arn": arn,
+            "region": event["region"],
+            "service": node_type,
+            "updated": now,
+            "expires": now + int(os.environ["ITEM_TTL"]),
+            "data": json.dumps(config, default=str)
+        })
+        notify_node_change(arn, node_type)
+        print(f"Refreshed node {arn}.")
+
 def lambda_handler(event, _):
     """
     Entry point for CloudWatch event receipt.
@@ -148,4 +391,8 @@ def lambda_handler(event, _):
             print("Skipping this event. " + event["type"])
     except ClientError as error:
         print(error)
+    try:
+        refresh_node(event)
+    except ClientError as error:
+        print(error)
     return True
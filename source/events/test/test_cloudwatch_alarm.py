@@ -14,6 +14,7 @@ CLIENT_ERROR = ClientError({"Error": {"Code": "400", "Message": "SomeClientError
 
 os.environ["SOLUTION_ID"] = "SO0166"
 os.environ["ALARMS_TABLE_NAME"] = "alarms_table"
+os.environ["CONTENT_TABLE_NAME"] = "content_table"
 os.environ["EVENTS_TABLE_REGION"] = "us-east-1"
 
 @patch('boto3.client')
@@ -47,12 +48,31 @@ class TestCloudWatchAlarm(unittest.TestCase):
         mocked_event = {"region": "us-east-1", "detail": {"alarmName": "alarmName"}}
         patched_resource.return_value.Alarm.return_value.alarm_value = "set"
         with patch.object(cloudwatch_alarm, 'subscribers_to_alarm', return_value=[ARN]):
-            with patch.object(cloudwatch_alarm.ALARMS_TABLE, 'update_item', return_value={}):
+            with patch.object(cloudwatch_alarm.ALARMS_TABLE, 'update_item', return_value={}), \
+                    patch.object(cloudwatch_alarm, 'invalidate_health') as patched_invalidate:
                 cloudwatch_alarm.lambda_handler(mocked_event, MagicMock())
                 cloudwatch_alarm.boto3.resource.return_value.Alarm.assert_called_once_with('alarmName')
                 cloudwatch_alarm.ALARMS_TABLE.update_item.assert_called_once()
                 self.assertTrue(cloudwatch_alarm.ALARMS_TABLE.update_item.call_args.kwargs['UpdateExpression'] == 'SET StateValue = :state, Updated = :updated, StateUpdated = :stateupdated')
                 self.assertTrue(cloudwatch_alarm.ALARMS_TABLE.update_item.call_args.kwargs['Key'] == {'RegionAlarmName': 'us-east-1:alarmName', 'ResourceArn': ARN})
+                patched_invalidate.assert_called_once_with()
+                # an alarm already in the same state does not invalidate the health rollup
+                cloudwatch_alarm.ALARMS_TABLE.update_item.return_value = {"Attributes": {"StateValue": "ALARM"}}
+                patched_resource.return_value.Alarm.return_value.state_value = "ALARM"
+                cloudwatch_alarm.lambda_handler(mocked_event, MagicMock())
+                patched_invalidate.assert_called_once_with()
         patched_resource.return_value.Alarm.side_effect = CLIENT_ERROR
         cloudwatch_alarm.lambda_handler(mocked_event, MagicMock())
         self.assertRaises(ClientError)
+
+    def test_invalidate_health(self, patched_resource,
+                               patched_client):
+        """
+        Test the invalidate_health function
+        """
+        import cloudwatch_alarm
+        with patch.object(cloudwatch_alarm.CONTENT_TABLE, 'update_item', return_value={}):
+            cloudwatch_alarm.invalidate_health()
+            cloudwatch_alarm.CONTENT_TABLE.update_item.assert_called_once_with(
+                Key={"arn": "msam-health-version"}, UpdateExpression="ADD version :one",
+                ExpressionAttributeValues={":one": 1})
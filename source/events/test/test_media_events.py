@@ -4,6 +4,7 @@ This module is provides unit tests for the media_events.py module.
 
 # pylint: disable=C0415,W0201
 
+import json
 import os
 import unittest
 from unittest.mock import patch, MagicMock
@@ -53,13 +54,95 @@ class TestMediaEvents(unittest.TestCase):
             "source": "aws.cloudwatch", "detail-type": "CloudWatch Alarm State Change"}
         patched_client.return_value.describe_origin_endpoint.return_value = {"Arn": ARN}
         with patch.object(media_events.EVENTS_TABLE, 'put_item', return_value={}):
-            with patch.object(media_events.CLOUDWATCH_EVENTS_TABLE, 'put_item', return_value={}):
+            with patch.object(media_events.CLOUDWATCH_EVENTS_TABLE, 'put_item', return_value={}), \
+                    patch.object(media_events.CONTENT_TABLE, 'update_item', return_value={}):
                 for event in mocked_events:
                     result = media_events.lambda_handler(event, MagicMock())
                     self.assertTrue(result)
                 self.assertTrue(media_events.EVENTS_TABLE.put_item.call_count == 7)
                 self.assertTrue(media_events.CLOUDWATCH_EVENTS_TABLE.put_item.call_count == 7)
+                # each new alert with an alarm state invalidates the health rollup
+                self.assertEqual(media_events.CONTENT_TABLE.update_item.call_count, 2)
+                media_events.CONTENT_TABLE.update_item.assert_called_with(
+                    Key={"arn": "msam-health-version"}, UpdateExpression="ADD version :one",
+                    ExpressionAttributeValues={":one": 1})
+                # an alert stored again in the same state does not
+                media_events.EVENTS_TABLE.put_item.return_value = {"Attributes": {"alarm_state": "set"}}
+                media_events.lambda_handler({"time": "2022-07-19T17:04:40Z", "resources": [],
+                    "detail": {"error-id": "id", "errored": True, "error-code": "code", "error-message": "message"},
+                    "source": "aws.mediaconnect", "detail-type": "MediaConnect Alert"}, MagicMock())
+                self.assertEqual(media_events.CONTENT_TABLE.update_item.call_count, 2)
         
         patched_client.return_value.describe_origin_endpoint.side_effect = CLIENT_ERROR
         media_events.lambda_handler(mocked_event, MagicMock())
         self.assertRaises(ClientError)
+
+    def test_refresh_node(self, patched_resource, patched_client):
+        """
+        Test the refresh_node function
+        """
+        import media_events
+        event = {"source": "aws.medialive", "region": "us-west-2", "account": "1234567890",
+            "detail": {"eventName": "CreateChannel", "responseElements": {"channel": {"id": "9276485"}}}}
+        patched_client.return_value.describe_channel.return_value = {"Id": "9276485", "ResponseMetadata": {}}
+        with patch.object(media_events.CONTENT_TABLE, 'put_item') as put_item, \
+                patch.object(media_events, 'EVENTS_CLIENT') as events_client:
+            media_events.refresh_node(event)
+            patched_client.return_value.describe_channel.assert_called_once_with(ChannelId="9276485")
+            item = put_item.call_args.kwargs["Item"]
+            self.assertEqual(item["arn"], "arn:aws:medialive:us-west-2:1234567890:channel:9276485")
+            self.assertEqual(item["service"], "medialive-channel")
+            self.assertEqual(item["data"], '{"Id": "9276485"}')
+            # the API is asked to update the node's connections
+            entry = events_client.put_events.call_args.kwargs["Entries"][0]
+            self.assertEqual(entry["Source"], "msam.events")
+            self.assertEqual(json.loads(entry["Detail"]), {"arn": item["arn"], "service": "medialive-channel",
+                                                           "deleted": False})
+            # failed calls and other events are ignored
+            put_item.reset_mock()
+            event["detail"]["errorCode"] = "ConflictException"
+            media_events.refresh_node(event)
+            media_events.refresh_node({"source": "aws.cloudwatch", "detail": {}})
+            put_item.assert_not_called()
+        patched_client.return_value.describe_container.return_value = {"Container": {"CreationTime": 1}}
+        patched_client.return_value.list_tags_for_resource.return_value = {"Tags": []}
+        with patch.object(media_events.CONTENT_TABLE, 'put_item') as put_item, \
+                patch.object(media_events, 'EVENTS_CLIENT'):
+            media_events.refresh_node({"source": "aws.mediastore", "region": "us-west-2", "account": "1234567890",
+                "detail": {"eventName": "CreateContainer", "requestParameters": {"containerName": "box"}}})
+            item = put_item.call_args.kwargs["Item"]
+            self.assertEqual(item["arn"], "arn:aws:mediastore:us-west-2:1234567890:container/box")
+            self.assertEqual(item["data"], '{"CreationTime": "1", "Tags": []}')
+            # ARNs use the partition of the event's region
+            media_events.refresh_node({"source": "aws.mediastore", "region": "cn-north-1", "account": "1234567890",
+                "detail": {"eventName": "CreateContainer", "requestParameters": {"containerName": "box"}}})
+            item = put_item.call_args.kwargs["Item"]
+            self.assertEqual(item["arn"], "arn:aws-cn:mediastore:cn-north-1:1234567890:container/box")
+
+    def test_refresh_node_delete(self, patched_resource, patched_client):
+        """
+        Test the refresh_node function with delete events
+        """
+        import media_events
+        event = {"source": "aws.medialive", "region": "us-west-2", "account": "1234567890",
+            "detail": {"eventName": "DeleteMultiplex", "requestParameters": {"multiplexId": "42"}}}
+        arn = "arn:aws:medialive:us-west-2:1234567890:multiplex:42"
+        with patch.object(media_events.CONTENT_TABLE, 'delete_item') as delete_item, \
+                patch.object(media_events, 'EVENTS_CLIENT') as events_client:
+            media_events.refresh_node(event)
+            delete_item.assert_called_once_with(Key={"arn": arn})
+            # the API removes the connections
+            entry = events_client.put_events.call_args.kwargs["Entries"][0]
+            self.assertEqual(json.loads(entry["Detail"]), {"arn": arn, "service": "medialive-multiplex", "deleted": True})
+        # mediapackage ARNs are found in the cache by Id, only items containing the Id are returned
+        event = {"source": "aws.mediapackage", "region": "us-west-2", "account": "1234567890",
+            "detail": {"eventName": "DeleteChannel", "requestParameters": {"id": "live"}}}
+        items = [{"arn": "other", "data": '{"Id": "test", "HlsIngest": {"Id": "live"}}'},
+                 {"arn": "mp-arn", "data": '{"Id": "live"}'}]
+        with patch.object(media_events.CONTENT_TABLE, 'delete_item') as delete_item, \
+                patch.object(media_events, 'EVENTS_CLIENT'), \
+                patch.object(media_events.CONTENT_TABLE, 'query', side_effect=[
+                    {"Items": items[:1], "LastEvaluatedKey": "key"}, {"Items": items[1:]}]) as query:
+            media_events.refresh_node(event)
+            delete_item.assert_called_once_with(Key={"arn": "mp-arn"})
+            self.assertIn("FilterExpression", query.call_args.kwargs)
@@ -21,12 +21,14 @@ const delete_layout = function (diagram, node_ids) {
     const current_connection = connections.get_current();
     const url = current_connection[0];
     const api_key = current_connection[1];
-    for (const node_id of node_ids) {
-        const current_endpoint = `${url}/layout/nodes/${encodeURIComponent(
-            diagram.view_id
-        )}/${encodeURIComponent(node_id)}`;
-        server.delete_method(current_endpoint, api_key);
-    }
+    const keys = node_ids.map((node_id) => ({
+        view: diagram.view_id,
+        id: node_id,
+    }));
+    const current_endpoint = `${url}/layout/nodes/delete`;
+    server.post(current_endpoint, api_key, keys).catch(function (error) {
+        console.error(error);
+    });
 };
 
 const save_layout = function (diagram, node_ids) {
@@ -7,9 +7,15 @@ This file contains the REST API and CloudWatch entry-points for the MSAM backend
 import os
 
 import boto3
-from chalice import Chalice, Rate
+from chalice import BadRequestError, Chalice, Rate
 
+from chalicelib import autolayout
 from chalicelib import cache
+from chalicelib import chains
+from chalicelib import connections
+from chalicelib import diagram
+from chalicelib import graph
+from chalicelib import health
 import chalicelib.channels as channel_tiles
 import chalicelib.cloudwatch as cloudwatch_data
 import chalicelib.layout as node_layout
@@ -66,6 +72,44 @@ SSM_EVENT_PATTERN = {
     }
 }
 
+# sent by the events Collector Lambda after it refreshes or removes a cached node
+NODE_CHANGE_EVENT_PATTERN = {
+    "source": ["msam.events"],
+    "detail-type": ["MSAM Node Change"]
+}
+
+
+def integer_param(value, name):
+    """
+    Return a path or query parameter as an integer, or reject the request with a 400 error.
+    """
+    try:
+        return int(value)
+    except (TypeError, ValueError) as error:
+        raise BadRequestError(f"{name} must be an integer") from error
+
+
+def string_list(value, name):
+    """
+    Return a request value that must be a list of strings, or reject the request with a 400 error.
+    """
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise BadRequestError(f"{name} must be a list of strings")
+    return value
+
+
+def layout_items(value):
+    """
+    Return a request body that must be a list of node layout items with a view and an id,
+    or reject the request with a 400 error.
+    """
+    if not isinstance(value, list):
+        raise BadRequestError("the request body must be a list of layout items")
+    for item in value:
+        if not isinstance(item, dict) or not isinstance(item.get("view"), str) or not isinstance(item.get("id"), str):
+            raise BadRequestError("each layout item must have a view and an id")
+    return value
+
 
 @app.route('/layout/view/{view}',
            cors=True,
@@ -78,6 +122,32 @@ def get_view_layout(view):
     return node_layout.get_view_layout(view)
 
 
+@app.route('/layout/view/{view}/hydrated',
+           cors=True,
+           api_key_required=True,
+           methods=['GET'])
+def get_hydrated_view(view):
+    """
+    API entry point for retrieving a view's layout with its cached nodes, connections, alarms and notes.
+    """
+    return diagram.hydrated_view(view)
+
+
+@app.route('/layout/view/{view}/auto',
+           cors=True,
+           api_key_required=True,
+           methods=['POST'])
+def auto_layout_view(view):
+    """
+    API entry point for computing a layered layout of a view from its connections.
+    Use mode=incremental to place only nodes that have not been positioned yet.
+    """
+    incremental = False
+    if app.current_request.query_params is not None:
+        incremental = app.current_request.query_params.get('mode') == 'incremental'
+    return autolayout.layout_view(view, incremental)
+
+
 @app.route('/layout/nodes/{view}/{node_id}',
            cors=True,
            api_key_required=True,
@@ -99,7 +169,22 @@ def set_view_layout():
     """
     API entry point for setting nodes in a view. This adds new nodes and overwrites existing nodes. It does not replace the entire set.
     """
-    return node_layout.set_node_layout(app.current_request.json_body)
+    # json_body is None for form-encoded requests
+    return node_layout.set_node_layout(layout_items(app.current_request.json_body))
+
+
+@app.route(
+    '/layout/nodes/delete',
+    cors=True,
+    api_key_required=True,
+    methods=['POST'],
+    content_types=['application/json', 'application/x-www-form-urlencoded'])
+def delete_view_layouts():
+    """
+    API entry point for removing many nodes from views in one call.
+    """
+    # json_body is None for form-encoded requests
+    return node_layout.delete_node_layouts(layout_items(app.current_request.json_body))
 
 
 @app.route('/layout/views',
@@ -129,6 +214,14 @@ def delete_all_channels():
     return channel_tiles.delete_all_channels()
 
 
+@app.route('/channels/health', cors=True, api_key_required=True, methods=['GET'])
+def get_channel_health():
+    """
+    API entry point to return the node, alarm and alert counts and status of every tile.
+    """
+    return health.get_channel_health()
+
+
 @app.route(
     '/channel/{name}',
     cors=True,
@@ -199,6 +292,21 @@ def cached_by_service(service):
     return cache.cached_by_service(service)
 
 
+@app.route(
+    '/cached/arns',
+    cors=True,
+    api_key_required=True,
+    methods=['POST'],
+    content_types=['application/json', 'application/x-www-form-urlencoded'])
+def cached_by_arn_list():
+    """
+    API entry point to retrieve items from the cache for a list of arns.
+    """
+    # json_body is None for form-encoded requests
+    string_list(app.current_request.json_body, "the request body")
+    return cache.cached_by_arn_list(app.current_request)
+
+
 @app.route('/cached/arn/{arn}',
            cors=True,
            api_key_required=True,
@@ -234,6 +342,67 @@ def delete_cached_data(arn):
     return cache.delete_cached_data(arn)
 
 
+@app.route('/graph/downstream/{arn}',
+           cors=True,
+           api_key_required=True,
+           methods=['GET'])
+def graph_downstream(arn):
+    """
+    API entry point to return the nodes and connections downstream of a node.
+    """
+    depth = None
+    if app.current_request.query_params is not None:
+        depth = app.current_request.query_params.get('depth')
+    return graph.connected_nodes(arn, graph.DOWNSTREAM, depth)
+
+
+@app.route('/graph/upstream/{arn}',
+           cors=True,
+           api_key_required=True,
+           methods=['GET'])
+def graph_upstream(arn):
+    """
+    API entry point to return the nodes and connections upstream of a node.
+    """
+    depth = None
+    if app.current_request.query_params is not None:
+        depth = app.current_request.query_params.get('depth')
+    return graph.connected_nodes(arn, graph.UPSTREAM, depth)
+
+
+@app.route('/graph/path/{from_arn}/{to_arn}',
+           cors=True,
+           api_key_required=True,
+           methods=['GET'])
+def graph_path(from_arn, to_arn):
+    """
+    API entry point to return the shortest chain of connections from one node to another.
+    """
+    return graph.connection_path(from_arn, to_arn)
+
+
+@app.route('/graph/health',
+           cors=True,
+           api_key_required=True,
+           methods=['GET'])
+def graph_health():
+    """
+    API entry point to return node and tile health with alarms and alerts propagated downstream.
+    """
+    return health.get_health()
+
+
+@app.route('/graph/chains/{arn}',
+           cors=True,
+           api_key_required=True,
+           methods=['GET'])
+def graph_chains(arn):
+    """
+    API entry point to return the materialized signal chains that include a node.
+    """
+    return chains.chains_for_node(arn)
+
+
 @app.route('/regions', cors=True, api_key_required=True, methods=['GET'])
 def regions():
     """
@@ -258,7 +427,11 @@ def incoming_cloudwatch_alarm(event, _):
     """
     Standard AWS Lambda entry point for receiving CloudWatch alarm notifications.
     """
-    return cloudwatch_data.incoming_cloudwatch_alarm(event, _)
+    changed = cloudwatch_data.incoming_cloudwatch_alarm(event, _)
+    # the health rollup only changes with an alarm state
+    if changed:
+        health.invalidate_health()
+    return True
 
 
 @app.route('/cloudwatch/alarm/{alarm_name}/region/{region}/subscribe',
@@ -318,6 +491,34 @@ def alarms_for_subscriber(resource_arn):
     return cloudwatch_data.alarms_for_subscriber(resource_arn)
 
 
+@app.route(
+    '/cloudwatch/alarms/subscribers',
+    cors=True,
+    api_key_required=True,
+    methods=['POST'],
+    content_types=['application/json', 'application/x-www-form-urlencoded'])
+def alarms_for_subscribers():
+    """
+    API entry point to return a map of node ARN to subscribed alarms for a list of nodes.
+    """
+    # json_body is None for form-encoded requests
+    arns = string_list(app.current_request.json_body, "the request body")
+    if len(arns) > cloudwatch_data.EVENT_RESOURCES_LIMIT:
+        raise BadRequestError(f"at most {cloudwatch_data.EVENT_RESOURCES_LIMIT} arns can be requested")
+    return cloudwatch_data.alarms_for_subscribers(arns)
+
+
+@app.route('/cloudwatch/alarms/view/{view}',
+           cors=True,
+           api_key_required=True,
+           methods=['GET'])
+def alarm_summaries_for_view(view):
+    """
+    API entry point to return alarm counts by state for all nodes on a diagram view.
+    """
+    return cloudwatch_data.alarm_summaries_for_view(view)
+
+
 @app.route('/cloudwatch/alarms/subscribed',
            cors=True,
            api_key_required=True,
@@ -409,6 +610,61 @@ def get_cloudwatch_events_resource_arn_start_end(resource_arn, start_time,
         resource_arn, start_time, end_time, limit)
 
 
+@app.route(
+    '/cloudwatch/events/resources',
+    cors=True,
+    api_key_required=True,
+    methods=['POST'],
+    content_types=['application/json', 'application/x-www-form-urlencoded'])
+def get_cloudwatch_events_resources():
+    """
+    API entry point to return CloudWatch events for a list of nodes, merged newest first.
+    """
+    # json_body is None for form-encoded requests
+    body = app.current_request.json_body
+    if not isinstance(body, dict):
+        raise BadRequestError("the request body must be a JSON object")
+    string_list(body.get("arns", []), "arns")
+    for name in ("start_time", "end_time", "limit"):
+        if name in body:
+            integer_param(body[name], name)
+    # larger limits are lowered to 100 per resource
+    if "limit" in body and integer_param(body["limit"], "limit") < 1:
+        raise BadRequestError("limit must be at least 1")
+    return cloudwatch_data.get_cloudwatch_events_resources(app.current_request)
+
+
+@app.route('/cloudwatch/events/buckets/{resource_arn}/{start_time}/{end_time}',
+           cors=True,
+           api_key_required=True,
+           methods=['GET'])
+def get_cloudwatch_events_resource_buckets(resource_arn, start_time, end_time):
+    """
+    API entry point to return CloudWatch event counts by type in time buckets for a node and time range.
+    """
+    bucket_size = cloudwatch_data.EVENT_BUCKET_SECONDS
+    if app.current_request.query_params is not None and app.current_request.query_params.get('size'):
+        bucket_size = app.current_request.query_params.get('size')
+    return cloudwatch_data.get_cloudwatch_events_resource_buckets(
+        resource_arn, integer_param(start_time, "start_time"), integer_param(end_time, "end_time"),
+        integer_param(bucket_size, "size"))
+
+
+@app.route('/cloudwatch/events/bucket/{resource_arn}/{bucket_start}',
+           cors=True,
+           api_key_required=True,
+           methods=['GET'])
+def get_cloudwatch_events_resource_bucket(resource_arn, bucket_start):
+    """
+    API entry point to return all CloudWatch events related to a node within one time bucket.
+    """
+    bucket_size = cloudwatch_data.EVENT_BUCKET_SECONDS
+    if app.current_request.query_params is not None and app.current_request.query_params.get('size'):
+        bucket_size = app.current_request.query_params.get('size')
+    return cloudwatch_data.get_cloudwatch_events_resource_bucket(
+        resource_arn, integer_param(bucket_start, "bucket_start"), integer_param(bucket_size, "size"))
+
+
 @app.route('/ping', cors=True, api_key_required=True, methods=['GET'])
 def ping():
     """
@@ -461,6 +717,15 @@ def process_ssm_run_command(event):
     return periodic_handlers.process_ssm_run_command(event)
 
 
+@app.on_cw_event(NODE_CHANGE_EVENT_PATTERN)
+def refresh_node_connections(event):
+    """
+    Entry point for updating the connections of a node changed by a media service API call.
+    """
+    return connections.refresh_node_connections(event.detail["arn"], event.detail["service"],
+                                                event.detail.get("deleted", False))
+
+
 @app.schedule(Rate(SSM_NODE_UPDATE_RATE_MINUTES, unit=Rate.MINUTES))
 def update_ssm_nodes(_):
     """
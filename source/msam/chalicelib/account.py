@@ -0,0 +1,55 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""
+This file contains helper functions for account details that do not change during a container's life.
+"""
+
+import functools
+import os
+
+import boto3
+from botocore.config import Config
+
+# user-agent config
+SOLUTION_ID = os.environ['SOLUTION_ID']
+USER_AGENT_EXTRA = {"user_agent_extra": SOLUTION_ID}
+MSAM_BOTO3_CONFIG = Config(**USER_AGENT_EXTRA)
+
+
+@functools.lru_cache(maxsize=None)
+def caller_identity():
+    """
+    Return the STS caller identity, retrieved once per container.
+    """
+    return boto3.client("sts", config=MSAM_BOTO3_CONFIG).get_caller_identity()
+
+
+def account_id():
+    """
+    Return the ID of the account the solution runs in.
+    """
+    return caller_identity().get("Account")
+
+
+def partition():
+    """
+    Return the partition of the account, ex. aws or aws-cn.
+    """
+    parts = caller_identity().get("Arn", "").split(":")
+    return parts[1] if len(parts) > 1 else "aws"
+
+
+@functools.lru_cache(maxsize=None)
+def service_regions(service_name):
+    """
+    Return the regions where a service is available in the account's partition.
+    """
+    return frozenset(boto3.Session().get_available_regions(service_name, partition_name=partition()))
+
+
+def clear():
+    """
+    Forget the cached values so they are retrieved again.
+    """
+    caller_identity.cache_clear()
+    service_regions.cache_clear()
@@ -0,0 +1,272 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""
+This file contains helper functions for computing layered diagram layouts from the connection graph.
+"""
+
+from collections import deque
+from urllib.parse import unquote
+
+from botocore.exceptions import ClientError
+
+from chalicelib import chains
+from chalicelib import graph
+from chalicelib import layout
+
+# spacing between layers and between nodes in a layer, matching the browser's horizontal layout
+LAYER_SPACING = 350
+NODE_SPACING = 250
+
+# vertical gap between connected components and below an existing diagram
+COMPONENT_SPACING = 500
+
+# nodes per row when placing nodes without connections
+GRID_COLUMNS = 10
+
+# barycenter passes over the layers to reduce crossings
+ORDERING_SWEEPS = 4
+
+
+def view_index(node_ids, connection_items):
+    """
+    Return the adjacency index of the connections between nodes of a view.
+    """
+    members = set(node_ids)
+    return graph.adjacency_index([item for item in connection_items
+                                  if item.get("from") in members and item.get("to") in members])
+
+
+def acyclic_successors(nodes, following):
+    """
+    Return the successors of each node with the back edges found by a depth-first search reversed,
+    so the graph can be layered from sources to sinks.
+    """
+    result = {arn: [] for arn in nodes}
+    state = {}
+    for start in nodes:
+        if start in state:
+            continue
+        state[start] = "open"
+        stack = [(start, iter(following.get(start, {})))]
+        while stack:
+            current, pending = stack[-1]
+            target = next(pending, None)
+            if target is None:
+                state[current] = "done"
+                stack.pop()
+            elif state.get(target) == "open":
+                # a back edge closes a cycle, point it the other way
+                result[target].append(current)
+            else:
+                result[current].append(target)
+                if target not in state:
+                    state[target] = "open"
+                    stack.append((target, iter(following.get(target, {}))))
+    return result
+
+
+def assign_layers(nodes, successors):
+    """
+    Return the nodes grouped into layers, every node one layer after its furthest predecessor.
+    """
+    incoming = {arn: 0 for arn in nodes}
+    for arn in nodes:
+        for target in successors[arn]:
+            incoming[target] += 1
+    depth = {arn: 0 for arn in nodes}
+    ready = deque(arn for arn in nodes if not incoming[arn])
+    while ready:
+        current = ready.popleft()
+        for target in successors[current]:
+            depth[target] = max(depth[target], depth[current] + 1)
+            incoming[target] -= 1
+            if not incoming[target]:
+                ready.append(target)
+    layers = [[] for _ in range(max(depth.values()) + 1)]
+    for arn in nodes:
+        layers[depth[arn]].append(arn)
+    return layers
+
+
+def order_layers(layers, successors):
+    """
+    Reorder the nodes of each layer by the average position of their neighbors, alternating
+    downstream and upstream passes. Connections that skip layers count like adjacent ones.
+    """
+    predecessors = {arn: [] for layer in layers for arn in layer}
+    for arn, targets in successors.items():
+        for target in targets:
+            predecessors[target].append(arn)
+    position = {arn: index for layer in layers for index, arn in enumerate(layer)}
+
+    def reorder(layer, neighbors):
+        def barycenter(arn):
+            found = neighbors[arn]
+            if not found:
+                return position[arn]
+            return sum(position[other] for other in found) / len(found)
+        layer.sort(key=barycenter)
+        for index, arn in enumerate(layer):
+            position[arn] = index
+
+    for sweep in range(ORDERING_SWEEPS):
+        if sweep % 2 == 0:
+            for layer in layers[1:]:
+                reorder(layer, predecessors)
+        else:
+            for layer in reversed(layers[:-1]):
+                reorder(layer, successors)
+    return layers
+
+
+def layered_positions(nodes, following):
+    """
+    Return (x, y) coordinates for one connected component, sources on the left and sinks on the right.
+    Layers are centered on each other and the top of the component is at y = 0.
+    """
+    successors = acyclic_successors(nodes, following)
+    layers = order_layers(assign_layers(nodes, successors), successors)
+    tallest = max(len(layer) for layer in layers)
+    positions = {}
+    for column, layer in enumerate(layers):
+        offset = (tallest - len(layer)) / 2
+        for row, arn in enumerate(layer):
+            positions[arn] = (column * LAYER_SPACING, int((row + offset) * NODE_SPACING))
+    return positions
+
+
+def arrange(node_ids, connection_items, top=0, left=0):
+    """
+    Return (x, y) coordinates for every node, with connected components stacked from the largest
+    down and nodes without connections in a grid below them.
+    """
+    index = view_index(node_ids, connection_items)
+    following = chains.successors(index)
+    positions = {}
+    connected = set()
+    for members in sorted(chains.components(index), key=len, reverse=True):
+        connected.update(members)
+        placed = layered_positions(members, following)
+        for arn, (x_pos, y_pos) in placed.items():
+            positions[arn] = (left + x_pos, top + y_pos)
+        top = top + max(y_pos for _, y_pos in placed.values()) + COMPONENT_SPACING
+    isolated = sorted(arn for arn in set(node_ids) if arn not in connected)
+    for count, arn in enumerate(isolated):
+        positions[arn] = (left + count % GRID_COLUMNS * LAYER_SPACING, top + count // GRID_COLUMNS * NODE_SPACING)
+    return positions
+
+
+def place_new(existing, new_ids, connection_items):
+    """
+    Return (x, y) coordinates for new nodes given the positions of the nodes already on a diagram.
+    Nodes connected to placed nodes go one layer after their upstream neighbors, or one layer before
+    their downstream neighbors, in the nearest free slot. The rest are arranged below the diagram.
+    """
+    new_ids = sorted(set(new_ids) - set(existing))
+    index = view_index(list(existing) + new_ids, connection_items)
+    cells = {arn: (round(x_pos / LAYER_SPACING), round(y_pos / NODE_SPACING))
+             for arn, (x_pos, y_pos) in existing.items()}
+    occupied = set(cells.values())
+    # where the search for a free slot resumes for each target cell
+    probes = {}
+
+    def free_cell(target):
+        column, row = target
+        attempt = probes.get(target, 0)
+        while True:
+            # try the target row, then one below, one above, two below, and so on
+            step = (attempt + 1) // 2
+            cell = (column, row + step if attempt % 2 else row - step)
+            attempt = attempt + 1
+            if cell not in occupied:
+                probes[target] = attempt
+                return cell
+
+    def placed_neighbors(arn, direction):
+        return [cells[other] for other in (graph.neighbor(item, direction) for item in index[direction].get(arn, []))
+                if other in cells]
+
+    waiting = set(new_ids)
+    queue = deque(arn for arn in new_ids
+                  if placed_neighbors(arn, graph.UPSTREAM) or placed_neighbors(arn, graph.DOWNSTREAM))
+    while queue:
+        arn = queue.popleft()
+        if arn not in waiting:
+            continue
+        upstream = placed_neighbors(arn, graph.UPSTREAM)
+        if upstream:
+            column = max(cell[0] for cell in upstream) + 1
+            neighbors = upstream
+        else:
+            neighbors = placed_neighbors(arn, graph.DOWNSTREAM)
+            column = min(cell[0] for cell in neighbors) - 1
+        row = round(sum(cell[1] for cell in neighbors) / len(neighbors))
+        cells[arn] = free_cell((column, row))
+        occupied.add(cells[arn])
+        waiting.discard(arn)
+        for direction in (graph.DOWNSTREAM, graph.UPSTREAM):
+            queue.extend(other for other in (graph.neighbor(item, direction) for item in index[direction].get(arn, []))
+                         if other in waiting)
+    positions = {arn: (cells[arn][0] * LAYER_SPACING, cells[arn][1] * NODE_SPACING) for arn in new_ids
+                 if arn in cells}
+    if waiting:
+        top = 0
+        left = 0
+        if existing:
+            top = max(y_pos for _, y_pos in existing.values()) + COMPONENT_SPACING
+            left = min(x_pos for x_pos, _ in existing.values())
+        if positions:
+            top = max(top, max(y_pos for _, y_pos in positions.values()) + COMPONENT_SPACING)
+        positions.update(arrange(sorted(waiting), connection_items, top=top, left=left))
+    return positions
+
+
+def save_positions(view, positions):
+    """
+    Write node coordinates to a view's layout in batch.
+    """
+    return layout.set_node_layout([{"view": view, "id": arn, "x": x_pos, "y": y_pos}
+                                   for arn, (x_pos, y_pos) in positions.items()])
+
+
+def place_nodes(view, node_ids):
+    """
+    Position nodes just added to a view next to their connected neighbors already on it.
+    """
+    try:
+        items = layout.get_view_layout(view)
+        if not isinstance(items, list):
+            return items
+        added = set(node_ids)
+        existing = {item["id"]: (int(item["x"]), int(item["y"])) for item in items if item["id"] not in added}
+        return save_positions(view, place_new(existing, node_ids, graph.cached_connections()))
+    except ClientError as error:
+        print(error)
+        return {"exception": str(error)}
+
+
+def layout_view(view, incremental=False):
+    """
+    API entry point to compute and save a layered layout for the nodes of a view.
+    In incremental mode only nodes still at the origin are placed and the rest stay where they are.
+    """
+    view = unquote(view)
+    try:
+        items = layout.get_view_layout(view)
+        # the layout call returns an exception message on failure
+        if not isinstance(items, list):
+            return items
+        if incremental:
+            new_ids = [item["id"] for item in items if item["x"] == 0 and item["y"] == 0]
+            existing = {item["id"]: (int(item["x"]), int(item["y"])) for item in items
+                        if not (item["x"] == 0 and item["y"] == 0)}
+            positions = place_new(existing, new_ids, graph.cached_connections())
+        else:
+            positions = arrange([item["id"] for item in items], graph.cached_connections())
+        result = save_positions(view, positions)
+        if "message" in result:
+            result["nodes"] = len(positions)
+        return result
+    except ClientError as error:
+        print(error)
+        return {"exception": str(error)}
@@ -0,0 +1,112 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""
+This file contains helper functions for batched DynamoDB reads and writes.
+"""
+
+import secrets
+import time
+
+from chalicelib import concurrency
+
+# DynamoDB limit on keys in one BatchGetItem request
+BATCH_GET_LIMIT = 100
+
+# DynamoDB limit on put and delete requests in one BatchWriteItem request
+BATCH_WRITE_LIMIT = 25
+
+# how many times unprocessed keys are requested again
+BATCH_RETRIES = 5
+
+# backoff before each retry doubles from this many milliseconds
+BATCH_BACKOFF_MILLIS = 50
+
+
+def chunks(items, size):
+    """
+    Yield successive lists of at most size items.
+    """
+    items = list(items)
+    for index in range(0, len(items), size):
+        yield items[index:index + size]
+
+
+def backoff(attempt):
+    """
+    Sleep before a retry with exponential backoff and full jitter.
+    """
+    time.sleep(secrets.randbelow(BATCH_BACKOFF_MILLIS * 2 ** attempt + 1) / 1000)
+
+
+def batch_get_chunk(table_name, keys):
+    """
+    Retrieve up to 100 items with BatchGetItem, retrying unprocessed keys with backoff.
+    Returns the items found and the keys still unprocessed after all retries.
+    """
+    ddb_resource = concurrency.thread_resource('dynamodb')
+    items = []
+    request = {table_name: {"Keys": keys}}
+    attempt = 0
+    while True:
+        response = ddb_resource.batch_get_item(RequestItems=request)
+        items = items + response.get("Responses", {}).get(table_name, [])
+        request = response.get("UnprocessedKeys")
+        if not request or attempt >= BATCH_RETRIES:
+            break
+        backoff(attempt)
+        attempt = attempt + 1
+    unprocessed = request[table_name]["Keys"] if request else []
+    if unprocessed:
+        print(f"{len(unprocessed)} keys unprocessed in {table_name}")
+    return items, unprocessed
+
+
+def batch_get_items(table_name, keys):
+    """
+    Retrieve items by primary key from a table with BatchGetItem, 100 keys per request.
+    The requests run concurrently. Returns the items found and any keys left unprocessed.
+    """
+    items = []
+    unprocessed = []
+    results = concurrency.map_concurrent(lambda chunk: batch_get_chunk(table_name, chunk),
+                                         chunks(keys, BATCH_GET_LIMIT))
+    for chunk_items, chunk_unprocessed in results:
+        items = items + chunk_items
+        unprocessed = unprocessed + chunk_unprocessed
+    return items, unprocessed
+
+
+def batch_write_chunk(table_name, requests):
+    """
+    Send up to 25 put or delete requests with BatchWriteItem, retrying unprocessed requests with backoff.
+    Returns the requests still unprocessed after all retries.
+    """
+    ddb_resource = concurrency.thread_resource('dynamodb')
+    request = {table_name: requests}
+    attempt = 0
+    while True:
+        response = ddb_resource.batch_write_item(RequestItems=request)
+        request = response.get("UnprocessedItems")
+        if not request or attempt >= BATCH_RETRIES:
+            break
+        backoff(attempt)
+        attempt = attempt + 1
+    unprocessed = request[table_name] if request else []
+    if unprocessed:
+        print(f"{len(unprocessed)} writes unprocessed in {table_name}")
+    return unprocessed
+
+
+def batch_write_items(table_name, put_items=(), delete_keys=()):
+    """
+    Put items and delete keys in a table with BatchWriteItem, 25 requests per call.
+    The calls run concurrently. Returns any requests left unprocessed.
+    A key must not appear more than once across the puts and deletes.
+    """
+    requests = [{"PutRequest": {"Item": item}} for item in put_items] + \
+        [{"DeleteRequest": {"Key": key}} for key in delete_keys]
+    unprocessed = []
+    for chunk_unprocessed in concurrency.map_concurrent(lambda chunk: batch_write_chunk(table_name, chunk),
+                                                        chunks(requests, BATCH_WRITE_LIMIT)):
+        unprocessed = unprocessed + chunk_unprocessed
+    return unprocessed
@@ -4,6 +4,7 @@
 This file contains helper functions for updating and querying the cache.
 """
 
+import json
 import os
 from urllib.parse import unquote
 
@@ -12,6 +13,8 @@ from boto3.dynamodb.conditions import Key
 from botocore.exceptions import ClientError
 from botocore.config import Config
 
+from chalicelib import batch
+
 # table names generated by CloudFormation
 CONTENT_TABLE_NAME = os.environ["CONTENT_TABLE_NAME"]
 
@@ -20,6 +23,27 @@ SOLUTION_ID = os.environ['SOLUTION_ID']
 USER_AGENT_EXTRA = {"user_agent_extra": SOLUTION_ID}
 MSAM_BOTO3_CONFIG = Config(**USER_AGENT_EXTRA)
 
+# most ARNs resolved by one list request
+CACHED_ARNS_LIMIT = 1000
+
+# serialized item bytes returned by one list request, under the 6 MB Lambda response limit
+CACHED_ARNS_RESPONSE_BYTES = 5 * 1024 * 1024
+
+
+def query_by_service(table, service):
+    """
+    Query all items of a service from the content table's service index.
+    """
+    ddb_index_name = "ServiceRegionIndex"
+    response = table.query(IndexName=ddb_index_name, KeyConditionExpression=Key('service').eq(service))
+    items = response["Items"]
+    # check for paging
+    while "LastEvaluatedKey" in response:
+        # query again with start key
+        response = table.query(IndexName=ddb_index_name, KeyConditionExpression=Key('service').eq(service), ExclusiveStartKey=response['LastEvaluatedKey'])
+        items = items + response["Items"]
+    return items
+
 
 def cached_by_service(service):
     """
@@ -27,18 +51,10 @@ def cached_by_service(service):
     """
     try:
         ddb_table_name = CONTENT_TABLE_NAME
-        ddb_index_name = "ServiceRegionIndex"
         ddb_resource = boto3.resource('dynamodb', config=MSAM_BOTO3_CONFIG)
         ddb_table = ddb_resource.Table(ddb_table_name)
-        response = ddb_table.query(IndexName=ddb_index_name, KeyConditionExpression=Key('service').eq(service))
-        items = response["Items"]
-        # check for paging
-        while "LastEvaluatedKey" in response:
-            # query again with start key
-            response = ddb_table.query(IndexName=ddb_index_name, KeyConditionExpression=Key('service').eq(service), ExclusiveStartKey=response['LastEvaluatedKey'])
-            items = items + response["Items"]
         # return when done paging
-        return items
+        return query_by_service(ddb_table, service)
     except ClientError as error:
         print(error)
         return {"message": str(error)}
@@ -86,6 +102,55 @@ def cached_by_arn(arn):
         return {"message": str(error)}
 
 
+def cached_by_arns(arns):
+    """
+    Retrieve the cached items for a list of ARNs with batched reads.
+    """
+    try:
+        # duplicate keys are not allowed in one batch
+        keys = [{"arn": arn} for arn in dict.fromkeys(arns)]
+        items, _ = batch.batch_get_items(CONTENT_TABLE_NAME, keys)
+        return items
+    except ClientError as error:
+        print(error)
+        return {"message": str(error)}
+
+
+def cached_by_arn_list(request):
+    """
+    API entry point to retrieve the cached items for a list of ARNs.
+    ARNs not in the cache are returned as missing. ARNs that could not be read in time,
+    or did not fit in the response, are returned as unprocessed so they can be requested again.
+    """
+    try:
+        arns = list(dict.fromkeys(request.json_body))
+        keys = [{"arn": arn} for arn in arns[:CACHED_ARNS_LIMIT]]
+        items, unprocessed_keys = batch.batch_get_items(CONTENT_TABLE_NAME, keys)
+        by_arn = {item["arn"]: item for item in items}
+        unprocessed = [key["arn"] for key in unprocessed_keys]
+        # return items in request order until the response is full
+        returned = []
+        size = 0
+        for arn in arns[:CACHED_ARNS_LIMIT]:
+            if arn not in by_arn:
+                continue
+            size = size + len(json.dumps(by_arn[arn], default=str))
+            if size > CACHED_ARNS_RESPONSE_BYTES:
+                unprocessed.append(arn)
+            else:
+                returned.append(by_arn[arn])
+        unprocessed = unprocessed + arns[CACHED_ARNS_LIMIT:]
+        skipped = set(by_arn).union(unprocessed)
+        return {
+            "items": returned,
+            "missing": [arn for arn in arns if arn not in skipped],
+            "unprocessed": unprocessed
+        }
+    except ClientError as error:
+        print(error)
+        return {"message": str(error)}
+
+
 def put_cached_data(request):
     """
     API entry point to add items to the cache.
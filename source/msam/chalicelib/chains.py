@@ -0,0 +1,179 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""
+This file contains helper functions for materializing signal chains from the connection cache.
+"""
+
+import hashlib
+import json
+import os
+import time
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+from chalicelib import cache
+from chalicelib import content
+from chalicelib import graph
+
+# TTL provided via CloudFormation
+CACHE_ITEM_TTL = int(os.environ["CACHE_ITEM_TTL"])
+
+# user-agent config
+SOLUTION_ID = os.environ['SOLUTION_ID']
+USER_AGENT_EXTRA = {"user_agent_extra": SOLUTION_ID}
+MSAM_BOTO3_CONFIG = Config(**USER_AGENT_EXTRA)
+
+# service names of the materialized items in the cache
+CHAIN_SERVICE = "signal-chain"
+COMPONENT_SERVICE = "signal-component"
+
+# one membership item per node of each chain, holding the node ARN in its region so a node's chains are one query
+MEMBER_SERVICE = "signal-chain-member"
+
+# most source-to-sink chains enumerated for one connected component
+MAX_CHAINS_PER_COMPONENT = 500
+
+
+def materialized_id(service, arns):
+    """
+    Return a stable ARN-style identifier for a chain or component from its member ARNs.
+    """
+    digest = hashlib.sha256("\n".join(arns).encode("utf-8")).hexdigest()[:32]
+    return f"arn:msam:{service}:global:{digest}"
+
+
+def successors(index):
+    """
+    Return the distinct downstream neighbors and linking connection ARNs of every node, in a stable order.
+    """
+    following = {}
+    for arn, items in index[graph.DOWNSTREAM].items():
+        links = {}
+        for item in sorted(items, key=lambda entry: entry["arn"]):
+            if item["to"] != arn:
+                links.setdefault(item["to"], item["arn"])
+        following[arn] = links
+    return following
+
+
+def components(index):
+    """
+    Return the connected components of the graph as sorted lists of ARNs, ignoring connection direction.
+    """
+    neighbors = {}
+    for direction in (graph.DOWNSTREAM, graph.UPSTREAM):
+        for arn, items in index[direction].items():
+            neighbors.setdefault(arn, set()).update(graph.neighbor(item, direction) for item in items)
+    seen = set()
+    found = []
+    for start in sorted(neighbors):
+        if start in seen:
+            continue
+        seen.add(start)
+        stack = [start]
+        members = []
+        while stack:
+            current = stack.pop()
+            members.append(current)
+            for arn in neighbors[current]:
+                if arn not in seen:
+                    seen.add(arn)
+                    stack.append(arn)
+        found.append(sorted(members))
+    return found
+
+
+def component_chains(members, following, limit=MAX_CHAINS_PER_COMPONENT):
+    """
+    Enumerate the source-to-sink chains of one component as (node ARNs, connection ARNs) pairs.
+    Nodes are not repeated within a chain, so cycles end a chain. Returns the chains and whether the limit was hit.
+    """
+    has_upstream = {target for arn in members for target in following.get(arn, {})}
+    sources = [arn for arn in members if arn not in has_upstream]
+    covered = set()
+    chains = []
+    # nodes fed only from a cycle are not reached from a source, so they start chains of their own
+    while len(covered) < len(members):
+        source = sources.pop(0) if sources else next(arn for arn in members if arn not in covered)
+        stack = [([source], [])]
+        while stack:
+            nodes, links = stack.pop()
+            extensions = [(arn, link) for arn, link in following.get(nodes[-1], {}).items() if arn not in nodes]
+            if not extensions:
+                chains.append((nodes, links))
+                covered.update(nodes)
+                if len(chains) >= limit:
+                    return chains, True
+                continue
+            # push in reverse so chains come out in successor order
+            for arn, link in reversed(extensions):
+                stack.append((nodes + [arn], links + [link]))
+    return chains, False
+
+
+def chain_ddb_items(connection_items):
+    """
+    Build the signal chain and component cache items for a list of connection items,
+    followed by the chain membership items of every node.
+    """
+    now = int(time.time())
+    index = graph.adjacency_index(connection_items)
+    following = successors(index)
+    items = []
+    memberships = []
+    for members in components(index):
+        component_id = materialized_id(COMPONENT_SERVICE, members)
+        chains, truncated = component_chains(members, following)
+        chain_ids = []
+        for nodes, links in chains:
+            chain_id = materialized_id(CHAIN_SERVICE, nodes)
+            chain_ids.append(chain_id)
+            data = {"component": component_id, "source": nodes[0], "sink": nodes[-1], "nodes": nodes,
+                    "connections": links}
+            items.append({"arn": chain_id, "region": "global", "service": CHAIN_SERVICE, "updated": now,
+                          "expires": now + CACHE_ITEM_TTL, "data": json.dumps(data)})
+            memberships.extend({"arn": materialized_id(MEMBER_SERVICE, [chain_id, arn]), "region": arn,
+                                "service": MEMBER_SERVICE, "chain": chain_id, "updated": now,
+                                "expires": now + CACHE_ITEM_TTL, "data": json.dumps(data)} for arn in nodes)
+        data = {"nodes": members, "chains": chain_ids, "truncated": truncated}
+        items.append({"arn": component_id, "region": "global", "service": COMPONENT_SERVICE, "updated": now,
+                      "expires": now + CACHE_ITEM_TTL, "data": json.dumps(data)})
+    return items + memberships
+
+
+def update_chain_ddb_items():
+    """
+    Rebuild the materialized chains and components from the connection cache and remove any that no longer exist.
+    """
+    try:
+        connection_items, complete = graph.query_connections()
+        if not complete:
+            print("connections could not all be read, chains are not rebuilt")
+            return
+        items = chain_ddb_items(connection_items)
+        content.put_ddb_items(items)
+        current = {item["arn"] for item in items}
+        ddb_resource = boto3.resource('dynamodb', config=MSAM_BOTO3_CONFIG)
+        ddb_table = ddb_resource.Table(cache.CONTENT_TABLE_NAME)
+        stale = [item["arn"] for service in (CHAIN_SERVICE, COMPONENT_SERVICE, MEMBER_SERVICE)
+                 for item in cache.query_by_service(ddb_table, service) if item["arn"] not in current]
+        with ddb_table.batch_writer() as batch:
+            for arn in stale:
+                batch.delete_item(Key={"arn": arn})
+        print(f"{len(items)} chain and component items stored, {len(stale)} removed")
+    except ClientError as error:
+        print(error)
+
+
+def chains_for_node(arn):
+    """
+    API entry point to return the materialized signal chains that include a node.
+    """
+    members = cache.cached_by_service_region(MEMBER_SERVICE, arn)
+    # the cache call returns an error message on failure
+    if not isinstance(members, list):
+        return members
+    return [{"arn": item["chain"], "region": "global", "service": CHAIN_SERVICE, "updated": item["updated"],
+             "expires": item["expires"], "data": item["data"]} for item in members]
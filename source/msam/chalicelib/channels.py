@@ -12,6 +12,7 @@ from boto3.dynamodb.conditions import Key
 from botocore.exceptions import ClientError
 from botocore.config import Config
 
+from chalicelib import batch
 import chalicelib.settings as msam_settings
 
 # table names generated by CloudFormation
@@ -27,6 +28,24 @@ DYNAMO_RESOURCE = boto3.resource("dynamodb", config=MSAM_BOTO3_CONFIG)
 
 CHANNEL_PROJECTION = "channel,id"
 
+
+def channel_node_ids(table, name):
+    """
+    Return the node IDs stored for a channel.
+    """
+    response = table.query(
+        ProjectionExpression=CHANNEL_PROJECTION,
+        KeyConditionExpression=Key('channel').eq(name))
+    items = response.get("Items", [])
+    while "LastEvaluatedKey" in response:
+        response = table.query(
+            ProjectionExpression=CHANNEL_PROJECTION,
+            KeyConditionExpression=Key('channel').eq(name),
+            ExclusiveStartKey=response["LastEvaluatedKey"])
+        items = items + response.get("Items", [])
+    return [item["id"] for item in items]
+
+
 def delete_channel_nodes(name):
     """
     API entry point to delete a channel.
@@ -42,28 +61,17 @@ def delete_channel_nodes(name):
         if name in name_list:
             name_list.remove(name)
             msam_settings.put_setting("channels", name_list)
+        response = {"message": "done"}
         # remove the members
         try:
-            response = table.query(
-                ProjectionExpression=CHANNEL_PROJECTION,
-                KeyConditionExpression=Key('channel').eq(name))
-            items = response.get("Items", [])
-            while "LastEvaluatedKey" in response:
-                response = table.query(
-                    ProjectionExpression=CHANNEL_PROJECTION,
-                    KeyConditionExpression=Key('channel').eq(name),
-                    ExclusiveStartKey=response["LastEvaluatedKey"])
-                items = items + response.get("Items", [])
-            # return the response or an empty object
-            for item in items:
-                table.delete_item(Key={
-                    "channel": item["channel"],
-                    "id": item["id"]
-                })
-            print("channel items deleted, channel list updated")
+            keys = [{"channel": name, "id": node_id} for node_id in channel_node_ids(table, name)]
+            unprocessed = batch.batch_write_items(CHANNELS_TABLE_NAME, delete_keys=keys)
+            if unprocessed:
+                response = {"exception": f"{len(unprocessed)} channel nodes not deleted"}
+            else:
+                print("channel items deleted, channel list updated")
         except ClientError:
             print("not found")
-        response = {"message": "done"}
     except ClientError as outer_error:
         # send the exception back in the object
         print(outer_error)
@@ -88,12 +96,10 @@ def set_channel_nodes(name, node_ids):
     try:
         name = unquote(name)
         table = DYNAMO_RESOURCE.Table(CHANNELS_TABLE_NAME)
-        # print(request.json_body)
-        # node_ids = request.json_body
-        # write the channel nodes to the database
-        for node_id in node_ids:
-            item = {"channel": name, "id": node_id}
-            table.put_item(Item=item)
+        # write only the nodes not already in the channel
+        current = set(channel_node_ids(table, name))
+        added = [node_id for node_id in dict.fromkeys(node_ids) if node_id not in current]
+        unprocessed = batch.batch_write_items(CHANNELS_TABLE_NAME, [{"channel": name, "id": node_id} for node_id in added])
         # update the list of channels in settings
         name_list = msam_settings.get_setting("channels")
         if not name_list:
@@ -102,6 +108,8 @@ def set_channel_nodes(name, node_ids):
             name_list.append(name)
             msam_settings.put_setting("channels", name_list)
         result = {"message": "saved"}
+        if unprocessed:
+            result = {"exception": f"{len(unprocessed)} channel nodes not saved"}
         print(result)
     except ClientError as error:
         # send the exception back in the object
@@ -110,6 +118,24 @@ def set_channel_nodes(name, node_ids):
     return result
 
 
+def channel_members():
+    """
+    Return the node IDs of every channel, keyed by channel name.
+    """
+    members = {name: [] for name in get_channel_list()}
+    table = DYNAMO_RESOURCE.Table(CHANNELS_TABLE_NAME)
+    response = table.scan(ProjectionExpression=CHANNEL_PROJECTION)
+    items = response.get("Items", [])
+    while "LastEvaluatedKey" in response:
+        response = table.scan(
+            ProjectionExpression=CHANNEL_PROJECTION,
+            ExclusiveStartKey=response["LastEvaluatedKey"])
+        items = items + response.get("Items", [])
+    for item in items:
+        members.setdefault(item["channel"], []).append(item["id"])
+    return members
+
+
 def get_channel_nodes(name):
     """
     API entry point to get the nodes for a given channel name.
@@ -155,12 +181,12 @@ def delete_all_channels():
                 ProjectionExpression=CHANNEL_PROJECTION,
                 ExclusiveStartKey=response["LastEvaluatedKey"])
             items = items + response.get("Items", [])
-        for item in items:
-            table.delete_item(Key={
-                "channel": item["channel"],
-                "id": item["id"]
-            })
+        unprocessed = batch.batch_write_items(CHANNELS_TABLE_NAME,
+                                              delete_keys=[{"channel": item["channel"], "id": item["id"]}
+                                                           for item in items])
         response = {"message": "done"}
+        if unprocessed:
+            response = {"exception": f"{len(unprocessed)} channel nodes not deleted"}
     except ClientError as client_error:
         print(client_error)
         response = {"message": str(client_error)}
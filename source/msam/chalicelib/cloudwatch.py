@@ -5,7 +5,9 @@ This file contains helper functions related to CloudWatch alarms.
 """
 
 import datetime
+import heapq
 import json
+import math
 import os
 import time
 from urllib.parse import unquote
@@ -16,6 +18,9 @@ from botocore.exceptions import ClientError
 from botocore.config import Config
 from jsonpath_ng import parse
 
+from chalicelib import concurrency
+from chalicelib import layout
+
 # table names generated by CloudFormation
 ALARMS_TABLE_NAME = os.environ["ALARMS_TABLE_NAME"]
 EVENTS_TABLE_NAME = os.environ["EVENTS_TABLE_NAME"]
@@ -26,11 +31,31 @@ SOLUTION_ID = os.environ['SOLUTION_ID']
 USER_AGENT_EXTRA = {"user_agent_extra": SOLUTION_ID}
 MSAM_BOTO3_CONFIG = Config(**USER_AGENT_EXTRA)
 
+# default width of an event count bucket in seconds
+EVENT_BUCKET_SECONDS = 60
+
+# buckets are widened to keep a response under this many
+EVENT_BUCKET_LIMIT = 1440
+
+# most events returned for one time bucket, newest first
+EVENT_BUCKET_EVENTS_LIMIT = 1000
+
+# most resources accepted by one multi-resource event request
+EVENT_RESOURCES_LIMIT = 200
+
+
+def state_changed(response, state):
+    """
+    Return whether a put replaced an alarm record in another state or created a new one.
+    """
+    return response.get("Attributes", {}).get("StateValue") != state
+
 
 def update_alarm_records(region_name, alarm, subscriber_arns):
     """
-    Update a single alarm's status in the table.
+    Update a single alarm's status in the table. Returns whether a record changed state.
     """
+    changed = False
     try:
         ddb_table_name = ALARMS_TABLE_NAME
         ddb_resource = boto3.resource('dynamodb', config=MSAM_BOTO3_CONFIG)
@@ -51,9 +76,11 @@ def update_alarm_records(region_name, alarm, subscriber_arns):
                 int(alarm['StateUpdatedTimestamp'].timestamp()),
                 "Updated": updated
             }
-            ddb_table.put_item(Item=item)
+            response = ddb_table.put_item(Item=item, ReturnValues="ALL_OLD")
+            changed = state_changed(response, alarm['StateValue']) or changed
     except ClientError as error:
         print(error)
+    return changed
 
 
 def update_alarm_subscriber(region_name, alarm_name, subscriber_arn):
@@ -80,7 +107,9 @@ def update_alarm_subscriber(region_name, alarm_name, subscriber_arn):
 def update_alarms(region_name, alarm_names):
     """
     Update a list of alarms' status in the alarms table for a given region.
+    Returns whether a subscribed alarm changed state.
     """
+    changed = False
     try:
         print(f"update alarms {alarm_names} in region {region_name}")
         cloudwatch = boto3.client('cloudwatch',
@@ -94,7 +123,7 @@ def update_alarms(region_name, alarm_names):
             print(f"alarm {alarm['AlarmName']}")
             subscribers = subscribers_to_alarm(alarm["AlarmName"], region_name)
             print(f"subscribers {subscribers}")
-            update_alarm_records(region_name, alarm, subscribers)
+            changed = update_alarm_records(region_name, alarm, subscribers) or changed
         while "NextToken" in response:
             response = cloudwatch.describe_alarms(
                 AlarmNames=alarm_names,
@@ -106,9 +135,37 @@ def update_alarms(region_name, alarm_names):
                 subscribers = subscribers_to_alarm(alarm["AlarmName"],
                                                    region_name)
                 print(f"subscribers {subscribers}")
-                update_alarm_records(region_name, alarm, subscribers)
+                changed = update_alarm_records(region_name, alarm, subscribers) or changed
     except ClientError as error:
         print(error)
+    return changed
+
+
+def query_alarms_for_subscriber(table, resource_arn):
+    """
+    Query the alarms table index for all alarms subscribed to by a node.
+    """
+    ddb_index_name = 'ResourceArnIndex'
+    scanned_items = []
+    response = table.query(
+        IndexName=ddb_index_name,
+        KeyConditionExpression=Key('ResourceArn').eq(resource_arn))
+    if "Items" in response:
+        scanned_items = response["Items"]
+    while "LastEvaluatedKey" in response:
+        response = table.query(
+            IndexName=ddb_index_name,
+            KeyConditionExpression=Key('ResourceArn').eq(resource_arn),
+            ExclusiveStartKey=response['LastEvaluatedKey'])
+        if "Items" in response:
+            scanned_items = scanned_items + response["Items"]
+    for item in scanned_items:
+        split_attr = item["RegionAlarmName"].split(':', maxsplit=1)
+        region = split_attr[0]
+        name = split_attr[1]
+        item["Region"] = region
+        item["AlarmName"] = name
+    return scanned_items
 
 
 def alarms_for_subscriber(resource_arn):
@@ -121,31 +178,55 @@ def alarms_for_subscriber(resource_arn):
         ddb_table_name = ALARMS_TABLE_NAME
         ddb_resource = boto3.resource('dynamodb', config=MSAM_BOTO3_CONFIG)
         ddb_table = ddb_resource.Table(ddb_table_name)
-        ddb_index_name = 'ResourceArnIndex'
-        response = ddb_table.query(
-            IndexName=ddb_index_name,
-            KeyConditionExpression=Key('ResourceArn').eq(resource_arn))
-        if "Items" in response:
-            scanned_items = response["Items"]
-        while "LastEvaluatedKey" in response:
-            response = ddb_table.query(
-                IndexName=ddb_index_name,
-                KeyConditionExpression=Key('ResourceArn').eq(resource_arn),
-                ExclusiveStartKey=response['LastEvaluatedKey'])
-            if "Items" in response:
-                scanned_items = scanned_items + response["Items"]
+        scanned_items = query_alarms_for_subscriber(ddb_table, resource_arn)
         print(scanned_items)
-        for item in scanned_items:
-            split_attr = item["RegionAlarmName"].split(':', maxsplit=1)
-            region = split_attr[0]
-            name = split_attr[1]
-            item["Region"] = region
-            item["AlarmName"] = name
     except ClientError as error:
         print(error)
     return scanned_items
 
 
+def alarms_for_subscribers(resource_arns):
+    """
+    API entry point to return a map of node ARN to subscribed alarms for many nodes.
+    The index is queried concurrently with a bounded pool of threads.
+    """
+    def subscriber_alarms(resource_arn):
+        try:
+            table = concurrency.thread_resource('dynamodb').Table(ALARMS_TABLE_NAME)
+            return query_alarms_for_subscriber(table, resource_arn)
+        except ClientError as error:
+            print(error)
+            return []
+
+    # drop duplicates but keep the caller's order
+    resource_arns = list(dict.fromkeys(resource_arns))
+    return dict(zip(resource_arns, concurrency.map_concurrent(subscriber_alarms, resource_arns)))
+
+
+def alarm_summaries_for_view(view):
+    """
+    API entry point to return alarm counts by state for every node on a diagram view with subscribed alarms.
+    """
+    summaries = []
+    view_layout = layout.get_view_layout(view)
+    # the layout call returns an exception object on failure
+    if isinstance(view_layout, list):
+        node_ids = [item["id"] for item in view_layout]
+        for resource_arn, alarms in alarms_for_subscribers(node_ids).items():
+            if not alarms:
+                continue
+            states = {}
+            for alarm in alarms:
+                state = alarm.get("StateValue", "UNKNOWN")
+                states[state] = states.get(state, 0) + 1
+            summaries.append({
+                "ResourceArn": resource_arn,
+                "AlarmCount": len(alarms),
+                "States": states
+            })
+    return summaries
+
+
 def all_subscribed_alarms():
     """
     API entry point to return a unique list of all subscribed alarms in the database.
@@ -267,6 +348,37 @@ def get_cloudwatch_events_state_source(state, source):
     return events
 
 
+def query_cloudwatch_events(table, resource_arn, start_time=0, end_time=0, limit=100):
+    """
+    Query the newest CloudWatch events for a resource from the given table, up to limit items.
+    """
+    cw_events = []
+    if (start_time > 0 and end_time > 0):
+        key = Key('resource_arn').eq(resource_arn) & Key(
+            'timestamp').between(start_time, end_time)
+    elif (start_time > 0 and end_time == 0):
+        key = Key('resource_arn').eq(resource_arn) & Key('timestamp').gte(
+            start_time)
+    else:
+        key = Key('resource_arn').eq(resource_arn)
+    response = table.query(KeyConditionExpression=key,
+        ScanIndexForward=False,
+        Limit=limit)
+    if "Items" in response:
+        cw_events = response["Items"]
+    remaining_items = limit - len(cw_events)
+    while "LastEvaluatedKey" in response and remaining_items > 0:
+        response = table.query(
+            KeyConditionExpression=key,
+            ExclusiveStartKey=response['LastEvaluatedKey'],
+            ScanIndexForward=False,
+            Limit=remaining_items)
+        if "Items" in response:
+            cw_events = cw_events + response["Items"]
+            remaining_items = limit - len(cw_events)
+    return cw_events
+
+
 def get_cloudwatch_events_resource(resource_arn, start_time=0, end_time=0, limit=100):
     """
     API entry point to retrieve all CloudWatch events related to a given resource.
@@ -278,38 +390,117 @@ def get_cloudwatch_events_resource(resource_arn, start_time=0, end_time=0, limit
         resource_arn = unquote(resource_arn)
         dynamodb = boto3.resource('dynamodb', config=MSAM_BOTO3_CONFIG)
         table = dynamodb.Table(CLOUDWATCH_EVENTS_TABLE_NAME)
-        key = None
-        if (start_time > 0 and end_time > 0):
-            key = Key('resource_arn').eq(resource_arn) & Key(
-                'timestamp').between(start_time, end_time)
-        elif (start_time > 0 and end_time == 0):
-            key = Key('resource_arn').eq(resource_arn) & Key('timestamp').gte(
-                start_time)
-        else:
-            key = Key('resource_arn').eq(resource_arn)
-        response = table.query(KeyConditionExpression=key,
-            ScanIndexForward=False,
-            Limit=limit)
-        if "Items" in response:
-            cw_events = response["Items"]
-        remaining_items = limit - len(cw_events)
-        while "LastEvaluatedKey" in response and remaining_items > 0:
-            response = table.query(
-                KeyConditionExpression=key,
-                ExclusiveStartKey=response['LastEvaluatedKey'],
-                ScanIndexForward=False,
-                Limit=remaining_items)
-            if "Items" in response:
-                cw_events = cw_events + response["Items"]
-                remaining_items = limit - len(cw_events)
+        cw_events = query_cloudwatch_events(table, resource_arn, start_time, end_time, limit)
     except ClientError as error:
         print(error)
     return cw_events
 
+
+def get_cloudwatch_events_resources(request):
+    """
+    API entry point to retrieve CloudWatch events for a list of resources in one call.
+    The per-resource queries run concurrently and the results are merged newest first.
+    """
+    body = request.json_body
+    start_time = int(body.get("start_time", 0))
+    end_time = int(body.get("end_time", 0))
+    # limit per resource cannot be more than 100, same as a single resource
+    limit = min(int(body.get("limit", 100)), 100)
+    # drop duplicates but keep the caller's order
+    resource_arns = list(dict.fromkeys(body.get("arns", [])))[:EVENT_RESOURCES_LIMIT]
+
+    def resource_events(resource_arn):
+        try:
+            table = concurrency.thread_resource('dynamodb').Table(CLOUDWATCH_EVENTS_TABLE_NAME)
+            return query_cloudwatch_events(table, resource_arn, start_time, end_time, limit)
+        except ClientError as error:
+            print(error)
+            return []
+
+    # each list is already sorted newest first
+    results = concurrency.map_concurrent(resource_events, resource_arns)
+    return list(heapq.merge(*results, key=lambda cw_event: cw_event["timestamp"], reverse=True))
+
+
+def cloudwatch_events_pages(key, **query_args):
+    """
+    Generator that yields each page of items from a CloudWatch events table query as it arrives.
+    """
+    dynamodb = boto3.resource('dynamodb', config=MSAM_BOTO3_CONFIG)
+    table = dynamodb.Table(CLOUDWATCH_EVENTS_TABLE_NAME)
+    response = table.query(KeyConditionExpression=key, **query_args)
+    yield response.get("Items", [])
+    while "LastEvaluatedKey" in response:
+        response = table.query(KeyConditionExpression=key,
+                               ExclusiveStartKey=response['LastEvaluatedKey'],
+                               **query_args)
+        yield response.get("Items", [])
+
+
+def get_cloudwatch_events_resource_buckets(resource_arn, start_time, end_time, bucket_size=EVENT_BUCKET_SECONDS):
+    """
+    API entry point to count CloudWatch events related to a given resource by type in fixed time buckets.
+    Times are epoch milliseconds like the event table's sort key, the bucket size is in seconds.
+    """
+    buckets = {}
+    total = 0
+    start_time = int(start_time)
+    end_time = int(end_time)
+    # widen the buckets if the window would produce too many of them
+    bucket_size = max(int(bucket_size), 1)
+    bucket_size = max(bucket_size, math.ceil((end_time - start_time) / (EVENT_BUCKET_LIMIT * 1000)))
+    bucket_millis = bucket_size * 1000
+    try:
+        resource_arn = unquote(resource_arn)
+        key = Key('resource_arn').eq(resource_arn) & Key('timestamp').between(start_time, end_time)
+        # only project what is needed for counting so pages stay small
+        for page in cloudwatch_events_pages(key,
+                                            ProjectionExpression="#ts,#tp",
+                                            ExpressionAttributeNames={"#ts": "timestamp", "#tp": "type"}):
+            for cw_event in page:
+                bucket_start = start_time + (int(cw_event["timestamp"]) - start_time) // bucket_millis * bucket_millis
+                bucket = buckets.setdefault(bucket_start, {"start": bucket_start, "end": bucket_start + bucket_millis - 1, "total": 0, "types": {}})
+                event_type = cw_event.get("type", "unknown")
+                bucket["types"][event_type] = bucket["types"].get(event_type, 0) + 1
+                bucket["total"] = bucket["total"] + 1
+                total = total + 1
+    except ClientError as error:
+        print(error)
+    return {
+        "resource_arn": resource_arn,
+        "start_time": start_time,
+        "end_time": end_time,
+        "bucket_size": bucket_size,
+        "total": total,
+        "buckets": [buckets[bucket_start] for bucket_start in sorted(buckets)]
+    }
+
+
+def get_cloudwatch_events_resource_bucket(resource_arn, bucket_start, bucket_size=EVENT_BUCKET_SECONDS):
+    """
+    API entry point to retrieve the CloudWatch events related to a given resource within one time bucket.
+    Only the newest EVENT_BUCKET_EVENTS_LIMIT events are returned, the bucket counts give the total.
+    """
+    cw_events = []
+    bucket_start = int(bucket_start)
+    bucket_end = bucket_start + max(int(bucket_size), 1) * 1000 - 1
+    try:
+        resource_arn = unquote(resource_arn)
+        key = Key('resource_arn').eq(resource_arn) & Key('timestamp').between(bucket_start, bucket_end)
+        for page in cloudwatch_events_pages(key, ScanIndexForward=False, Limit=EVENT_BUCKET_EVENTS_LIMIT):
+            cw_events = cw_events + page
+            if len(cw_events) >= EVENT_BUCKET_EVENTS_LIMIT:
+                break
+    except ClientError as error:
+        print(error)
+    return cw_events[:EVENT_BUCKET_EVENTS_LIMIT]
+
+
 def handle_subscribers(subscribers, ddb_table, region_alarm_name, namespace, updated, state, updated_timestamp):
     """
-    helper to record alarm subscribers
+    helper to record alarm subscribers, returns whether a record changed state
     """
+    changed = False
     for resource_arn in subscribers:
         item = {
             "RegionAlarmName": region_alarm_name,
@@ -319,14 +510,18 @@ def handle_subscribers(subscribers, ddb_table, region_alarm_name, namespace, upd
             "StateValue": state[0] if state else None,
             "Updated": updated_timestamp
         }
-        ddb_table.put_item(Item=item)
+        response = ddb_table.put_item(Item=item, ReturnValues="ALL_OLD")
+        changed = state_changed(response, item["StateValue"]) or changed
         print(f"{resource_arn} updated via alarm notification")
+    return changed
 
 def incoming_cloudwatch_alarm(event, _):
     """
     Standard AWS Lambda entry point for receiving CloudWatch alarm notifications.
+    Returns whether a subscribed alarm changed state.
     """
     print(event)
+    changed = False
     try:
         updated_timestamp = int(time.time())
         ddb_table_name = ALARMS_TABLE_NAME
@@ -353,10 +548,11 @@ def incoming_cloudwatch_alarm(event, _):
             region_alarm_name = f"{region}:{alarm_name[0] if alarm_name else None}"
             subscribers = subscribers_to_alarm(
                 alarm_name[0] if alarm_name else None, region)
-            handle_subscribers(subscribers, ddb_table, region_alarm_name, namespace, updated, state, updated_timestamp)
+            changed = handle_subscribers(subscribers, ddb_table, region_alarm_name, namespace, updated, state,
+                                         updated_timestamp) or changed
     except ClientError as error:
         print(error)
-    return True
+    return changed
 
 
 def subscribe_resource_to_alarm(request, alarm_name, region):
@@ -0,0 +1,103 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""
+This file contains helper functions for running independent API calls concurrently.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from botocore.config import Config
+
+# user-agent config
+SOLUTION_ID = os.environ['SOLUTION_ID']
+USER_AGENT_EXTRA = {"user_agent_extra": SOLUTION_ID}
+MSAM_BOTO3_CONFIG = Config(**USER_AGENT_EXTRA)
+
+# threads in the shared pool, also the default upper bound for one batch of calls
+MAX_WORKERS = 8
+
+# boto3 resources are not thread safe, each worker thread gets its own
+THREAD_STATE = threading.local()
+RESOURCE_LOCK = threading.Lock()
+
+# one pool lives as long as the Lambda container, so its threads keep their resources between calls
+EXECUTOR_STATE = {"executor": None}
+EXECUTOR_LOCK = threading.Lock()
+
+
+def thread_resource(service_name):
+    """
+    Return a boto3 resource for the service that is private to the calling thread.
+    """
+    resources = getattr(THREAD_STATE, "resources", None)
+    if resources is None:
+        resources = {}
+        THREAD_STATE.resources = resources
+    if service_name not in resources:
+        # the default session is shared, so create resources one at a time
+        with RESOURCE_LOCK:
+            resources[service_name] = boto3.resource(service_name, config=MSAM_BOTO3_CONFIG)
+    return resources[service_name]
+
+
+def mark_worker():
+    """
+    Flag a pool thread so calls made from it run inline instead of waiting on the pool they occupy.
+    """
+    THREAD_STATE.worker = True
+
+
+def executor():
+    """
+    Return the shared thread pool, creating it on first use.
+    """
+    with EXECUTOR_LOCK:
+        if EXECUTOR_STATE["executor"] is None:
+            EXECUTOR_STATE["executor"] = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="msam",
+                                                            initializer=mark_worker)
+        return EXECUTOR_STATE["executor"]
+
+
+def shutdown():
+    """
+    Stop the shared thread pool and drop the resources of its threads and the calling thread.
+    The next call starts a new pool.
+    """
+    THREAD_STATE.__dict__.pop("resources", None)
+    with EXECUTOR_LOCK:
+        pool = EXECUTOR_STATE["executor"]
+        EXECUTOR_STATE["executor"] = None
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+
+def map_concurrent(function, items, max_workers=MAX_WORKERS):
+    """
+    Call function once per item on at most max_workers threads of the shared pool and return the results
+    in item order. Calls made from a pool thread run inline.
+    """
+    items = list(items)
+    if not items:
+        return []
+    workers = max(1, min(max_workers, MAX_WORKERS, len(items)))
+    if workers == 1 or getattr(THREAD_STATE, "worker", False):
+        return [function(item) for item in items]
+    results = [None] * len(items)
+    pending = iter(enumerate(items))
+    pending_lock = threading.Lock()
+
+    def drain():
+        while True:
+            with pending_lock:
+                entry = next(pending, None)
+            if entry is None:
+                return
+            results[entry[0]] = function(entry[1])
+
+    # each task works through the shared list, so max_workers bounds the concurrency of this call
+    for future in [executor().submit(drain) for _ in range(workers)]:
+        future.result()
+    return results
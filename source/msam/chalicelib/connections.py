@@ -10,16 +10,60 @@ import re
 import time
 from urllib.parse import urlparse
 
+import boto3
+from boto3.dynamodb.conditions import Attr, Key
+from botocore.config import Config
 from botocore.exceptions import ClientError
 from difflib import SequenceMatcher
 from jsonpath_ng import parse
 
+from chalicelib import batch
 from chalicelib import cache
-from chalicelib import content
+from chalicelib import telemetry
 
 # TTL provided via CloudFormation
 CACHE_ITEM_TTL = int(os.environ["CACHE_ITEM_TTL"])
 
+# user-agent config
+SOLUTION_ID = os.environ['SOLUTION_ID']
+USER_AGENT_EXTRA = {"user_agent_extra": SOLUTION_ID}
+MSAM_BOTO3_CONFIG = Config(**USER_AGENT_EXTRA)
+
+# service names of all connection items in the cache
+CONNECTION_SERVICES = [
+    "cloudfront-distribution-medialive-input",
+    "link-device-medialive-input",
+    "mediaconnect-flow-mediaconnect-flow",
+    "mediaconnect-flow-medialive-input",
+    "medialive-channel-mediaconnect-flow",
+    "medialive-channel-medialive-input",
+    "medialive-channel-mediapackage-channel",
+    "medialive-channel-mediastore-container",
+    "medialive-channel-multiplex",
+    "medialive-channel-s3-bucket",
+    "medialive-input-medialive-channel",
+    "mediapackage-channel-mediapackage-origin-endpoint",
+    "mediapackage-origin-endpoint-cloudfront-distribution",
+    "mediapackage-origin-endpoint-mediatailor-configuration",
+    "mediapackage-origin-endpoint-speke-keyserver",
+    "mediastore-container-cloudfront-distribution",
+    "mediastore-container-medialive-input",
+    "mediastore-container-mediatailor-configuration",
+    "multiplex-mediaconnect-flow",
+    "s3-bucket-cloudfront-distribution",
+    "s3-bucket-medialive-input",
+    "s3-bucket-mediatailor-configuration",
+    "user-defined-connection"
+]
+
+# node types named differently in matcher function names and connection service names
+MATCHER_TYPE_NAMES = {
+    "medialive-multiplex": "multiplex",
+    "mediapackage-origin-endpoint": "mediapackage_endpoint"
+}
+CONNECTION_TYPE_NAMES = {
+    "medialive-multiplex": "multiplex"
+}
 
 def connection_item(arn, from_arn, to_arn, service, config):
     """
@@ -77,47 +121,99 @@ def fetch_running_pipelines_count(data):
     return pipelines_count
 
 
+def matchers():
+    """
+    Return the functions that find each type of connection, in the order they are updated.
+    """
+    return [
+        medialive_channel_mediapackage_channel_ddb_items,
+        medialive_channel_mediastore_container_ddb_items,
+        mediastore_container_medialive_input_ddb_items,
+        medialive_input_medialive_channel_ddb_items,
+        mediapackage_channel_mediapackage_endpoint_ddb_items,
+        s3_bucket_cloudfront_distribution_ddb_items,
+        s3_bucket_medialive_input_ddb_items,
+        cloudfront_distribution_medialive_input_ddb_items,
+        mediapackage_endpoint_cloudfront_distribution_by_tag_ddb_items,
+        mediapackage_endpoint_cloudfront_distribution_by_origin_url_ddb_items,
+        mediapackage_endpoint_speke_keyserver_ddb_items,
+        mediaconnect_flow_medialive_input_ddb_items,
+        mediaconnect_flow_mediaconnect_flow_ddb_items,
+        mediapackage_endpoint_mediatailor_configuration_ddb_items,
+        s3_bucket_mediatailor_configuration_ddb_items,
+        mediastore_container_mediatailor_configuration_ddb_items,
+        medialive_channel_multiplex_ddb_items,
+        multiplex_mediaconnect_flow_ddb_items,
+        mediastore_container_cloudfront_distribution_ddb_items,
+        medialive_channel_s3_bucket_ddb_items,
+        link_device_medialive_input_ddb_items,
+        medialive_channel_medialive_input_ddb_items,
+        medialive_channel_mediaconnect_flow_ddb_items,
+    ]
+
+
 def update_connection_ddb_items():
     """
     Update all connections in the cache.
     """
     try:
-        content.put_ddb_items(
-            medialive_channel_mediapackage_channel_ddb_items())
-        content.put_ddb_items(
-            medialive_channel_mediastore_container_ddb_items())
-        content.put_ddb_items(mediastore_container_medialive_input_ddb_items())
-        content.put_ddb_items(medialive_input_medialive_channel_ddb_items())
-        content.put_ddb_items(
-            mediapackage_channel_mediapackage_endpoint_ddb_items())
-        content.put_ddb_items(s3_bucket_cloudfront_distribution_ddb_items())
-        content.put_ddb_items(s3_bucket_medialive_input_ddb_items())
-        content.put_ddb_items(
-            cloudfront_distribution_medialive_input_ddb_items())
-        content.put_ddb_items(
-            mediapackage_endpoint_cloudfront_distribution_by_tag_ddb_items())
-        content.put_ddb_items(
-            mediapackage_endpoint_cloudfront_distribution_by_origin_url_ddb_items(
-            ))
-        content.put_ddb_items(
-            mediapackage_endpoint_speke_keyserver_ddb_items())
-        content.put_ddb_items(mediaconnect_flow_medialive_input_ddb_items())
-        content.put_ddb_items(mediaconnect_flow_mediaconnect_flow_ddb_items())
-        content.put_ddb_items(
-            mediapackage_endpoint_mediatailor_configuration_ddb_items())
-        content.put_ddb_items(s3_bucket_mediatailor_configuration_ddb_items())
-        content.put_ddb_items(
-            mediastore_container_mediatailor_configuration_ddb_items())
-        content.put_ddb_items(medialive_channel_multiplex_ddb_items())
-        content.put_ddb_items(multiplex_mediaconnect_flow_ddb_items())
-        content.put_ddb_items(
-            mediastore_container_cloudfront_distribution_ddb_items())
-        content.put_ddb_items(medialive_channel_s3_bucket_ddb_items())
-        content.put_ddb_items(link_device_medialive_input_ddb_items())
-        content.put_ddb_items(medialive_channel_medialive_input_ddb_items())
-        content.put_ddb_items(medialive_channel_mediaconnect_flow_ddb_items())
+        for matcher in matchers():
+            telemetry.put_measured(matcher.__name__[:-len("_ddb_items")], "global", matcher)
+    except ClientError as error:
+        print(error)
+
+def node_matchers(service):
+    """
+    Return the matchers that find connections of a type of node.
+    """
+    name = MATCHER_TYPE_NAMES.get(service, service.replace("-", "_"))
+    return [matcher for matcher in matchers() if name in matcher.__name__]
+
+
+def cached_node_connections(arn, service):
+    """
+    Retrieve the discovered connection items that start or end at a node.
+    """
+    ddb_resource = boto3.resource('dynamodb', config=MSAM_BOTO3_CONFIG)
+    ddb_table = ddb_resource.Table(cache.CONTENT_TABLE_NAME)
+    type_name = CONNECTION_TYPE_NAMES.get(service, service)
+    items = []
+    for connection_service in [name for name in CONNECTION_SERVICES if type_name in name]:
+        query_args = {
+            "IndexName": "ServiceRegionIndex",
+            "KeyConditionExpression": Key("service").eq(connection_service) & Key("region").eq("global"),
+            "FilterExpression": Attr("from").eq(arn) | Attr("to").eq(arn)
+        }
+        response = ddb_table.query(**query_args)
+        items = items + response["Items"]
+        while "LastEvaluatedKey" in response:
+            response = ddb_table.query(ExclusiveStartKey=response["LastEvaluatedKey"], **query_args)
+            items = items + response["Items"]
+    return items
+
+
+def refresh_node_connections(arn, service, deleted=False):
+    """
+    Update the connection items of one node changed outside a discovery pass.
+    Only the matchers for the node's type are run and only connections that start or end
+    at the node are written or removed. All connections of a deleted node are removed.
+    """
+    try:
+        found = {}
+        if not deleted:
+            for matcher in node_matchers(service):
+                for item in matcher():
+                    if arn in (item["from"], item["to"]):
+                        found[item["arn"]] = item
+        stale = [{"arn": item["arn"]} for item in cached_node_connections(arn, service) if item["arn"] not in found]
+        unprocessed = batch.batch_write_items(cache.CONTENT_TABLE_NAME, list(found.values()), stale)
+        if unprocessed:
+            return {"exception": f"{len(unprocessed)} connection changes not saved"}
+        return {"message": "refreshed", "connections": len(found), "removed": len(stale)}
     except ClientError as error:
         print(error)
+        return {"exception": str(error)}
+
 
 def parse_data_list(list_to_parse):
     """
@@ -246,7 +342,7 @@ def medialive_channel_mediapackage_channel_ddb_items():
             # if setting is empty, we have to connect medialive with mediapackage via channel ID
             if destination["MediaPackageSettings"]:
                 items += ml_to_mp_via_channel_id(ml_channel_data, destination, mediapackage_ch_cached, ml_service_name)
-                break
+                continue
             # otherwise we check via URL endpoints
             items += ml_to_mp_via_url(ml_channel_data, destination, mediapackage_ch_cached, ml_service_name)
     except ClientError as error:
@@ -749,6 +845,7 @@ def mediaconnect_flow_medialive_input_ddb_items():
     try:
         # get MediaConnect flows
         mediaconnect_flows_cached = cache.cached_by_service("mediaconnect-flow")
+        medialive_in_cached = None
         # process each flow
         for flow, flow_output in ((flow, flow_output) for flow in mediaconnect_flows_cached for flow_output in json.loads(flow["data"])["Outputs"]):
             flow_data = json.loads(flow["data"])
@@ -766,9 +863,10 @@ def mediaconnect_flow_medialive_input_ddb_items():
                         flow_data["FlowArn"],
                         flow_output["MediaLiveInputArn"],
                         connection_type, config))
-                break
+                continue
             # for each output, look for the matching MediaLive input
-            medialive_in_cached = cache.cached_by_service("medialive-input")
+            if medialive_in_cached is None:
+                medialive_in_cached = cache.cached_by_service("medialive-input")
             # iterate over all medialive inputs
             for ml_input, destination in ((ml_input, destination) for ml_input in medialive_in_cached for destination in json.loads(ml_input["data"])["Destinations"]):
                 ml_input_data = json.loads(ml_input["data"])
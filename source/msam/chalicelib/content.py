@@ -4,7 +4,9 @@
 This file contains helper functions related to the content DynamoDB table.
 """
 
+import concurrent.futures
 import os
+import queue
 
 import boto3
 from botocore.config import Config
@@ -20,14 +22,54 @@ SOLUTION_ID = os.environ['SOLUTION_ID']
 USER_AGENT_EXTRA = {"user_agent_extra": SOLUTION_ID}
 MSAM_BOTO3_CONFIG = Config(**USER_AGENT_EXTRA)
 
+# cache items waiting for the writer thread, bounds memory when discovery is faster than writes
+WRITE_QUEUE_SIZE = 100
+QUEUE_WAIT_SECONDS = 1
+WRITE_DONE = object()
+
 def put_ddb_items(items):
     """
-    Add a list of cache items to the content (cache) DynamoDB table.
+    Add cache items from a list or generator to the content (cache) DynamoDB table.
+    Items are written in batches on another thread while the caller produces more.
     """
-    ddb_table_name = CONTENT_TABLE_NAME
-    # shared resource and table
-    ddb_resource = boto3.resource('dynamodb', config=MSAM_BOTO3_CONFIG)
-    ddb_table = ddb_resource.Table(ddb_table_name)
-    for item in items:
-        ddb_table.put_item(Item=item)
+    # the writer thread gets a table of its own session, made here while the caller's thread
+    # is the only one using it, since sessions and their resources are not thread safe
+    session = boto3.session.Session()
+    ddb_table = session.resource('dynamodb', config=MSAM_BOTO3_CONFIG).Table(CONTENT_TABLE_NAME)
+    pending = queue.Queue(maxsize=WRITE_QUEUE_SIZE)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        writer = executor.submit(write_ddb_items, ddb_table, pending)
+        try:
+            for item in items:
+                if not queue_item(pending, item, writer):
+                    break
+        finally:
+            # items produced before an error are still written
+            queue_item(pending, WRITE_DONE, writer)
+        writer.result()
     return True
+
+
+def queue_item(pending, item, writer):
+    """
+    Wait for room in the write queue. Returns False if the writer stopped.
+    """
+    while not writer.done():
+        try:
+            pending.put(item, timeout=QUEUE_WAIT_SECONDS)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def write_ddb_items(ddb_table, pending):
+    """
+    Write queued cache items to the table with BatchWriteItem until the done marker is received.
+    """
+    # 25 items per request, unprocessed items are resent by the batch writer
+    with ddb_table.batch_writer(overwrite_by_pkeys=["arn"]) as batch:
+        item = pending.get()
+        while item is not WRITE_DONE:
+            batch.put_item(Item=item)
+            item = pending.get()
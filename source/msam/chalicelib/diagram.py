@@ -0,0 +1,45 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""
+This file contains helper functions for assembling a complete diagram view in one call.
+"""
+
+from urllib.parse import unquote
+
+from chalicelib import cache
+from chalicelib import cloudwatch
+from chalicelib import graph
+from chalicelib import layout
+from chalicelib import notes
+
+
+def view_connections(node_arns):
+    """
+    Return the cached connections whose both ends are in the set of node ARNs.
+    """
+    return [item for item in graph.cached_connections() if item.get("from") in node_arns and item.get("to") in node_arns]
+
+
+def hydrated_view(view):
+    """
+    API entry point to return the layout, cached nodes, connections, alarms and notes of a diagram view.
+    """
+    view_layout = layout.get_view_layout(view)
+    # the layout call returns an exception object on failure
+    if not isinstance(view_layout, list):
+        return view_layout
+    node_arns = list(dict.fromkeys(item["id"] for item in view_layout))
+    nodes = cache.cached_by_arns(node_arns)
+    if not isinstance(nodes, list):
+        nodes = []
+    edges = view_connections(set(node_arns))
+    alarms = {arn: items for arn, items in cloudwatch.alarms_for_subscribers(node_arns).items() if items}
+    resource_notes = notes.get_resource_notes_batch(node_arns + [edge["arn"] for edge in edges])
+    return {
+        "view": unquote(view),
+        "layout": view_layout,
+        "nodes": nodes,
+        "connections": edges,
+        "alarms": alarms,
+        "notes": resource_notes
+    }
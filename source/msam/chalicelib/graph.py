@@ -0,0 +1,184 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""
+This file contains helper functions for querying the connection graph held in the cache.
+"""
+
+import threading
+import time
+from collections import deque
+from urllib.parse import unquote
+
+from botocore.exceptions import ClientError
+
+from chalicelib import cache
+from chalicelib import concurrency
+from chalicelib import connections
+
+# traversal depth used when the request does not give one
+DEFAULT_DEPTH = 10
+
+# deepest traversal allowed in one request
+MAX_DEPTH = 50
+
+DOWNSTREAM = "downstream"
+UPSTREAM = "upstream"
+
+# connections and their index are reused until they are this old, the periodic update rewrites them every minute
+CONNECTION_CACHE_SECONDS = 60
+
+CONNECTION_CACHE = {"updated": 0, "items": None, "index": None}
+CONNECTION_LOCK = threading.Lock()
+
+
+def query_connections():
+    """
+    Return every connection item in the cache, querying the connection services concurrently,
+    and whether every service was read.
+    """
+    def service_connections(service):
+        try:
+            table = concurrency.thread_resource('dynamodb').Table(cache.CONTENT_TABLE_NAME)
+            return cache.query_by_service(table, service)
+        except ClientError as error:
+            print(error)
+            return None
+
+    found = []
+    complete = True
+    for items in concurrency.map_concurrent(service_connections, connections.CONNECTION_SERVICES):
+        if items is None:
+            complete = False
+        else:
+            found = found + items
+    return found, complete
+
+
+def connection_snapshot():
+    """
+    Return the connection items and their adjacency index, queried again once CONNECTION_CACHE_SECONDS old.
+    A snapshot missing a service is not kept.
+    """
+    now = time.time()
+    with CONNECTION_LOCK:
+        if CONNECTION_CACHE["items"] is not None and now - CONNECTION_CACHE["updated"] < CONNECTION_CACHE_SECONDS:
+            return dict(CONNECTION_CACHE)
+        items, complete = query_connections()
+        snapshot = {"updated": now, "items": items, "index": adjacency_index(items)}
+        if complete:
+            CONNECTION_CACHE.update(snapshot)
+        return snapshot
+
+
+def cached_connections():
+    """
+    Return every connection item in the cache. The list is shared between requests and must not be changed.
+    """
+    return connection_snapshot()["items"]
+
+
+def connection_index():
+    """
+    Return the adjacency index of every connection in the cache, shared between requests.
+    """
+    return connection_snapshot()["index"]
+
+
+def adjacency_index(items):
+    """
+    Index connection items by the ARN at each end, keyed by traversal direction.
+    """
+    index = {DOWNSTREAM: {}, UPSTREAM: {}}
+    for item in items:
+        from_arn = item.get("from")
+        to_arn = item.get("to")
+        if not from_arn or not to_arn:
+            continue
+        index[DOWNSTREAM].setdefault(from_arn, []).append(item)
+        index[UPSTREAM].setdefault(to_arn, []).append(item)
+    return index
+
+
+def neighbor(item, direction):
+    """
+    Return the ARN at the far end of a connection for the traversal direction.
+    """
+    return item["to"] if direction == DOWNSTREAM else item["from"]
+
+
+def parse_depth(value):
+    """
+    Convert a depth query parameter into a traversal depth between 1 and MAX_DEPTH.
+    """
+    try:
+        depth = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_DEPTH
+    return max(1, min(depth, MAX_DEPTH))
+
+
+def traverse(index, arn, direction, depth):
+    """
+    Walk the index breadth-first from an ARN and return the nodes and connections within the depth.
+    """
+    depths = {arn: 0}
+    edges = {}
+    queue = deque([arn])
+    while queue:
+        current = queue.popleft()
+        if depths[current] >= depth:
+            continue
+        for item in index[direction].get(current, []):
+            edges.setdefault(item["arn"], item)
+            following = neighbor(item, direction)
+            if following not in depths:
+                depths[following] = depths[current] + 1
+                queue.append(following)
+    return {
+        "arn": arn,
+        "direction": direction,
+        "depth": depth,
+        "nodes": [{"arn": node, "depth": distance} for node, distance in depths.items() if node != arn],
+        "connections": list(edges.values())
+    }
+
+
+def shortest_path(index, from_arn, to_arn):
+    """
+    Return the fewest connections leading downstream from one ARN to another, or an empty list.
+    """
+    previous = {from_arn: None}
+    queue = deque([from_arn])
+    while queue and to_arn not in previous:
+        current = queue.popleft()
+        for item in index[DOWNSTREAM].get(current, []):
+            if item["to"] not in previous:
+                previous[item["to"]] = item
+                queue.append(item["to"])
+    if to_arn not in previous or from_arn == to_arn:
+        return []
+    path = []
+    current = to_arn
+    while previous[current] is not None:
+        path.append(previous[current])
+        current = previous[current]["from"]
+    return list(reversed(path))
+
+
+def connected_nodes(arn, direction, depth=None):
+    """
+    API entry point to return the nodes and connections upstream or downstream of an ARN.
+    """
+    arn = unquote(arn)
+    return traverse(connection_index(), arn, direction, parse_depth(depth))
+
+
+def connection_path(from_arn, to_arn):
+    """
+    API entry point to return the shortest downstream path of connections between two ARNs.
+    """
+    from_arn = unquote(from_arn)
+    to_arn = unquote(to_arn)
+    edges = shortest_path(connection_index(), from_arn, to_arn)
+    nodes = [from_arn] + [item["to"] for item in edges] if edges else []
+    return {"from": from_arn, "to": to_arn, "nodes": nodes, "connections": edges}
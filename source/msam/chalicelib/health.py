@@ -0,0 +1,162 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""
+This file contains helper functions for rolling up alarm and alert health along the connection graph.
+"""
+
+import os
+import threading
+import time
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+from chalicelib import channels
+from chalicelib import cloudwatch
+from chalicelib import graph
+
+# table names generated by CloudFormation
+CONTENT_TABLE_NAME = os.environ["CONTENT_TABLE_NAME"]
+
+# user-agent config
+SOLUTION_ID = os.environ['SOLUTION_ID']
+USER_AGENT_EXTRA = {"user_agent_extra": SOLUTION_ID}
+MSAM_BOTO3_CONFIG = Config(**USER_AGENT_EXTRA)
+
+# content table item counting alarm and alert state changes, the event Lambdas update it too
+HEALTH_VERSION_ARN = "msam-health-version"
+
+# a rollup is reused until the version changes or it is this old, connections and tiles change without a version update
+HEALTH_CACHE_SECONDS = 60
+
+# most upstream causes listed for one impacted node
+MAX_IMPACT_CAUSES = 20
+
+# alarm states counted for each tile, only alarms in the ALARM state make a node unhealthy
+ALARM_STATES = ["ALARM", "OK", "INSUFFICIENT_DATA"]
+
+HEALTH_CACHE = {"version": None, "updated": 0, "health": None}
+HEALTH_LOCK = threading.Lock()
+
+
+def health_version():
+    """
+    Return the current alarm and alert state change counter, or None if it cannot be read.
+    """
+    try:
+        ddb_resource = boto3.resource('dynamodb', config=MSAM_BOTO3_CONFIG)
+        ddb_table = ddb_resource.Table(CONTENT_TABLE_NAME)
+        response = ddb_table.get_item(Key={"arn": HEALTH_VERSION_ARN})
+        if "Item" in response:
+            return int(response["Item"].get("version", 0))
+        return 0
+    except ClientError as error:
+        print(error)
+        return None
+
+
+def invalidate_health():
+    """
+    Increment the alarm and alert state change counter so every API instance recomputes its rollup.
+    """
+    try:
+        ddb_resource = boto3.resource('dynamodb', config=MSAM_BOTO3_CONFIG)
+        ddb_table = ddb_resource.Table(CONTENT_TABLE_NAME)
+        ddb_table.update_item(Key={"arn": HEALTH_VERSION_ARN}, UpdateExpression="ADD version :one",
+                              ExpressionAttributeValues={":one": 1})
+    except ClientError as error:
+        print(error)
+
+
+def node_health(alarm_counts, alert_counts, index):
+    """
+    Return the health of every node with alarms or alerts and of every node downstream of one.
+    Nodes that are healthy and not impacted are left out.
+    """
+    nodes = {}
+    for arn in sorted(set(alarm_counts) | set(alert_counts)):
+        nodes[arn] = {"alarms": alarm_counts.get(arn, 0), "alerts": alert_counts.get(arn, 0), "status": "unhealthy",
+                      "impacted_by": []}
+    for cause in list(nodes):
+        for reached in graph.traverse(index, cause, graph.DOWNSTREAM, graph.MAX_DEPTH)["nodes"]:
+            entry = nodes.setdefault(reached["arn"], {"alarms": 0, "alerts": 0, "status": "impacted",
+                                                      "impacted_by": []})
+            if len(entry["impacted_by"]) < MAX_IMPACT_CAUSES:
+                entry["impacted_by"].append(cause)
+    return nodes
+
+
+def tile_health(members, nodes, state_counts=None):
+    """
+    Return the aggregate health of each tile from its member node IDs, the node health map
+    and the subscribed alarm counts of each node by alarm state.
+    """
+    state_counts = state_counts or {}
+    tiles = {}
+    for name, node_ids in members.items():
+        found = [nodes[arn] for arn in node_ids if arn in nodes]
+        unhealthy = len([entry for entry in found if entry["status"] == "unhealthy"])
+        status = "ok"
+        if unhealthy:
+            status = "unhealthy"
+        elif found:
+            status = "impacted"
+        tiles[name] = {
+            "nodes": len(node_ids),
+            "alarms": sum(entry["alarms"] for entry in found),
+            "alarm_states": {state: sum(state_counts.get(state, {}).get(arn, 0) for arn in node_ids)
+                             for state in ALARM_STATES},
+            "alerts": sum(entry["alerts"] for entry in found),
+            "unhealthy": unhealthy,
+            "impacted": len(found) - unhealthy,
+            "status": status
+        }
+    return tiles
+
+
+def compute_health():
+    """
+    Build the node and tile health maps from subscribed alarms, active alerts, connections and tiles.
+    """
+    state_counts = {}
+    for state in ALARM_STATES:
+        state_counts[state] = {entry["ResourceArn"]: int(entry["AlarmCount"])
+                               for entry in cloudwatch.subscribed_with_state(state)}
+    alert_counts = {}
+    for event in cloudwatch.get_cloudwatch_events_state("set"):
+        alert_counts[event["resource_arn"]] = alert_counts.get(event["resource_arn"], 0) + 1
+    nodes = node_health(state_counts["ALARM"], alert_counts, graph.connection_index())
+    return {"nodes": nodes, "channels": tile_health(channels.channel_members(), nodes, state_counts)}
+
+
+def get_health():
+    """
+    API entry point to return the node and tile health rollup, recomputed after alarm or alert state changes.
+    """
+    try:
+        version = health_version()
+        now = time.time()
+        with HEALTH_LOCK:
+            if version is not None and HEALTH_CACHE["version"] == version and \
+                    now - HEALTH_CACHE["updated"] < HEALTH_CACHE_SECONDS:
+                return HEALTH_CACHE["health"]
+            health = compute_health()
+            health["version"] = version
+            health["updated"] = int(now)
+            HEALTH_CACHE.update({"version": version, "updated": now, "health": health})
+            return health
+    except ClientError as error:
+        print(error)
+        return {"message": str(error)}
+
+
+def get_channel_health():
+    """
+    API entry point to return the health of every tile, taken from the node and tile health rollup.
+    """
+    health = get_health()
+    # the rollup call returns an error message on failure
+    if "channels" not in health:
+        return health
+    return health["channels"]
@@ -0,0 +1,122 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""
+This file contains helper functions for reading the node inventory from an AWS Config aggregator.
+"""
+
+import json
+
+from chalicelib import account
+
+# AWS Config resource types for the cache services that Config can provide
+CONFIG_RESOURCE_TYPES = {
+    "s3": "AWS::S3::Bucket",
+    "cloudfront-distribution": "AWS::CloudFront::Distribution",
+    "ec2-instance": "AWS::EC2::Instance",
+    "mediatailor-configuration": "AWS::MediaTailor::PlaybackConfiguration"
+}
+
+# results requested per SelectAggregateResourceConfig call, the API maximum
+SELECT_LIMIT = 100
+
+SELECT_FIELDS = "arn, resourceId, resourceName, awsRegion, accountId, configuration, tags"
+
+
+def pascal_case(value):
+    """
+    Capitalize dictionary keys at every level so Config items match the describe API shape.
+    """
+    if isinstance(value, dict):
+        return {key[:1].upper() + key[1:]: pascal_case(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [pascal_case(item) for item in value]
+    return value
+
+
+def tag_map(tags):
+    """
+    Convert a Config tag list into the key and value dictionary used in the cache.
+    """
+    return {tag["key"]: tag["value"] for tag in tags or []}
+
+
+def s3_node(resource):
+    """
+    Convert a Config S3 bucket into the ARN and shape of a ListBuckets entry.
+    """
+    name = resource["resourceName"]
+    config = {
+        "Name": name,
+        "CreationDate": resource.get("configuration", {}).get("creationDate"),
+        "Tags": tag_map(resource.get("tags"))
+    }
+    return f"arn:{account.partition()}:s3:::{name}", config
+
+
+def cloudfront_node(resource):
+    """
+    Convert a Config CloudFront distribution into the ARN and shape of a ListDistributions entry.
+    """
+    config = pascal_case(resource.get("configuration", {}))
+    # list entries carry the distribution settings at the top level
+    config.update(config.pop("DistributionConfig", {}))
+    config["ARN"] = resource["arn"]
+    config["Tags"] = tag_map(resource.get("tags"))
+    return resource["arn"], config
+
+
+def ec2_node(resource):
+    """
+    Convert a Config EC2 instance into the ARN and shape of a DescribeInstances entry.
+    """
+    config = pascal_case(resource.get("configuration", {}))
+    config["Tags"] = tag_map(resource.get("tags"))
+    arn = "arn:aws:ec2-instance:" + resource["awsRegion"] + "::" + resource["resourceId"]
+    return arn, config
+
+
+def mediatailor_node(resource):
+    """
+    Convert a Config MediaTailor playback configuration into the shape of GetPlaybackConfiguration.
+    """
+    config = pascal_case(resource.get("configuration", {}))
+    config["PlaybackConfigurationArn"] = resource["arn"]
+    config["Tags"] = tag_map(resource.get("tags"))
+    return resource["arn"], config
+
+
+CONFIG_NODE_CONVERTERS = {
+    "s3": s3_node,
+    "cloudfront-distribution": cloudfront_node,
+    "ec2-instance": ec2_node,
+    "mediatailor-configuration": mediatailor_node
+}
+
+
+def select_resources(client, aggregator, expression):
+    """
+    Run an advanced query against a Config aggregator and yield each result page as it arrives.
+    """
+    query_args = {
+        "Expression": expression,
+        "ConfigurationAggregatorName": aggregator,
+        "Limit": SELECT_LIMIT
+    }
+    response = client.select_aggregate_resource_config(**query_args)
+    yield [json.loads(result) for result in response["Results"]]
+    while response.get("NextToken"):
+        response = client.select_aggregate_resource_config(NextToken=response["NextToken"], **query_args)
+        yield [json.loads(result) for result in response["Results"]]
+
+
+def config_nodes(client, aggregator, service, region):
+    """
+    Yield the ARN and configuration of every resource of a cache service recorded by a Config aggregator,
+    one result page at a time. Global services are returned from all regions.
+    """
+    expression = f"SELECT {SELECT_FIELDS} WHERE resourceType = '{CONFIG_RESOURCE_TYPES[service]}'"
+    if region != "global":
+        expression = expression + f" AND awsRegion = '{region}'"
+    for page in select_resources(client, aggregator, expression):
+        for resource in page:
+            yield CONFIG_NODE_CONVERTERS[service](resource)
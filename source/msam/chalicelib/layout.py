@@ -7,6 +7,7 @@ This file contains helper functions related to layout.
 import os
 from urllib.parse import unquote
 
+from chalicelib import batch
 import chalicelib.settings as msam_settings
 
 import boto3
@@ -42,6 +43,10 @@ def get_view_layout(view):
             # return the response or an empty object
             if "Items" in response:
                 items = response["Items"]
+            while "LastEvaluatedKey" in response:
+                response = table.query(KeyConditionExpression=Key('view').eq(view),
+                                       ExclusiveStartKey=response["LastEvaluatedKey"])
+                items = items + response.get("Items", [])
             print("retrieved")
         except ClientError:
             print("not found")
@@ -57,15 +62,14 @@ def set_node_layout(layout_items):
     API entry point for setting nodes in a view. This adds new nodes and overwrites existing nodes. It does not replace the entire set.
     """
     settings = {}
-    table_name = LAYOUT_TABLE_NAME
     try:
-        table = DYNAMO_RESOURCE.Table(table_name)
-        # print(request.json_body)
-        # layout_items = request.json_body
+        # a key may appear only once in a batch, the last position wins
+        positions = {(item["view"], item["id"]): item for item in layout_items}
         # write to the database in batch
-        for item in layout_items:
-            table.put_item(Item=item)
+        unprocessed = batch.batch_write_items(LAYOUT_TABLE_NAME, list(positions.values()))
         settings = {"message": "saved"}
+        if unprocessed:
+            settings = {"exception": f"{len(unprocessed)} node positions not saved"}
         print(settings)
     except ClientError as error:
         # send the exception back in the object
@@ -95,6 +99,25 @@ def delete_node_layout(view, node_id):
     return settings
 
 
+def delete_node_layouts(layout_keys):
+    """
+    API entry point for removing many nodes from views in one call.
+    """
+    settings = {}
+    try:
+        keys = {(item["view"], item["id"]): {"view": item["view"], "id": item["id"]} for item in layout_keys}
+        unprocessed = batch.batch_write_items(LAYOUT_TABLE_NAME, delete_keys=list(keys.values()))
+        settings = {"message": "deleted"}
+        if unprocessed:
+            settings = {"exception": f"{len(unprocessed)} node positions not deleted"}
+        print(settings)
+    except ClientError as error:
+        # send the exception back in the object
+        print(error)
+        settings = {"exception": str(error)}
+    return settings
+
+
 def has_node(view, node_id):
     """
     API entry point to check presence of nodes in a view.
@@ -136,9 +159,11 @@ def remove_all_diagrams():
                 ProjectionExpression="#v,#i",
                 ExclusiveStartKey=response["LastEvaluatedKey"])
             items = items + response.get("Items", [])
-        for item in items:
-            table.delete_item(Key={"view": item["view"], "id": item["id"]})
+        unprocessed = batch.batch_write_items(LAYOUT_TABLE_NAME, delete_keys=[{"view": item["view"], "id": item["id"]}
+                                                                              for item in items])
         response = {"message": "done"}
+        if unprocessed:
+            response = {"exception": f"{len(unprocessed)} node positions not deleted"}
     except ClientError as client_error:
         print(client_error)
         response = {"message": str(client_error)}
@@ -7,6 +7,7 @@ This file contains helper functions for building the node cache.
 import json
 import os
 import time
+from decimal import Decimal
 from urllib.parse import urlparse
 
 import boto3
@@ -15,16 +16,50 @@ from botocore.exceptions import ClientError
 from botocore.exceptions import EndpointConnectionError
 from jsonpath_ng import parse
 
-from chalicelib import content
+from chalicelib import account
+from chalicelib import batch
 from chalicelib import cache
+from chalicelib import concurrency
+from chalicelib import inventory
+from chalicelib import settings as msam_settings
+from chalicelib import telemetry
+from chalicelib import throttle
 
 # TTL provided via CloudFormation
 CACHE_ITEM_TTL = int(os.environ["CACHE_ITEM_TTL"])
 
 SOLUTION_ID = os.environ['SOLUTION_ID']
 USER_AGENT_EXTRA = {"user_agent_extra": SOLUTION_ID}
-# used to handle throttling, be very patient and back off a lot if needed
-MSAM_BOTO3_CONFIG = Config(retries={'max_attempts': 15}, **USER_AGENT_EXTRA)
+# calls are paced by the throttle module, so botocore retries only a few times
+MSAM_BOTO3_CONFIG = Config(retries={'max_attempts': 5, 'mode': 'standard'}, **USER_AGENT_EXTRA)
+
+# settings with call rate ceilings for discovery and the throttle statistics of recent passes
+RATE_LIMITS_SETTING = "discovery-rate-limits"
+THROTTLE_STATS_SETTING = "discovery-throttle-stats"
+
+# setting that selects an AWS Config aggregator instead of describe calls per service,
+# ex. {"aggregator": "media-aggregator", "services": {"s3": "config"}}
+INVENTORY_BACKENDS_SETTING = "inventory-backends"
+CONFIG_BACKEND = "config"
+
+# setting that selects how tags are retrieved for services supported by the tagging API
+TAG_BACKEND_SETTING = "tag-backend"
+TAGGING_API_BACKEND = "tagging-api"
+
+# setting with the tag keys that select EC2 instances for the cache, all instances are cached when unset
+EC2_TAG_KEYS_SETTING = "ec2-tag-keys"
+
+# EC2 instance states kept in the cache, terminated instances are left out
+EC2_INSTANCE_STATES = ["pending", "running", "shutting-down", "stopping", "stopped"]
+
+# instances requested per DescribeInstances call, the API maximum
+EC2_PAGE_SIZE = 1000
+
+# tag key that selects SSM managed instances for the cache
+SSM_NODE_TYPE_TAG = "MSAM-NodeType"
+
+# values allowed in one GetInventory filter
+INVENTORY_FILTER_LIMIT = 40
 
 
 def print_no_region():
@@ -38,191 +73,201 @@ def update_regional_ddb_items(region_name):
     """
     Update all services in the cache for a region.
     """
+    apply_rate_limits()
     try:
         print("medialive-input")
-        content.put_ddb_items(medialive_input_ddb_items(region_name))
+        telemetry.put_measured("medialive-input", region_name, lambda: medialive_input_ddb_items(region_name))
     except (ClientError, EndpointConnectionError) as error:
         print(error)
     try:
         print("medialive-channel")
-        content.put_ddb_items(medialive_channel_ddb_items(region_name))
+        telemetry.put_measured("medialive-channel", region_name, lambda: medialive_channel_ddb_items(region_name))
     except (ClientError, EndpointConnectionError) as error:
         print(error)
     try:
         print("medialive-multiplex")
-        content.put_ddb_items(medialive_multiplex_ddb_items(region_name))
+        telemetry.put_measured("medialive-multiplex", region_name, lambda: medialive_multiplex_ddb_items(region_name))
     except (ClientError, EndpointConnectionError) as error:
         print(error)
     try:
         print("mediapackage-channel")
-        content.put_ddb_items(mediapackage_channel_ddb_items(region_name))
+        telemetry.put_measured("mediapackage-channel", region_name, lambda: mediapackage_channel_ddb_items(region_name))
     except (ClientError, EndpointConnectionError) as error:
         print(error)
     try:
         print("mediapackage-origin-endpoint")
-        content.put_ddb_items(mediapackage_origin_endpoint_ddb_items(region_name))
+        telemetry.put_measured(
+            "mediapackage-origin-endpoint", region_name, lambda: mediapackage_origin_endpoint_ddb_items(region_name))
     except (ClientError, EndpointConnectionError) as error:
         print(error)
     try:
         print("mediastore-container")
-        content.put_ddb_items(mediastore_container_ddb_items(region_name))
+        telemetry.put_measured("mediastore-container", region_name, lambda: mediastore_container_ddb_items(region_name))
     except (ClientError, EndpointConnectionError) as error:
         print(error)
     try:
         print("speke-server")
-        content.put_ddb_items(speke_server_ddb_items(region_name))
+        telemetry.put_measured("speke-server", region_name, lambda: speke_server_ddb_items(region_name))
     except (ClientError, EndpointConnectionError) as error:
         print(error)
     try:
         print("mediaconnect-flow")
-        content.put_ddb_items(mediaconnect_flow_ddb_items(region_name))
+        telemetry.put_measured("mediaconnect-flow", region_name, lambda: mediaconnect_flow_ddb_items(region_name))
     except ClientError as error:
         print(error)
     try:
         print("mediatailor-configuration")
-        content.put_ddb_items(mediatailor_configuration_ddb_items(region_name))
+        telemetry.put_measured("mediatailor-configuration", region_name, lambda: discovered_ddb_items(
+            "mediatailor-configuration", region_name, mediatailor_configuration_ddb_items, region_name))
     except ClientError as error:
         print(error)
     try:
         print("ec2-instances")
-        content.put_ddb_items(ec2_instance_ddb_items(region_name))
+        telemetry.put_measured("ec2-instances", region_name, lambda: discovered_ddb_items(
+            "ec2-instance", region_name, ec2_instance_ddb_items, region_name))
     except ClientError as error:
         print(error)
     try:
         print("link-devices")
-        content.put_ddb_items(link_device_ddb_items(region_name))
+        telemetry.put_measured("link-devices", region_name, lambda: link_device_ddb_items(region_name))
     except ClientError as error:
         print(error)
+    save_throttle_stats()
 
 
 def update_regional_ssm_ddb_items(region_name):
     """
     Update ssm nodes in the cache for a region.
     """
+    apply_rate_limits()
     try:
         print("ssm-managed-instances")
-        content.put_ddb_items(ssm_managed_instance_ddb_items(region_name))
+        telemetry.put_measured("ssm-managed-instances", region_name, lambda: ssm_managed_instance_ddb_items(region_name))
     except ClientError as error:
         print(error)
+    save_throttle_stats()
 
 
 def update_global_ddb_items():
     """
     Update all global services in the cache.
     """
+    apply_rate_limits()
     try:
         print("s3-bucket")
-        content.put_ddb_items(s3_bucket_ddb_items())
+        telemetry.put_measured("s3-bucket", "global", lambda: discovered_ddb_items("s3", "global", s3_bucket_ddb_items))
     except (ClientError, EndpointConnectionError) as error:
         print(error)
     try:
         print("cloudfront-distribution")
-        content.put_ddb_items(cloudfront_distribution_ddb_items())
+        telemetry.put_measured("cloudfront-distribution", "global", lambda: discovered_ddb_items(
+            "cloudfront-distribution", "global", cloudfront_distribution_ddb_items))
     except (ClientError, EndpointConnectionError) as error:
         print(error)
+    save_throttle_stats()
+
+
+def discovered_ddb_items(service, region, describe_items, *args):
+    """
+    Return the cache items for a service from the AWS Config aggregator if selected in the settings,
+    otherwise from the describe_items function.
+    """
+    backends = msam_settings.get_setting(INVENTORY_BACKENDS_SETTING)
+    if isinstance(backends, dict) and backends.get("aggregator") and service in inventory.CONFIG_RESOURCE_TYPES \
+            and backends.get("services", {}).get(service) == CONFIG_BACKEND:
+        client = discovery_client("config", "global")
+        config_nodes = inventory.config_nodes(client, backends["aggregator"], service, region)
+        if service == "ec2-instance":
+            # Config records every instance, keep the ones that describe_instances would return
+            config_nodes = filter(ec2_config_selector(), config_nodes)
+        return (node_to_ddb_item(arn, service, region, config) for arn, config in config_nodes)
+    return describe_items(*args)
 
 
 def s3_bucket_ddb_items():
     """
     Retrieve and format S3 buckets for cache storage.
     """
-    items = []
     for bucket in s3_buckets():
-        arn = f'arn:aws:s3:::{bucket["Name"]}'
+        arn = f'arn:{account.partition()}:s3:::{bucket["Name"]}'
         service = "s3"
-        items.append(node_to_ddb_item(arn, service, "global", bucket))
-    return items
+        yield node_to_ddb_item(arn, service, "global", bucket)
 
 
 def cloudfront_distribution_ddb_items():
     """
     Retrieve and format CloudFront distributions for cache storage.
     """
-    items = []
     for item in cloudfront_distributions():
         arn = item["ARN"]
         service = "cloudfront-distribution"
-        items.append(node_to_ddb_item(arn, service, "global", item))
-    return items
+        yield node_to_ddb_item(arn, service, "global", item)
 
 
 def medialive_channel_ddb_items(region):
     """
     Retrieve and format MediaLive channels for cache storage.
     """
-    items = []
     for channel in medialive_channels(region):
         arn = channel["Arn"]
         service = "medialive-channel"
-        items.append(node_to_ddb_item(arn, service, region, channel))
-    return items
+        yield node_to_ddb_item(arn, service, region, channel)
 
 
 def medialive_input_ddb_items(region):
     """
     Retrieve and format MediaLive inputs for cache storage.
     """
-    items = []
     for ml_input in medialive_inputs(region):
         arn = ml_input["Arn"]
         service = "medialive-input"
-        items.append(node_to_ddb_item(arn, service, region, ml_input))
-    return items
+        yield node_to_ddb_item(arn, service, region, ml_input)
 
 
 def medialive_multiplex_ddb_items(region):
     """
     Retrieve and format MediaLive inputs for cache storage.
     """
-    items = []
     for multiplex in medialive_multiplexes(region):
         arn = multiplex["Arn"]
         service = "medialive-multiplex"
-        items.append(node_to_ddb_item(arn, service, region, multiplex))
-    return items
+        yield node_to_ddb_item(arn, service, region, multiplex)
 
 
 def mediapackage_channel_ddb_items(region):
     """
     Retrieve and format MediaPackage channels for cache storage.
     """
-    items = []
     for channel in mediapackage_channels(region):
         arn = channel["Arn"]
         service = "mediapackage-channel"
-        items.append(node_to_ddb_item(arn, service, region, channel))
-    return items
+        yield node_to_ddb_item(arn, service, region, channel)
 
 
 def mediapackage_origin_endpoint_ddb_items(region):
     """
     Retrieve and format MediaPackage endpoints for cache storage.
     """
-    items = []
     for endpoint in mediapackage_origin_endpoints(region):
         arn = endpoint["Arn"]
         service = "mediapackage-origin-endpoint"
-        items.append(node_to_ddb_item(arn, service, region, endpoint))
-    return items
+        yield node_to_ddb_item(arn, service, region, endpoint)
 
 
 def mediastore_container_ddb_items(region):
     """
     Retrieve and format MediaPackage endpoints for cache storage.
     """
-    items = []
     for container in mediastore_containers(region):
         arn = container["ARN"]
         service = "mediastore-container"
-        items.append(node_to_ddb_item(arn, service, region, container))
-    return items
+        yield node_to_ddb_item(arn, service, region, container)
 
 
 def speke_server_ddb_items(region):
     """
     Find the SPEKE key servers based on MediaPackage endpoint configurations
     """
-    items = []
     # create an expression to find speke server urls
     jsonpath_expr = parse('$..SpekeKeyProvider.Url')
     # get MediaPackage origin endpoints
@@ -236,68 +281,148 @@ def speke_server_ddb_items(region):
             config = {"arn": arn, "endpoint": server_url, "scheme": parsed.scheme}
             service = "speke-keyserver"
             # print(config)
-            items.append(node_to_ddb_item(arn, service, "global", config))
-    return items
+            yield node_to_ddb_item(arn, service, "global", config)
 
 
 def mediaconnect_flow_ddb_items(region):
     """
     Retrieve and format MediaConnect flows for cache storage.
     """
-    items = []
     for mc_flow in mediaconnect_flows(region):
         arn = mc_flow["FlowArn"]
         service = "mediaconnect-flow"
-        items.append(node_to_ddb_item(arn, service, region, mc_flow))
-    return items
+        yield node_to_ddb_item(arn, service, region, mc_flow)
 
 
 def mediatailor_configuration_ddb_items(region):
     """
     Retrieve and format MediaTailor configuration for cache storage.
     """
-    items = []
     for config in mediatailor_configurations(region):
         arn = config["PlaybackConfigurationArn"]
         service = "mediatailor-configuration"
-        items.append(node_to_ddb_item(arn, service, region, config))
-    return items
+        yield node_to_ddb_item(arn, service, region, config)
 
 
 def ssm_managed_instance_ddb_items(region):
     """
     Retrieve and format SSM managed instances for cache storage.
     """
-    items = []
+    prefix = f"arn:{account.partition()}:ssm-managed-instance:{region}:{account.account_id()}:instance/"
     for managed_instance in ssm_managed_instances(region):
-        account_id = boto3.client('sts').get_caller_identity().get('Account')
-        arn = "arn:aws:ssm-managed-instance:" + region + ":" + account_id + ":instance/" + managed_instance['Id']
+        arn = prefix + managed_instance['Id']
         service = "ssm-managed-instance"
-        items.append(node_to_ddb_item(arn, service, region, managed_instance))
-    return items
+        yield node_to_ddb_item(arn, service, region, managed_instance)
 
 
 def ec2_instance_ddb_items(region):
     """
     Retrieve and format EC2 instances for cache storage.
     """
-    items = []
     for ec2_instance in ec2_instances(region):
         arn = "arn:aws:ec2-instance:" + region + "::" + ec2_instance['InstanceId']
         service = "ec2-instance"
-        items.append(node_to_ddb_item(arn, service, region, ec2_instance))
-    return items
+        yield node_to_ddb_item(arn, service, region, ec2_instance)
 
 def link_device_ddb_items(region):
     """
     Retrieve and format Elemental Link devices for cache storage.
     """
-    items = []
     for link_device in link_devices(region):
         arn = link_device["Arn"]
         service = "link-device"
-        items.append(node_to_ddb_item(arn, service, region, link_device))
-    return items
+        yield node_to_ddb_item(arn, service, region, link_device)
+
+
+def discovery_client(service_name, region):
+    """
+    Create a boto3 client for discovery with its calls paced per service and region.
+    """
+    if region == "global":
+        service = boto3.client(service_name, config=MSAM_BOTO3_CONFIG)
+    else:
+        service = boto3.client(service_name, region_name=region, config=MSAM_BOTO3_CONFIG)
+    return throttle.register(service, service_name, region)
+
+
+def apply_rate_limits():
+    """
+    Load the discovery call rate ceilings from the settings table.
+    """
+    throttle.configure(msam_settings.get_setting(RATE_LIMITS_SETTING))
+
+
+def save_throttle_stats():
+    """
+    Merge the throttle statistics since the last save into the settings table.
+    """
+    try:
+        saved = msam_settings.get_setting(THROTTLE_STATS_SETTING)
+        if not isinstance(saved, dict):
+            saved = {}
+        for key, value in throttle.stats(reset=True).items():
+            value["updated"] = int(time.time())
+            # DynamoDB does not accept float values
+            saved[key] = json.loads(json.dumps(value), parse_float=Decimal)
+        msam_settings.put_setting(THROTTLE_STATS_SETTING, saved)
+    except ClientError as error:
+        print(error)
+
+
+def enrich_items(service_name, region, function, items):
+    """
+    Call function for each item concurrently, with fewer workers while the service is throttling.
+    Results are returned in item order.
+    """
+    bucket = throttle.token_bucket(service_name, region)
+    return concurrency.map_concurrent(function, items, max_workers=bucket.concurrency())
+
+
+def tagging_api_enabled():
+    """
+    Return True if tags are retrieved in bulk with the Resource Groups Tagging API.
+    """
+    return msam_settings.get_setting(TAG_BACKEND_SETTING) == TAGGING_API_BACKEND
+
+
+def region_resource_tags(service, resource_type, tag_keys=None):
+    """
+    Retrieve the tags of all resources of a type in a region with paginated GetResources calls
+    on that region's tagging API client. If tag keys are given, only resources with one of
+    the keys are included. Returns a map of ARN to tags.
+    """
+    query_args = {"ResourceTypeFilters": [resource_type]}
+    if tag_keys:
+        query_args["TagFilters"] = [{"Key": key} for key in tag_keys]
+    response = service.get_resources(**query_args)
+    mappings = response["ResourceTagMappingList"]
+    # the last page has an empty token
+    while "PaginationToken" in response and response["PaginationToken"]:
+        response = service.get_resources(PaginationToken=response["PaginationToken"], **query_args)
+        mappings = mappings + response["ResourceTagMappingList"]
+    return {mapping["ResourceARN"]: {tag["Key"]: tag["Value"] for tag in mapping["Tags"]} for mapping in mappings}
+
+
+def bulk_resource_tags(resource_type, regions=None):
+    """
+    Return a map of ARN to tags for a resource type when the tagging API backend is enabled.
+    All enabled regions are searched unless regions are given. Resources without tags are
+    not in the map. Returns None if tags must be retrieved per resource instead.
+    """
+    if not tagging_api_enabled():
+        return None
+    try:
+        if regions is None:
+            regions = [region["RegionName"] for region in cache.regions() if region["RegionName"] != "global"]
+        # boto3 client creation is not thread safe, the clients are created here and shared with the workers
+        clients = {region: discovery_client("resourcegroupstaggingapi", region) for region in regions}
+        tags = {}
+        for region_tags in concurrency.map_concurrent(lambda region: region_resource_tags(clients[region], resource_type), regions):
+            tags.update(region_tags)
+        return tags
+    except (ClientError, EndpointConnectionError) as error:
+        print(error)
+        return None
 
 
 def node_to_ddb_item(arn, service, region, config):
@@ -309,19 +434,32 @@ def node_to_ddb_item(arn, service, region, config):
     return item
 
 
+def list_pages(method, key, **kwargs):
+    """
+    Call a List or Describe API and yield the items of each page as it arrives.
+    The same arguments are passed with every NextToken.
+    """
+    response = method(**kwargs)
+    yield response[key]
+    while "NextToken" in response:
+        response = method(NextToken=response["NextToken"], **kwargs)
+        yield response[key]
+
+
 def cloudfront_distributions():
     """
     Retrieve all CloudFront distributions (global).
     Tags retrieved.
     """
-    service = boto3.client("cloudfront", config=MSAM_BOTO3_CONFIG)
-    response = service.list_distributions()
-    items = response["DistributionList"]["Items"]
-    while "NextMarker" in response["DistributionList"]:
-        response = service.list_distributions(Marker=response["DistributionList"]["NextMarker"])
-        items = items + response["DistributionList"]["Items"]
-    for item in items:
+    service = discovery_client("cloudfront", "global")
+    # CloudFront tags are only available from us-east-1
+    bulk_tags = bulk_resource_tags("cloudfront:distribution", ["us-east-1"])
+
+    def add_tags(item):
         item['LastModifiedTime'] = str(item['LastModifiedTime'])
+        if bulk_tags is not None:
+            item["Tags"] = bulk_tags.get(item["ARN"], {})
+            return item
         try:
             response = service.list_tags_for_resource(Resource=item["ARN"])
             item["Tags"] = {}
@@ -330,16 +468,30 @@ def cloudfront_distributions():
                     item["Tags"][tag["Key"]] = tag["Value"]
         except ClientError as error:
             print(error)
-    return items
+        return item
+
+    response = service.list_distributions()
+    yield from enrich_items("cloudfront", "global", add_tags, response["DistributionList"].get("Items", []))
+    while "NextMarker" in response["DistributionList"]:
+        response = service.list_distributions(Marker=response["DistributionList"]["NextMarker"])
+        yield from enrich_items("cloudfront", "global", add_tags, response["DistributionList"].get("Items", []))
 
 
 def s3_buckets():
     """
     Retrieve all S3 buckets (global).
     """
-    service = boto3.client("s3", config=MSAM_BOTO3_CONFIG)
+    service = discovery_client("s3", "global")
     buckets = service.list_buckets()
-    for item in buckets["Buckets"]:
+    bulk_tags = bulk_resource_tags("s3")
+    if bulk_tags is not None:
+        for item in buckets["Buckets"]:
+            item["CreationDate"] = str(item["CreationDate"])
+            item["Tags"] = bulk_tags.get(f'arn:{account.partition()}:s3:::{item["Name"]}', {})
+            yield item
+        return
+
+    def add_tags(item):
         item["CreationDate"] = str(item["CreationDate"])
         try:
             response = service.get_bucket_tagging(Bucket=item["Name"])
@@ -349,7 +501,9 @@ def s3_buckets():
                     item["Tags"][tag["Key"]] = tag["Value"]
         except ClientError:
             pass
-    return buckets["Buckets"]
+        return item
+
+    yield from enrich_items("s3", "global", add_tags, buckets["Buckets"])
 
 
 def mediapackage_channels(region):
@@ -357,20 +511,15 @@ def mediapackage_channels(region):
     Return the MediaPackage channels for the given region.
     Tags included.
     """
-    items = []
     service_name = 'mediapackage'
-    if region in boto3.Session().get_available_regions(service_name):
-        service = boto3.client(service_name, region_name=region, config=MSAM_BOTO3_CONFIG)
+    if region in account.service_regions(service_name):
+        service = discovery_client(service_name, region)
         jsonpath_expr = parse('$..Password')
-        response = service.list_channels()
-        items = items + response['Channels']
-        while "NextToken" in response:
-            response = service.list_channels(NextToken=response["NextToken"])
-            items = items + response['Channels']
-        jsonpath_expr.update(items, "XXXXXXXXXXXX")
+        for page in list_pages(service.list_channels, 'Channels'):
+            jsonpath_expr.update(page, "XXXXXXXXXXXX")
+            yield from page
     else:
         print_no_region()
-    return items
 
 
 def mediapackage_origin_endpoints(region):
@@ -378,18 +527,13 @@ def mediapackage_origin_endpoints(region):
     Return the MediaPackage origin endpoints for the given region.
     Tags included.
     """
-    items = []
     service_name = 'mediapackage'
-    if region in boto3.Session().get_available_regions(service_name):
-        service = boto3.client(service_name, region_name=region, config=MSAM_BOTO3_CONFIG)
-        response = service.list_origin_endpoints()
-        items = items + response['OriginEndpoints']
-        while "NextToken" in response:
-            response = service.list_origin_endpoints(NextToken=response["NextToken"])
-            items = items + response['OriginEndpoints']
+    if region in account.service_regions(service_name):
+        service = discovery_client(service_name, region)
+        for page in list_pages(service.list_origin_endpoints, 'OriginEndpoints'):
+            yield from page
     else:
         print_no_region()
-    return items
 
 
 def medialive_channels(region):
@@ -397,18 +541,13 @@ def medialive_channels(region):
     Return the MediaLive channels for the given region.
     Tags included.
     """
-    items = []
     service_name = "medialive"
-    if region in boto3.Session().get_available_regions(service_name):
-        service = boto3.client(service_name, region_name=region, config=MSAM_BOTO3_CONFIG)
-        response = service.list_channels()
-        items = items + response['Channels']
-        while "NextToken" in response:
-            response = service.list_channels(NextToken=response["NextToken"])
-            items = items + response['Channels']
+    if region in account.service_regions(service_name):
+        service = discovery_client(service_name, region)
+        for page in list_pages(service.list_channels, 'Channels'):
+            yield from page
     else:
         print_no_region()
-    return items
 
 
 def medialive_inputs(region):
@@ -416,18 +555,13 @@ def medialive_inputs(region):
     Return the MediaLive inputs for the given region.
     Tags included.
     """
-    items = []
     service_name = "medialive"
-    if region in boto3.Session().get_available_regions(service_name):
-        service = boto3.client(service_name, region_name=region, config=MSAM_BOTO3_CONFIG)
-        response = service.list_inputs()
-        items = items + response['Inputs']
-        while "NextToken" in response:
-            response = service.list_inputs(NextToken=response["NextToken"])
-            items = items + response['Inputs']
+    if region in account.service_regions(service_name):
+        service = discovery_client(service_name, region)
+        for page in list_pages(service.list_inputs, 'Inputs'):
+            yield from page
     else:
         print_no_region()
-    return items
 
 
 def medialive_multiplexes(region):
@@ -435,26 +569,19 @@ def medialive_multiplexes(region):
     Return the MediaLive Multiplexes for the given region.
     Tags included.
     """
-    items = []
     service_name = "medialive"
-    if region in boto3.Session().get_available_regions(service_name):
-        service = boto3.client(service_name, region_name=region, config=MSAM_BOTO3_CONFIG)
-        lm_response = service.list_multiplexes()
-        for multiplex in lm_response["Multiplexes"]:
-            multiplex_id = multiplex["Id"]
-            plex_response = service.describe_multiplex(MultiplexId=multiplex_id)
+    if region in account.service_regions(service_name):
+        service = discovery_client(service_name, region)
+
+        def describe(multiplex):
+            plex_response = service.describe_multiplex(MultiplexId=multiplex["Id"])
             del plex_response['ResponseMetadata']
-            items.append(plex_response)
-        while "NextToken" in lm_response:
-            lm_response = service.list_multiplexes(NextToken=lm_response["NextToken"])
-            for multiplex in lm_response["Multiplexes"]:
-                multiplex_id = multiplex["Id"]
-                plex_response = service.describe_multiplex(MultiplexId=multiplex_id)
-                del plex_response['ResponseMetadata']
-                items.append(plex_response)
+            return plex_response
+
+        for page in list_pages(service.list_multiplexes, "Multiplexes"):
+            yield from enrich_items(service_name, region, describe, page)
     else:
         print_no_region()
-    return items
 
 
 def mediastore_containers(region):
@@ -462,22 +589,20 @@ def mediastore_containers(region):
     Return the MediaStore containers for the given region.
     Supports tags.
     """
-    items = []
     service_name = "mediastore"
-    if region in boto3.Session().get_available_regions(service_name):
-        service = boto3.client(service_name, region_name=region, config=MSAM_BOTO3_CONFIG)
-        response = service.list_containers()
-        items = items + response['Containers']
-        while "NextToken" in response:
-            response = service.list_containers(NextToken=response["NextToken"])
-            items = items + response['Containers']
-        for item in items:
+    if region in account.service_regions(service_name):
+        service = discovery_client(service_name, region)
+
+        def add_tags(item):
             response = service.list_tags_for_resource(Resource=item['ARN'])
             item['Tags'] = response['Tags']
             item['CreationTime'] = str(item['CreationTime'])
+            return item
+
+        for page in list_pages(service.list_containers, 'Containers'):
+            yield from enrich_items(service_name, region, add_tags, page)
     else:
         print_no_region()
-    return items
 
 
 def mediaconnect_flows(region):
@@ -485,30 +610,36 @@ def mediaconnect_flows(region):
     Return the MediaConnect flows for the given region.
     Supports tags.
     """
-    items = []
     service_name = 'mediaconnect'
-    if region not in boto3.Session().get_available_regions(service_name):
+    if region not in account.service_regions(service_name):
         print_no_region()
-        return items
-    service = boto3.client(service_name, region_name=region, config=MSAM_BOTO3_CONFIG)
-    response = service.list_flows()
-    flows = response['Flows']
-    while "NextToken" in response:
-        response = service.list_flows(NextToken=response["NextToken"])
-        flows = flows + response['Flows']
-    for flow in flows:
+        return
+    service = discovery_client(service_name, region)
+    bulk_tags = bulk_resource_tags("mediaconnect:flow", [region])
+
+    def describe(flow):
         try:
             flow_details = service.describe_flow(FlowArn=flow['FlowArn'])
+        except ClientError as error:
+            print(error)
+            return None
+        try:
             if "VpcInterfaces" in flow_details["Flow"]:
                 flow_details["Flow"]["VpcSubnet"]={}
                 for interface in flow_details["Flow"]["VpcInterfaces"]:
                     flow_details["Flow"]["VpcSubnet"][interface["Name"]]=interface["SubnetId"]
-            response = service.list_tags_for_resource(ResourceArn=flow["FlowArn"])
-            flow_details["Flow"]["Tags"] = response["Tags"]
+            if bulk_tags is not None:
+                flow_details["Flow"]["Tags"] = bulk_tags.get(flow["FlowArn"], {})
+            else:
+                response = service.list_tags_for_resource(ResourceArn=flow["FlowArn"])
+                flow_details["Flow"]["Tags"] = response["Tags"]
         except ClientError as error:
             print(error)
-        items.append(flow_details['Flow'])
-    return items
+        return flow_details['Flow']
+
+    for page in list_pages(service.list_flows, 'Flows'):
+        # flows that could not be described are skipped
+        yield from (item for item in enrich_items(service_name, region, describe, page) if item is not None)
 
 
 def mediatailor_configurations(region):
@@ -516,106 +647,162 @@ def mediatailor_configurations(region):
     Return the MediaTailor configurations for the given region.
     Tags included.
     """
-    items = []
     service_name = 'mediatailor'
-    if region in boto3.Session().get_available_regions(service_name):
-        service = boto3.client(service_name, region_name=region, config=MSAM_BOTO3_CONFIG)
-        response = service.list_playback_configurations()
-        configs = response['Items']
-        while "NextToken" in response:
-            response = service.list_playback_configurations(NextToken=response["NextToken"])
-            configs = configs + response['Items']
-        for config in configs:
+    if region in account.service_regions(service_name):
+        service = discovery_client(service_name, region)
+
+        def describe(config):
             response = service.get_playback_configuration(Name=config['Name'])
             if 'ResponseMetadata' in response:
                 del response['ResponseMetadata']
-            items.append(response)
+            return response
+
+        for page in list_pages(service.list_playback_configurations, 'Items'):
+            yield from enrich_items(service_name, region, describe, page)
     else:
         print_no_region()
-    return items
+
+
+def managed_instance_tags(region):
+    """
+    Retrieve the tags of the managed instances in a region that have the MSAM-NodeType tag.
+    Returns a map of instance ID to tags, or None if tags must be read per instance instead.
+    """
+    try:
+        service = discovery_client("resourcegroupstaggingapi", region)
+        tags = region_resource_tags(service, "ssm:managed-instance", [SSM_NODE_TYPE_TAG])
+    except (ClientError, EndpointConnectionError) as error:
+        print(error)
+        return None
+    # the tagging API covers managed instances, but newly tagged instances can be missing
+    # from its index for a while, so an empty answer is checked per instance
+    if not tags:
+        print(f"no tagged managed instances found with the tagging API in {region}, reading tags per instance")
+        return None
+    return {arn.split("/")[-1]: value for arn, value in tags.items()}
 
 
 def ssm_managed_instances(region):
     """
-    Retrieve resources like on-prem encoders stored in SSM with MSAM specific tags.
+    Retrieve resources like on-prem encoders stored in SSM with the MSAM-NodeType tag.
     """
-    items = []
-    devices = []
     service_name = 'ssm'
-    if region not in boto3.Session().get_available_regions(service_name):
+    if region not in account.service_regions(service_name):
         print_no_region()
-        return items
-    service = boto3.client(service_name, region_name=region, config=MSAM_BOTO3_CONFIG)
-    response = service.get_inventory(Filters=[
+        return
+    service = discovery_client(service_name, region)
+    # hybrid/on prem machines that are not terminated
+    filters = [
             {
                 'Key': 'AWS:InstanceInformation.InstanceStatus',
                 'Values': [
                     'Terminated',
                 ],
                 'Type': 'NotEqual'
+            },
+            {
+                'Key': 'AWS:InstanceInformation.ResourceType',
+                'Values': [
+                    'ManagedInstance',
+                ],
+                'Type': 'Equal'
             }
-    ])
-    devices = devices + response['Entities']
-    while "NextToken" in response:
-        response = service.get_inventory(NextToken=response["NextToken"])
-        devices = devices + response['Entities']
-    for device in devices:
-        #process hybrid/on prem machines
-        device['Tags'] = {}
-        if device['Id'].startswith('mi-'):
-            device_tags = service.list_tags_for_resource(ResourceType='ManagedInstance', ResourceId=device['Id'])
-            #check for MSAM-NodeType is present, then store this as a node
-            if 'TagList' in device_tags:
-                for tag in device_tags['TagList']:
+    ]
+    instance_tags = managed_instance_tags(region)
+    if instance_tags is None:
+        pages = list_pages(service.get_inventory, 'Entities', Filters=filters)
+    else:
+        # only the tagged instances are requested, a filter accepts a limited number of values
+        pages = (page for instance_ids in batch.chunks(sorted(instance_tags), INVENTORY_FILTER_LIMIT)
+                 for page in list_pages(service.get_inventory, 'Entities', Filters=filters + [{
+                     'Key': 'AWS:InstanceInformation.InstanceId',
+                     'Values': instance_ids,
+                     'Type': 'Equal'
+                 }]))
+    for devices in pages:
+        for device in devices:
+            if instance_tags is None:
+                device['Tags'] = {}
+                device_tags = service.list_tags_for_resource(ResourceType='ManagedInstance', ResourceId=device['Id'])
+                for tag in device_tags.get('TagList', []):
                     #reformat tags before adding to device data
                     device['Tags'][tag['Key']] = tag['Value']
-            items.append(device)
-    return items
+            else:
+                device['Tags'] = instance_tags.get(device['Id'], {})
+            #check for MSAM-NodeType is present, then store this as a node
+            if SSM_NODE_TYPE_TAG in device['Tags']:
+                yield device
+
+
+def ec2_tag_keys():
+    """
+    Return the tag keys that select EC2 instances for the cache, empty when all instances are cached.
+    """
+    tag_keys = msam_settings.get_setting(EC2_TAG_KEYS_SETTING)
+    if isinstance(tag_keys, list):
+        return tag_keys
+    return []
+
+
+def ec2_filters():
+    """
+    Return the DescribeInstances filters for the instance states and tag keys kept in the cache.
+    """
+    tag_keys = ec2_tag_keys()
+    filters = [{"Name": "instance-state-name", "Values": EC2_INSTANCE_STATES}]
+    if tag_keys:
+        # instances with any one of the keys are returned
+        filters.append({"Name": "tag-key", "Values": tag_keys})
+    return filters
+
+
+def ec2_config_selector():
+    """
+    Return a predicate on the ARN and configuration of an EC2 instance recorded by AWS Config
+    that applies the instance states and tag keys of ec2_filters.
+    """
+    tag_keys = ec2_tag_keys()
+
+    def selected(node):
+        config = node[1]
+        if config.get("State", {}).get("Name") not in EC2_INSTANCE_STATES:
+            return False
+        return not tag_keys or any(key in config["Tags"] for key in tag_keys)
+    return selected
 
 
 def ec2_instances(region):
     """
     Retrieve EC2 instances with MSAM specific tags.
     """
-    items = []
-    reservations = []
     service_name = 'ec2'
-    if region not in boto3.Session().get_available_regions(service_name):
+    if region not in account.service_regions(service_name):
         print_no_region()
-        return items
-    service = boto3.client(service_name, region_name=region, config=MSAM_BOTO3_CONFIG)
-    response = service.describe_instances()
-    reservations = reservations + response['Reservations']
-    while "NextToken" in response:
-        response = service.describe_instances(NextToken=response["NextToken"])
-        reservations = reservations + response['Reservations']
-    for reservation in reservations:
-        for instance in reservation['Instances']:
-            if 'Tags' in instance:
-                final_tags = {}
-                for tag in instance['Tags']:
-                    #reformat the tags before appending to data
-                    final_tags[tag["Key"]] = tag["Value"]
-                    instance['Tags'] = final_tags
-            else:
-                instance['Tags'] = {}
-            items.append(instance)
-    return items
+        return
+    service = discovery_client(service_name, region)
+    for reservations in list_pages(service.describe_instances, 'Reservations',
+                                   Filters=ec2_filters(), MaxResults=EC2_PAGE_SIZE):
+        for reservation in reservations:
+            for instance in reservation['Instances']:
+                if 'Tags' in instance:
+                    final_tags = {}
+                    for tag in instance['Tags']:
+                        #reformat the tags before appending to data
+                        final_tags[tag["Key"]] = tag["Value"]
+                        instance['Tags'] = final_tags
+                else:
+                    instance['Tags'] = {}
+                yield instance
 
 def link_devices(region):
     """
     Return the Elemental Link devices for the given region.
     Tags included.
     """
-    items = []
     service_name = "medialive"
-    if region in boto3.Session().get_available_regions(service_name):
-        service = boto3.client(service_name, region_name=region, config=MSAM_BOTO3_CONFIG)
-        response = service.list_input_devices()
-        items = items + response['InputDevices']
-        while "NextToken" in response:
-            response = service.list_input_devices(NextToken=response["NextToken"])
-            items = items + response['InputDevices']
+    if region in account.service_regions(service_name):
+        service = discovery_client(service_name, region)
+        for page in list_pages(service.list_input_devices, 'InputDevices'):
+            yield from page
     else:
         print_no_region()
-    return items
@@ -13,6 +13,8 @@ from boto3.dynamodb.conditions import Key
 from botocore.exceptions import ClientError
 from botocore.config import Config
 
+from chalicelib import batch
+
 # table names generated by CloudFormation
 NOTES_TABLE_NAME = os.environ["NOTES_TABLE_NAME"]
 FUNCTION_NAME = os.environ["DELETE_NOTES_FUNCTION"]
@@ -41,6 +43,20 @@ def get_resource_notes(resource_arn):
         notes = []
     return notes
 
+def get_resource_notes_batch(resource_arns):
+    """
+    Return a map of resource ARN to its notes item for a list of resources, using batched reads.
+    """
+    notes = {}
+    try:
+        keys = [{"resource_arn": arn} for arn in dict.fromkeys(resource_arns)]
+        items, _ = batch.batch_get_items(NOTES_TABLE_NAME, keys)
+        for item in items:
+            notes[item["resource_arn"]] = item
+    except ClientError as error:
+        print(error)
+    return notes
+
 def get_all_notes():
     """
     API entry point to return all notes in the database.
@@ -17,10 +17,13 @@ from boto3.dynamodb.conditions import Key
 
 import chalicelib.settings as msam_settings
 from chalicelib import cache
+from chalicelib import chains
+from chalicelib import health
 import chalicelib.cloudwatch as cloudwatch_data
 import chalicelib.connections as connection_cache
 import chalicelib.nodes as node_cache
 from chalicelib import tags
+from chalicelib import telemetry
 
 import requests
 
@@ -71,8 +74,12 @@ def update_alarms():
             alarm_groups[region_name].append(alarm_name)
         print(alarm_groups)
         # update each grouped list for a region
+        changed = False
         for region_name, alarm_names in alarm_groups.items():
-            cloudwatch_data.update_alarms(region_name, alarm_names)
+            changed = cloudwatch_data.update_alarms(region_name, alarm_names) or changed
+        # the health rollup only changes with an alarm state
+        if changed:
+            health.invalidate_health()
     except ClientError as error:
         print(error)
     return True
@@ -84,6 +91,8 @@ def update_connections():
     """
     try:
         connection_cache.update_connection_ddb_items()
+        # chains are rebuilt from the connections just written
+        chains.update_chain_ddb_items()
     except ClientError as error:
         print(error)
     return True
@@ -163,8 +172,10 @@ def update_from_tags():
     """
     Updates MSAM diagrams and tiles from tags on cloud resources. Check for MSAM-Diagram and MSAM-Tile tags.
     """
-    tags.update_diagrams()
-    tags.update_tiles()
+    with telemetry.measure("update-diagrams", "global"):
+        tags.update_diagrams()
+    with telemetry.measure("update-tiles", "global"):
+        tags.update_tiles()
 
 def apply_node_command(ssm_client, instance_ids, document_names):
     """
@@ -221,7 +232,7 @@ def ssm_run_command():
                 ExpressionAttributeNames={"#data": "data"},
                 ExpressionAttributeValues={":tagname": "MSAM-NodeType"},
                 ExclusiveStartKey=response['LastEvaluatedKey'])
-            items.append(response.get("Items", []))
+            items = items + response.get("Items", [])
 
         for item in items:
             data = json.loads(item['data'])
@@ -255,7 +266,7 @@ def ssm_run_command():
                     'Values': ['Self']
                 }],
                 NextToken=document_list["NextToken"])
-            document_ids.append(document_list['DocumentIdentifiers'])
+            document_ids = document_ids + document_list['DocumentIdentifiers']
 
         document_names = {}
         for (document, tag) in [(document, tag) for document in document_ids if "Tags" in document for tag in document["Tags"] if "Key" in tag]:
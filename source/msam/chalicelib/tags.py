@@ -12,6 +12,7 @@ from botocore.config import Config
 from botocore.exceptions import ClientError
 import stringcase
 
+from chalicelib import autolayout
 from chalicelib import channels
 from chalicelib import settings
 from chalicelib import layout
@@ -67,6 +68,8 @@ def update_diagrams():
                 ExpressionAttributeValues=DIAGRAM_ATTRIBUTE_VALUES,
                 ExclusiveStartKey=response['LastEvaluatedKey'])
             items = items + response["Items"]
+        # new nodes for each diagram
+        added = {}
         # filter down the results
         for record in items:
             cloud_resource = json.loads(record["data"])
@@ -86,16 +89,12 @@ def update_diagrams():
             # check if this node is already on the diagram layout
             if not layout.has_node(view_id, arn):
                 print(f"adding node {arn} to diagram id {view_id}")
-                # add the node arn to the layout
-                layout_items = [{
-                    "view": view_id,
-                    "id": arn,
-                    "x": 0,
-                    "y": 0
-                }]
-                layout.set_node_layout(layout_items)
+                added.setdefault(view_id, []).append(arn)
             else:
                 print(f"node {arn} already on diagram id {view_id}")
+        # add the nodes next to their connected neighbors on each diagram
+        for view_id, arns in added.items():
+            autolayout.place_nodes(view_id, arns)
     except ClientError as error:
         print(error)
 
@@ -0,0 +1,169 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""
+This file contains helper functions for timing the discovery functions and connection matchers
+and emitting the results as CloudWatch embedded metric format (EMF) log lines.
+"""
+
+import contextlib
+import json
+import threading
+import time
+import uuid
+
+import boto3
+
+from chalicelib import content
+from chalicelib import throttle
+
+# CloudWatch namespace for the metrics extracted from the log lines
+NAMESPACE = "MSAM/Discovery"
+
+DIMENSIONS = [["Operation", "Region"]]
+
+METRIC_UNITS = {
+    "Duration": "Milliseconds",
+    "ApiCalls": "Count",
+    "Throttles": "Count",
+    "Items": "Count",
+    "BytesWritten": "Bytes",
+    "Errors": "Count"
+}
+
+
+# calls made by the content writer, its cache writes are reported as Items and BytesWritten
+UNCOUNTED_CALLS = ["dynamodb.BatchWriteItem"]
+
+
+def log_record(record):
+    """
+    Print a record as one log line. Lambda sends it to CloudWatch Logs, which extracts the metrics.
+    """
+    print(json.dumps(record))
+
+
+SINK = log_record
+
+
+def set_sink(sink):
+    """
+    Send records to a different function, ex. the append method of a list in tests.
+    Returns the previous sink.
+    """
+    global SINK
+    previous = SINK
+    SINK = sink
+    return previous
+
+
+def counted(event_name):
+    """
+    Return True if the API call named in a botocore event counts toward a measurement.
+    """
+    return not any(event_name.endswith("." + call) for call in UNCOUNTED_CALLS)
+
+
+class Measurement:
+    """
+    Counters for one run of a discovery function or connection matcher.
+    Calls from worker threads are counted too.
+    """
+
+    def __init__(self, operation, region):
+        self.operation = operation
+        self.region = region
+        self.counters = {name: 0 for name in METRIC_UNITS if name != "Duration"}
+        self.lock = threading.Lock()
+
+    def add(self, name, amount=1):
+        """
+        Increase a counter.
+        """
+        with self.lock:
+            self.counters[name] = self.counters[name] + amount
+
+    def api_call(self, event_name="", **_):
+        """
+        Count an API call, registered for botocore before-call events.
+        """
+        if counted(event_name):
+            self.add("ApiCalls")
+
+    def api_response(self, response=None, event_name="", **_):
+        """
+        Count a throttled attempt, registered for botocore needs-retry events.
+        """
+        if response is not None and counted(event_name) and \
+                response[1].get("Error", {}).get("Code") in throttle.THROTTLE_ERROR_CODES:
+            self.add("Throttles")
+
+    def count(self, items):
+        """
+        Pass items through while counting them and their approximate size.
+        """
+        for item in items:
+            self.add("Items")
+            self.add("BytesWritten", item_bytes(item))
+            yield item
+
+    def record(self, duration):
+        """
+        Return the counters as an EMF record.
+        """
+        record = {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [{
+                    "Namespace": NAMESPACE,
+                    "Dimensions": DIMENSIONS,
+                    "Metrics": [{"Name": name, "Unit": unit} for name, unit in METRIC_UNITS.items()]
+                }]
+            },
+            "Operation": self.operation,
+            "Region": self.region,
+            "Duration": round(duration * 1000, 3)
+        }
+        with self.lock:
+            record.update(self.counters)
+        return record
+
+
+def item_bytes(item):
+    """
+    Return the approximate size of a cache item, measured as encoded JSON.
+    """
+    return len(json.dumps(item, default=str).encode("utf-8"))
+
+
+@contextlib.contextmanager
+def measure(operation, region):
+    """
+    Time a block and count the API calls of boto3 clients created inside it, except the cache writes.
+    The record is emitted when the block ends, also if it raises.
+    """
+    measurement = Measurement(operation, region)
+    if boto3.DEFAULT_SESSION is None:
+        boto3.setup_default_session()
+    # clients copy the session handlers when they are created
+    events = boto3.DEFAULT_SESSION.events
+    unique_id = str(uuid.uuid4())
+    events.register("before-call", measurement.api_call, unique_id=unique_id + "-call")
+    events.register("needs-retry", measurement.api_response, unique_id=unique_id + "-retry")
+    start = time.perf_counter()
+    try:
+        yield measurement
+    except Exception:
+        measurement.add("Errors")
+        raise
+    finally:
+        events.unregister("before-call", unique_id=unique_id + "-call")
+        events.unregister("needs-retry", unique_id=unique_id + "-retry")
+        SINK(measurement.record(time.perf_counter() - start))
+
+
+def put_measured(operation, region, produce):
+    """
+    Write the cache items returned by produce() and emit the telemetry for the run.
+    """
+    with measure(operation, region) as measurement:
+        content.put_ddb_items(measurement.count(produce()))
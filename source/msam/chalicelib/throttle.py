@@ -0,0 +1,191 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""
+This file contains helper functions for pacing discovery API calls per service and region.
+"""
+
+import threading
+import time
+
+# default ceiling on calls started per second for one service in one region
+CALLS_PER_SECOND = 20
+
+# lower ceilings for services with small describe and tag API quotas
+SERVICE_CALLS_PER_SECOND = {
+    "medialive": 5,
+    "mediaconnect": 10,
+    "mediastore": 10,
+    "mediatailor": 10
+}
+
+# the rate is halved on each throttle but never drops below this
+MIN_CALLS_PER_SECOND = 0.5
+
+# share of the ceiling regained after each successful call
+RECOVERY_FRACTION = 0.02
+
+# default upper bound on concurrent calls for one service in one region
+MAX_CONCURRENCY = 8
+
+# error codes returned by AWS services when a request is throttled
+THROTTLE_ERROR_CODES = [
+    "Throttling", "ThrottlingException", "ThrottledException", "RequestThrottledException",
+    "TooManyRequestsException", "RequestLimitExceeded", "SlowDown", "RequestThrottled",
+    "ProvisionedThroughputExceededException", "LimitExceededException"
+]
+
+# shared token buckets keyed by (service, region)
+TOKEN_BUCKETS = {}
+TOKEN_BUCKETS_LOCK = threading.Lock()
+
+# ceilings from the settings table keyed by "service" or "service:region"
+CONFIGURED_LIMITS = {}
+
+
+class TokenBucket:
+    """
+    Token bucket for the calls to one service in one region that slows down when throttled.
+    """
+
+    def __init__(self, rate):
+        self.max_rate = rate
+        self.rate = rate
+        self.tokens = 1.0
+        self.updated = time.monotonic()
+        self.throttles = 0
+        self.wait_seconds = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Take a token, blocking until one is available.
+        """
+        with self.lock:
+            now = time.monotonic()
+            # allow at most one second of burst
+            self.tokens = min(max(1.0, self.rate), self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # a negative balance reserves a future token for this caller
+            self.tokens = self.tokens - 1
+            wait = max(0.0, -self.tokens / self.rate)
+            self.wait_seconds = self.wait_seconds + wait
+        if wait > 0:
+            time.sleep(wait)
+
+    def throttled(self):
+        """
+        Record a throttled call, halve the rate and drop any saved burst.
+        """
+        with self.lock:
+            self.throttles = self.throttles + 1
+            self.rate = max(MIN_CALLS_PER_SECOND, self.rate / 2)
+            self.tokens = min(self.tokens, 0.0)
+
+    def succeeded(self):
+        """
+        Record a successful call and move the rate back toward the ceiling.
+        """
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * RECOVERY_FRACTION)
+
+    def set_max_rate(self, rate):
+        """
+        Change the ceiling on calls per second.
+        """
+        with self.lock:
+            self.max_rate = rate
+            self.rate = min(self.rate, rate)
+
+    def concurrency(self):
+        """
+        Return how many calls may run at once, fewer while the service is throttling.
+        """
+        return max(1, round(MAX_CONCURRENCY * self.rate / self.max_rate))
+
+
+def max_rate(service_name, region):
+    """
+    Return the ceiling on calls per second for a service in a region.
+    """
+    for key in (f"{service_name}:{region}", service_name):
+        if key in CONFIGURED_LIMITS:
+            return CONFIGURED_LIMITS[key]
+    return SERVICE_CALLS_PER_SECOND.get(service_name, CALLS_PER_SECOND)
+
+
+def token_bucket(service_name, region):
+    """
+    Return the token bucket shared by all callers of a service in a region.
+    """
+    with TOKEN_BUCKETS_LOCK:
+        key = (service_name, region)
+        if key not in TOKEN_BUCKETS:
+            TOKEN_BUCKETS[key] = TokenBucket(max_rate(service_name, region))
+        return TOKEN_BUCKETS[key]
+
+
+def configure(limits):
+    """
+    Apply call rate ceilings keyed by service name or "service:region", ex. {"medialive": 3}.
+    """
+    with TOKEN_BUCKETS_LOCK:
+        CONFIGURED_LIMITS.clear()
+        if isinstance(limits, dict):
+            for key, value in limits.items():
+                try:
+                    rate = float(value)
+                except (TypeError, ValueError):
+                    print(f"ignoring rate limit {key}: {value} is not a number")
+                    continue
+                if rate > 0:
+                    CONFIGURED_LIMITS[key] = rate
+        for (service_name, region), bucket in TOKEN_BUCKETS.items():
+            bucket.set_max_rate(max_rate(service_name, region))
+
+
+def register(client, service_name, region):
+    """
+    Pace every request sent with a boto3 client through the token bucket for its service and region.
+    Retries are sent as new requests, so each attempt takes a token.
+    """
+    bucket = token_bucket(service_name, region)
+
+    def before_send(**_):
+        bucket.acquire()
+
+    def after_call(http_response=None, parsed=None, **_):
+        # failed calls also emit after-call once the retries are exhausted
+        if http_response is not None and http_response.status_code >= 300:
+            return
+        if isinstance(parsed, dict) and "Error" in parsed:
+            return
+        bucket.succeeded()
+
+    def needs_retry(response=None, **_):
+        if response is not None and response[1].get("Error", {}).get("Code") in THROTTLE_ERROR_CODES:
+            bucket.throttled()
+
+    client.meta.events.register("before-send", before_send)
+    client.meta.events.register("after-call", after_call)
+    client.meta.events.register("needs-retry", needs_retry)
+    return client
+
+
+def stats(reset=False):
+    """
+    Return the throttle count, time spent waiting and current rate for each service and region.
+    """
+    result = {}
+    with TOKEN_BUCKETS_LOCK:
+        for (service_name, region), bucket in TOKEN_BUCKETS.items():
+            with bucket.lock:
+                result[f"{service_name}:{region}"] = {
+                    "throttles": bucket.throttles,
+                    "wait_seconds": round(bucket.wait_seconds, 3),
+                    "rate": round(bucket.rate, 3),
+                    "max_rate": bucket.max_rate
+                }
+                if reset:
+                    bucket.throttles = 0
+                    bucket.wait_seconds = 0.0
+    return result
@@ -0,0 +1,373 @@
+"""
+Offline benchmark for the connection matchers in connections.py.
+
+Synthetic inventories of cross-referenced media resources are fed into every
+matcher through a stubbed cache.cached_by_service, and the time, peak memory
+and connection count of each matcher are reported.
+
+Launch from the source/msam/ folder:
+python -m test.benchmark_connections
+python -m test.benchmark_connections --scale 100 1000 --save baseline.json
+python -m test.benchmark_connections --scale 100 1000 --baseline baseline.json
+
+The scale is the number of MediaLive channels, the other services are sized
+relative to it. Matchers projected to run longer than the budget at a larger
+scale are skipped, since several of them compare every pair of resources.
+"""
+
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import sys
+import time
+import tracemalloc
+from unittest.mock import patch
+
+os.environ.setdefault("CACHE_ITEM_TTL", "7200")
+os.environ.setdefault("CONTENT_TABLE_NAME", "content_table")
+os.environ.setdefault("SOLUTION_ID", "AwsSolution/SO0166/benchmark")
+
+# pylint: disable=C0413
+from chalicelib import connections
+
+REGION = "us-west-2"
+ACCOUNT = "111122223333"
+
+DEFAULT_SCALES = [100, 1000, 10000]
+
+# seconds a matcher may be projected to take before it is skipped at a larger scale
+DEFAULT_BUDGET = 60
+
+# slowdown allowed against the baseline before a matcher counts as a regression
+DEFAULT_TOLERANCE = 1.5
+
+# timings below this many seconds are too noisy to compare
+MIN_COMPARED_SECONDS = 0.05
+
+
+def hex_id(kind, index, length=32):
+    """
+    Return a stable hexadecimal identifier for a resource.
+    """
+    return hashlib.sha256(f"{kind}-{index}".encode("utf-8")).hexdigest()[:length]
+
+
+def cache_item(arn, service, data, region=REGION):
+    """
+    Structure resource data like a content table item.
+    """
+    return {"arn": arn, "service": service, "region": region, "data": json.dumps(data)}
+
+
+def synthetic_inventory(scale):
+    """
+    Return cached resources by service name, with cross-references for every matcher.
+    """
+    counts = {
+        "medialive-channel": scale,
+        "medialive-input": scale,
+        "mediapackage-channel": max(1, scale // 2),
+        "mediapackage-origin-endpoint": scale,
+        "mediastore-container": max(1, scale // 10),
+        "s3": max(1, scale // 5),
+        "cloudfront-distribution": max(1, scale // 2),
+        "mediaconnect-flow": max(2, scale // 5),
+        "medialive-multiplex": max(1, scale // 20),
+        "mediatailor-configuration": max(1, scale // 10),
+        "speke-keyserver": max(1, scale // 100),
+        "link-device": max(1, scale // 10)
+    }
+
+    def channel_id(index):
+        return str(1000000 + index)
+
+    def input_arn(index):
+        return f"arn:aws:medialive:{REGION}:{ACCOUNT}:input:{2000000 + index}"
+
+    def input_ip(index):
+        return f"10.3.{index // 250}.{index % 250}"
+
+    def mp_channel_id(index):
+        return f"mp-channel-{index % counts['mediapackage-channel']}"
+
+    def mp_channel_arn(index):
+        return f"arn:aws:mediapackage:{REGION}:{ACCOUNT}:channels/{hex_id('mp-channel', index % counts['mediapackage-channel'])}"
+
+    def ingest_url(index, pipeline):
+        channel_hex = hex_id("mp-channel", index % counts["mediapackage-channel"])
+        return f"https://{hex_id('ingest', index % counts['mediapackage-channel'], 6)}.mediapackage.{REGION}.amazonaws.com/in/v2/{channel_hex}/{hex_id('ingest-pipeline', pipeline)}/channel"
+
+    def endpoint_url(index, path=True):
+        index = index % counts["mediapackage-origin-endpoint"]
+        url = f"https://{hex_id('mp-host', index, 12)}.mediapackage.{REGION}.amazonaws.com/out/v1/{hex_id('endpoint', index)}"
+        return url + "/index.m3u8" if path else url
+
+    def container_netloc(index):
+        return f"{hex_id('container', index % counts['mediastore-container'], 14)}.data.mediastore.{REGION}.amazonaws.com"
+
+    def bucket_name(index):
+        return f"media-bucket-{index % counts['s3']}"
+
+    def distro_domain(index):
+        return f"d{index % counts['cloudfront-distribution']:06d}.cloudfront.net"
+
+    def flow_egress_ip(index):
+        return f"10.1.{index // 250}.{index % 250}"
+
+    def flow_ingest_ip(index):
+        return f"10.2.{index // 250}.{index % 250}"
+
+    def multiplex_entitlement(index):
+        return f"arn:aws:mediaconnect:{REGION}:{ACCOUNT}:entitlement:{hex_id('entitlement', index % counts['medialive-multiplex'])}:multiplex"
+
+    def speke_url(index):
+        return f"https://keys-{index % counts['speke-keyserver']}.example.com/speke/v1.0"
+
+    def link_device_id(index):
+        return f"hd-{index % counts['link-device']:012d}"
+
+    inventory = {service: [] for service in counts}
+    for index in range(counts["medialive-channel"]):
+        arn = f"arn:aws:medialive:{REGION}:{ACCOUNT}:channel:{channel_id(index)}"
+        if index % 2:
+            packaging = {"Id": "packaging", "MediaPackageSettings": [],
+                         "Settings": [{"Url": ingest_url(index // 2, 0)}, {"Url": ingest_url(index // 2, 1)}]}
+        else:
+            packaging = {"Id": "packaging", "MediaPackageSettings": [{"ChannelId": mp_channel_id(index // 2)}],
+                         "Settings": []}
+        archive_urls = [
+            f"mediastoressl://{container_netloc(index)}/live",
+            f"s3ssl://{bucket_name(index)}/archive",
+            f"rtp://{flow_ingest_ip(index % counts['mediaconnect-flow'])}:5000",
+            f"rtp://{input_ip(index)}:5000"
+        ]
+        destinations = [packaging, {"Id": "archive", "MediaPackageSettings": [],
+                                    "Settings": [{"Url": archive_urls[index % 4]}]}]
+        if index % 20 == 0:
+            destinations.append({"Id": "multiplex", "MediaPackageSettings": [], "Settings": [],
+                                 "MultiplexSettings": {"MultiplexId": str(3000000 + index // 20 % counts["medialive-multiplex"]),
+                                                       "ProgramName": f"program-{index}"}})
+        inventory["medialive-channel"].append(cache_item(arn, "medialive-channel", {
+            "Arn": arn, "Id": channel_id(index), "Name": f"channel-{index}",
+            "ChannelClass": "STANDARD" if index % 3 == 0 else "SINGLE_PIPELINE",
+            "Destinations": destinations, "Tags": {}}))
+
+    input_types = ["URL_PULL", "MP4_FILE", "URL_PULL", "RTP_PUSH", "INPUT_DEVICE"]
+    for index in range(counts["medialive-input"]):
+        sources = [
+            [{"Url": f"mediastoressl://{container_netloc(index)}/in"}],
+            [{"Url": f"s3://{bucket_name(index)}/source.mp4"}],
+            [{"Url": f"https://{distro_domain(index)}/live/index.m3u8"}],
+            [],
+            []
+        ]
+        data = {
+            "Arn": input_arn(index), "Id": str(2000000 + index), "Name": f"input-{index}",
+            "Type": input_types[index % 5], "Sources": sources[index % 5],
+            "AttachedChannels": [channel_id(index)],
+            "Destinations": [{"Ip": input_ip(index), "Port": "5000", "Url": f"{input_ip(index)}:5000"}] if index % 5 == 3 else [],
+            "InputDevices": [{"Id": link_device_id(index)}] if index % 5 == 4 else []
+        }
+        inventory["medialive-input"].append(cache_item(input_arn(index), "medialive-input", data))
+
+    for index in range(counts["mediapackage-channel"]):
+        arn = mp_channel_arn(index)
+        inventory["mediapackage-channel"].append(cache_item(arn, "mediapackage-channel", {
+            "Arn": arn, "Id": mp_channel_id(index),
+            "HlsIngest": {"IngestEndpoints": [{"Url": ingest_url(index, 0)}, {"Url": ingest_url(index, 1)}]}}))
+
+    for index in range(counts["mediapackage-origin-endpoint"]):
+        arn = f"arn:aws:mediapackage:{REGION}:{ACCOUNT}:origin_endpoints/{hex_id('endpoint', index)}"
+        package = {"SegmentDurationSeconds": 6}
+        if index % 10 == 0:
+            package["Encryption"] = {"SpekeKeyProvider": {"Url": speke_url(index // 10)}}
+        inventory["mediapackage-origin-endpoint"].append(cache_item(arn, "mediapackage-origin-endpoint", {
+            "Arn": arn, "Id": f"endpoint-{index}", "ChannelId": mp_channel_id(index),
+            "Url": endpoint_url(index), "HlsPackage": package}))
+
+    for index in range(counts["mediastore-container"]):
+        arn = f"arn:aws:mediastore:{REGION}:{ACCOUNT}:container/container-{index}"
+        inventory["mediastore-container"].append(cache_item(arn, "mediastore-container", {
+            "ARN": arn, "Name": f"container-{index}", "Endpoint": f"https://{container_netloc(index)}"}))
+
+    for index in range(counts["s3"]):
+        arn = f"arn:aws:s3:::{bucket_name(index)}"
+        inventory["s3"].append(cache_item(arn, "s3", {"Name": bucket_name(index)}, region="global"))
+
+    for index in range(counts["cloudfront-distribution"]):
+        arn = f"arn:aws:cloudfront::{ACCOUNT}:distribution/E{index:012d}"
+        mp_host = endpoint_url(index).split("/")[2]
+        mp_path = endpoint_url(index).split(mp_host)[1]
+        origins = [
+            {"DomainName": f"{bucket_name(index)}.s3.amazonaws.com", "OriginPath": ""},
+            {"DomainName": container_netloc(index), "OriginPath": ""},
+            {"DomainName": mp_host, "OriginPath": mp_path},
+            {"DomainName": mp_host, "OriginPath": mp_path}
+        ]
+        tags = {"MP-Endpoint-ARN": mp_channel_arn(index)} if index % 4 == 3 else {}
+        inventory["cloudfront-distribution"].append(cache_item(arn, "cloudfront-distribution", {
+            "ARN": arn, "DomainName": distro_domain(index),
+            "Origins": {"Quantity": 1, "Items": [origins[index % 4]]}, "Tags": tags}, region="global"))
+
+    for index in range(counts["mediaconnect-flow"]):
+        arn = f"arn:aws:mediaconnect:{REGION}:{ACCOUNT}:flow:{hex_id('flow', index)}:flow-{index}"
+        if index % 3 == 0:
+            source = {"EntitlementArn": multiplex_entitlement(index // 3), "Transport": {"Protocol": "zixi-push"}}
+        else:
+            source = {"IngestIp": flow_ingest_ip(index), "IngestPort": 5000, "Transport": {"Protocol": "rtp"}}
+        outputs = [{"Destination": flow_egress_ip((index + 1) % counts["mediaconnect-flow"]), "Port": 5000,
+                    "Transport": {"Protocol": "rtp"}}]
+        if index % 2:
+            outputs.append({"MediaLiveInputArn": input_arn(index), "Transport": {"Protocol": "rtp"}})
+        else:
+            outputs.append({"Destination": input_ip(5 * index + 3), "Port": 5000, "Transport": {"Protocol": "rtp"}})
+        inventory["mediaconnect-flow"].append(cache_item(arn, "mediaconnect-flow", {
+            "FlowArn": arn, "Name": f"flow-{index}", "EgressIp": flow_egress_ip(index),
+            "Source": source, "Sources": [source], "Outputs": outputs}))
+
+    for index in range(counts["medialive-multiplex"]):
+        arn = f"arn:aws:medialive:{REGION}:{ACCOUNT}:multiplex:{3000000 + index}"
+        inventory["medialive-multiplex"].append(cache_item(arn, "medialive-multiplex", {
+            "Arn": arn, "Id": str(3000000 + index),
+            "Destinations": [{"MediaConnectSettings": {"EntitlementArn": multiplex_entitlement(index)}}]}))
+
+    for index in range(counts["mediatailor-configuration"]):
+        arn = f"arn:aws:mediatailor:{REGION}:{ACCOUNT}:playbackConfiguration/config-{index}"
+        sources = [
+            endpoint_url(index, path=False),
+            f"https://{bucket_name(index)}.s3.amazonaws.com/vod",
+            f"https://{container_netloc(index)}/vod"
+        ]
+        inventory["mediatailor-configuration"].append(cache_item(arn, "mediatailor-configuration", {
+            "PlaybackConfigurationArn": arn, "Name": f"config-{index}",
+            "VideoContentSourceUrl": sources[index % 3]}))
+
+    for index in range(counts["speke-keyserver"]):
+        arn = f"arn:oss:speke:::{index}"
+        inventory["speke-keyserver"].append(cache_item(arn, "speke-keyserver", {
+            "arn": arn, "endpoint": speke_url(index), "scheme": "https"}, region="global"))
+
+    for index in range(counts["link-device"]):
+        arn = f"arn:aws:medialive:{REGION}:{ACCOUNT}:inputDevice:{link_device_id(index)}"
+        inventory["link-device"].append(cache_item(arn, "link-device", {"Arn": arn, "Id": link_device_id(index)}))
+    return inventory
+
+
+def run_matcher(matcher, memory=False):
+    """
+    Run a matcher with its printed output discarded.
+    Returns the seconds taken, the peak bytes allocated if requested, and the connections found.
+    """
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    with open(os.devnull, "w", encoding="utf-8") as devnull, contextlib.redirect_stdout(devnull):
+        found = matcher()
+    seconds = time.perf_counter() - start
+    peak = None
+    if memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return seconds, peak, found
+
+
+def run_benchmark(scales, names=None, budget=DEFAULT_BUDGET, memory=True):
+    """
+    Run the selected matchers at each scale. Returns a list of result dictionaries.
+    """
+    results = []
+    previous = {}
+    for scale in sorted(scales):
+        inventory = synthetic_inventory(scale)
+        with patch.object(connections.cache, "cached_by_service",
+                          side_effect=lambda service: inventory.get(service, [])):
+            for matcher in connections.matchers():
+                name = matcher.__name__[:-len("_ddb_items")]
+                if names and not any(part in name for part in names):
+                    continue
+                result = {"matcher": name, "scale": scale}
+                if name in previous:
+                    last_scale, last_seconds = previous[name]
+                    # most matchers compare every pair of resources
+                    projected = last_seconds * (scale / last_scale) ** 2
+                    if projected > budget:
+                        result["skipped"] = f"projected {projected:.0f}s"
+                        results.append(result)
+                        continue
+                seconds, _, found = run_matcher(matcher)
+                result["seconds"] = round(seconds, 4)
+                result["connections"] = len(found)
+                if memory:
+                    result["peak_bytes"] = run_matcher(matcher, memory=True)[1]
+                previous[name] = (scale, seconds)
+                results.append(result)
+    return results
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Return descriptions of the results that are slower than the baseline or find a different number of connections.
+    """
+    expected = {(item["matcher"], item["scale"]): item for item in baseline if "seconds" in item}
+    regressions = []
+    for result in results:
+        previous = expected.get((result["matcher"], result["scale"]))
+        if previous is None or "seconds" not in result:
+            continue
+        if result["connections"] != previous["connections"]:
+            regressions.append(f"{result['matcher']} at {result['scale']}: "
+                               f"{result['connections']} connections, baseline {previous['connections']}")
+        if result["seconds"] > MIN_COMPARED_SECONDS and result["seconds"] > previous["seconds"] * tolerance:
+            regressions.append(f"{result['matcher']} at {result['scale']}: "
+                               f"{result['seconds']}s, baseline {previous['seconds']}s")
+    return regressions
+
+
+def print_results(results):
+    """
+    Print the results as a table.
+    """
+    print(f"{'matcher':<62} {'scale':>6} {'seconds':>9} {'peak MiB':>9} {'connections':>11}")
+    for result in results:
+        if "skipped" in result:
+            print(f"{result['matcher']:<62} {result['scale']:>6} skipped, {result['skipped']}")
+            continue
+        peak = f"{result['peak_bytes'] / 1048576:.1f}" if result.get("peak_bytes") is not None else "-"
+        print(f"{result['matcher']:<62} {result['scale']:>6} {result['seconds']:>9.3f} {peak:>9} {result['connections']:>11}")
+
+
+def main(arguments=None):
+    """
+    Run the benchmark from the command line. Returns the process exit code.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the connection matchers with synthetic inventories.")
+    parser.add_argument("--scale", type=int, nargs="+", default=DEFAULT_SCALES,
+                        help="numbers of MediaLive channels to generate")
+    parser.add_argument("--matcher", nargs="+", help="run only matchers with one of these strings in the name")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET,
+                        help="skip matchers projected to take longer than this many seconds")
+    parser.add_argument("--no-memory", action="store_true", help="skip the peak memory measurement")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare with the results in this JSON file")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="slowdown against the baseline that counts as a regression")
+    args = parser.parse_args(arguments)
+    results = run_benchmark(args.scale, args.matcher, args.budget, memory=not args.no_memory)
+    print_results(results)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as output:
+            json.dump(results, output, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as baseline:
+            regressions = compare(results, json.load(baseline), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,372 @@
+"""
+Event storm generator and ingestion benchmark for the event Lambdas.
+
+Synthetic streams of MediaLive channel alerts, MediaConnect flow alerts,
+MediaPackage HarvestJob notifications, MediaStore object state changes and
+CloudWatch alarm state changes are generated for the resources of the
+connection benchmark's inventory. A steady background of segment writes and
+harvest jobs runs for the whole duration, and a failover storm sets, then
+later clears, alerts and alarms on a share of the channels and flows.
+
+The stream is replayed in time order through events/media_events.py and
+events/cloudwatch_alarm.py against the moto backend of the load test.
+Events per second, per-event latency and write amplification, the DynamoDB
+items written and write capacity consumed per event, are reported per event
+type, with the peak write capacity per second of event time.
+
+Launch from the source/msam/ folder:
+python -m test.benchmark_events
+python -m test.benchmark_events --scale 1000 --storm 0.8 --duration 600
+python -m test.benchmark_events --save-events storm.jsonl
+python -m test.benchmark_events --events storm.jsonl
+
+Importing the module starts the moto backend of the load test, so it is only
+run in its own process.
+"""
+
+import argparse
+import contextlib
+import copy
+import datetime
+import json
+import os
+import random
+import sys
+import uuid
+
+import boto3
+from botocore.awsrequest import AWSResponse
+
+from . import benchmark_load
+
+MEDIALIVE_ALERT = "MediaLive alert"
+MEDIACONNECT_ALERT = "MediaConnect alert"
+MEDIAPACKAGE_HARVEST = "MediaPackage HarvestJob"
+MEDIASTORE_OBJECT = "MediaStore object"
+ALARM_CHANGE = "CloudWatch alarm"
+
+EVENT_KINDS = [MEDIALIVE_ALERT, MEDIACONNECT_ALERT, MEDIAPACKAGE_HARVEST, MEDIASTORE_OBJECT, ALARM_CHANGE]
+
+# alerts raised on each pipeline of a channel that loses its input
+MEDIALIVE_ALERT_TYPES = ["Video Not Detected", "Audio Not Detected", "RTMP Has No Audio/Video"]
+
+DEFAULT_SCALE = 100
+DEFAULT_DURATION = 300
+
+# share of the channels and flows hit by the storm
+DEFAULT_STORM = 0.5
+
+# the storm starts at this share of the duration and is spread over STORM_SPREAD seconds
+STORM_START = 0.2
+STORM_SPREAD = 5
+
+# seconds until the alerts and alarms of the storm clear
+RECOVERY_SECONDS = 120
+
+# seconds between the segments written to each MediaStore container
+SEGMENT_SECONDS = 6
+
+# one MediaPackage origin endpoint in this many runs a harvest job
+HARVEST_RATIO = 10
+
+
+def origin_endpoint_id(params, context, **_):
+    """
+    Keep the ID of a MediaPackage DescribeOriginEndpoint call for the response.
+    """
+    context["benchmark_endpoint_id"] = params.get("Id")
+
+
+def describe_origin_endpoint(context, **_):
+    """
+    Answer MediaPackage DescribeOriginEndpoint for HarvestJob events.
+    """
+    endpoint_id = context.get("benchmark_endpoint_id")
+    region = os.environ["AWS_DEFAULT_REGION"]
+    arn = f"arn:aws:mediapackage:{region}:111122223333:origin_endpoints/{endpoint_id}"
+    return AWSResponse(None, 200, {}, None), {"Arn": arn, "Id": endpoint_id,
+                                                "ResponseMetadata": {"HTTPStatusCode": 200}}
+
+
+# the event Lambdas create their clients on import, once the backend and its MediaPackage answers are in place
+benchmark_load.set_environment()
+METER = benchmark_load.install_backend()
+boto3.DEFAULT_SESSION.events.register("before-parameter-build.mediapackage.DescribeOriginEndpoint",
+                                      origin_endpoint_id, unique_id="benchmark-endpoint-id")
+boto3.DEFAULT_SESSION.events.register("before-call.mediapackage.DescribeOriginEndpoint", describe_origin_endpoint,
+                                      unique_id="benchmark-endpoint")
+
+# pylint: disable=C0413
+import cloudwatch_alarm
+import media_events
+
+from . import benchmark_connections
+
+
+def event_time(start, seconds):
+    """
+    Return the CloudWatch event time of a moment in the stream.
+    """
+    return (start + datetime.timedelta(seconds=seconds)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def envelope(source, detail_type, arn, when, detail, *, resources=None):
+    """
+    Return a CloudWatch event for a resource.
+    """
+    return {
+        "version": "0",
+        "id": str(uuid.uuid4()),
+        "detail-type": detail_type,
+        "source": source,
+        "account": arn.split(":")[4],
+        "time": when,
+        "region": arn.split(":")[3],
+        "resources": resources if resources is not None else [arn],
+        "detail": detail
+    }
+
+
+def medialive_alert(arn, when, alert_type, pipeline, state):
+    """
+    Return a MediaLive channel alert in the SET or CLEARED state.
+    """
+    return envelope("aws.medialive", "MediaLive Channel Alert", arn, when, {
+        "alarm_state": state,
+        "alarm_id": uuid.uuid5(uuid.NAMESPACE_URL, f"{arn}/{alert_type}/{pipeline}").hex,
+        "alert_type": alert_type,
+        "message": f"{alert_type} on pipeline {pipeline}",
+        "pipeline": str(pipeline),
+        "channel_arn": arn
+    })
+
+
+def mediaconnect_alert(arn, when, errored):
+    """
+    Return a MediaConnect flow alert that reports or clears a source error.
+    """
+    return envelope("aws.mediaconnect", "MediaConnect Alert", arn, when, {
+        "error-id": uuid.uuid5(uuid.NAMESPACE_URL, arn).hex,
+        "errored": errored,
+        "error-code": "SOURCE_DISCONNECTED",
+        "error-message": "The flow source is disconnected"
+    })
+
+
+def harvest_job(arn, endpoint_id, when):
+    """
+    Return a MediaPackage HarvestJob notification for an origin endpoint.
+    """
+    parts = arn.split(":")
+    job_id = uuid.uuid5(uuid.NAMESPACE_URL, f"{arn}/{when}").hex
+    job_arn = f"arn:aws:mediapackage:{parts[3]}:{parts[4]}:harvest_jobs/{job_id}"
+    return envelope("aws.mediapackage", "MediaPackage HarvestJob Notification", job_arn, when, {
+        "harvest_job": {
+            "id": job_id,
+            "arn": job_arn,
+            "status": "SUCCEEDED",
+            "origin_endpoint_id": endpoint_id,
+            "s3_destination": {"bucket_name": "harvest", "manifest_key": f"{job_id}/index.m3u8"}
+        },
+        "message": "The harvest job completed successfully."
+    })
+
+
+def mediastore_object(arn, when, segment):
+    """
+    Return a MediaStore object state change for a segment written to a container.
+    """
+    name = arn.split("/")[-1]
+    path = f"live/segment-{segment}.ts"
+    return envelope("aws.mediastore", "MediaStore Object State Change", arn, when, {
+        "ContainerName": name,
+        "Operation": "PutObject",
+        "Path": path,
+        "ObjectSize": 1880000,
+        "URL": f"https://{name}.data.mediastore.{arn.split(':')[3]}.amazonaws.com/{path}"
+    }, resources=[f"{arn}/{path}"])
+
+
+def alarm_change(region, alarm_name, when, state):
+    """
+    Return a CloudWatch alarm state change.
+    """
+    return {
+        "version": "0",
+        "id": str(uuid.uuid4()),
+        "detail-type": "CloudWatch Alarm State Change",
+        "source": "aws.cloudwatch",
+        "time": when,
+        "region": region,
+        "resources": [],
+        "detail": {"alarmName": alarm_name, "state": {"value": state}}
+    }
+
+
+def generate_events(inventory, duration=DEFAULT_DURATION, storm=DEFAULT_STORM, seed=0):
+    """
+    Return the events of the stream as (seconds, kind, event) in time order.
+    """
+    # the event times only need to be repeatable, they are not used for security
+    rng = random.Random(seed)  # nosec B311
+    start = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+    events = []
+
+    def add(seconds, kind, event):
+        if seconds < duration:
+            events.append((round(seconds, 3), kind, event))
+
+    # background segment writes and harvest jobs
+    for container in inventory["mediastore-container"]:
+        offset = rng.uniform(0, SEGMENT_SECONDS)
+        for segment in range(int((duration - offset) // SEGMENT_SECONDS) + 1):
+            seconds = offset + segment * SEGMENT_SECONDS
+            add(seconds, MEDIASTORE_OBJECT, mediastore_object(container["arn"], event_time(start, seconds), segment))
+    for endpoint in inventory["mediapackage-origin-endpoint"][::HARVEST_RATIO]:
+        seconds = rng.uniform(0, duration)
+        endpoint_id = json.loads(endpoint["data"]).get("Id", endpoint["arn"].split("/")[-1])
+        add(seconds, MEDIAPACKAGE_HARVEST, harvest_job(endpoint["arn"], endpoint_id, event_time(start, seconds)))
+
+    # the storm and its recovery
+    storm_start = duration * STORM_START
+    channels = inventory["medialive-channel"]
+    for index in sorted(rng.sample(range(len(channels)), round(len(channels) * storm))):
+        arn = channels[index]["arn"]
+        for pipeline in (0, 1):
+            for alert_type in MEDIALIVE_ALERT_TYPES:
+                raised = storm_start + rng.uniform(0, STORM_SPREAD)
+                cleared = raised + RECOVERY_SECONDS + rng.uniform(0, STORM_SPREAD)
+                add(raised, MEDIALIVE_ALERT, medialive_alert(arn, event_time(start, raised), alert_type, pipeline, "SET"))
+                add(cleared, MEDIALIVE_ALERT,
+                    medialive_alert(arn, event_time(start, cleared), alert_type, pipeline, "CLEARED"))
+        if index % benchmark_load.ALARM_RATIO == 0:
+            region = arn.split(":")[3]
+            name = benchmark_load.alarm_name(index // benchmark_load.ALARM_RATIO)
+            raised = storm_start + rng.uniform(0, STORM_SPREAD) + 60
+            add(raised, ALARM_CHANGE, alarm_change(region, name, event_time(start, raised), "ALARM"))
+            cleared = raised + RECOVERY_SECONDS
+            add(cleared, ALARM_CHANGE, alarm_change(region, name, event_time(start, cleared), "OK"))
+    flows = inventory["mediaconnect-flow"]
+    for flow in rng.sample(flows, round(len(flows) * storm)):
+        raised = storm_start + rng.uniform(0, STORM_SPREAD)
+        add(raised, MEDIACONNECT_ALERT, mediaconnect_alert(flow["arn"], event_time(start, raised), True))
+        cleared = raised + RECOVERY_SECONDS
+        add(cleared, MEDIACONNECT_ALERT, mediaconnect_alert(flow["arn"], event_time(start, cleared), False))
+    return sorted(events, key=lambda entry: entry[0])
+
+
+def replay(events, meter):
+    """
+    Send each event to its Lambda in order. Returns the latencies and write units by event kind,
+    and the write units consumed in each second of event time.
+    """
+    latencies = {}
+    write_seconds = {}
+    for seconds, kind, event in events:
+        handler = media_events.lambda_handler
+        if kind == ALARM_CHANGE:
+            benchmark_load.ALARM_STATES[event["detail"]["alarmName"]] = event["detail"]["state"]["value"]
+            handler = cloudwatch_alarm.lambda_handler
+        payload = copy.deepcopy(event)
+        before = meter.totals_for(kind)["write_units"]
+        benchmark_load.timed(meter, kind, latencies, lambda: handler(payload, None))
+        second = int(seconds)
+        write_seconds[second] = write_seconds.get(second, 0.0) + meter.totals_for(kind)["write_units"] - before
+    return latencies, write_seconds
+
+
+def summarize(latencies, meter, write_seconds):
+    """
+    Return one result dictionary per event kind and one for all events.
+    """
+    results = []
+    every = []
+    for kind in EVENT_KINDS + ["all"]:
+        if kind == "all":
+            seconds = every
+            totals = {key: sum(meter.totals_for(name)[key] for name in latencies)
+                      for key in ("read_units", "write_units", "item_writes")}
+        elif kind in latencies:
+            seconds = latencies[kind]
+            every = every + seconds
+            totals = meter.totals_for(kind)
+        else:
+            continue
+        if not seconds:
+            continue
+        result = {
+            "kind": kind,
+            "events": len(seconds),
+            "events_per_second": round(len(seconds) / sum(seconds), 1),
+            "p50_ms": round(benchmark_load.percentile(seconds, 0.5) * 1000, 3),
+            "p99_ms": round(benchmark_load.percentile(seconds, 0.99) * 1000, 3),
+            "item_writes_per_event": round(totals["item_writes"] / len(seconds), 2),
+            "write_units_per_event": round(totals["write_units"] / len(seconds), 2),
+            "read_units_per_event": round(totals["read_units"] / len(seconds), 2)
+        }
+        if kind == "all":
+            result["peak_write_units_per_second"] = max(write_seconds.values(), default=0.0)
+        results.append(result)
+    return results
+
+
+def run_benchmark(scale=DEFAULT_SCALE, duration=DEFAULT_DURATION, storm=DEFAULT_STORM, seed=0, events=None):
+    """
+    Seed the tables, generate a stream unless one is given, and replay it.
+    Returns the results and the events replayed.
+    """
+    benchmark_load.create_tables(boto3.client("dynamodb"))
+    with open(os.devnull, "w", encoding="utf-8") as devnull, contextlib.redirect_stdout(devnull):
+        benchmark_load.timed(METER, "seed", {}, lambda: benchmark_load.seed_tables(scale))
+        if events is None:
+            events = generate_events(benchmark_connections.synthetic_inventory(scale), duration, storm, seed)
+        latencies, write_seconds = replay(events, METER)
+    return summarize(latencies, METER, write_seconds), events
+
+
+def print_results(results):
+    """
+    Print the results as a table.
+    """
+    print(f"{'events':<24} {'count':>7} {'events/s':>9} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'writes/ev':>9} {'WCU/ev':>7} {'RCU/ev':>7}")
+    for result in results:
+        print(f"{result['kind']:<24} {result['events']:>7} {result['events_per_second']:>9.1f} "
+              f"{result['p50_ms']:>8.3f} {result['p99_ms']:>8.3f} {result['item_writes_per_event']:>9.2f} "
+              f"{result['write_units_per_event']:>7.2f} {result['read_units_per_event']:>7.2f}")
+        if "peak_write_units_per_second" in result:
+            print(f"peak write capacity: {result['peak_write_units_per_second']:.1f} WCU per second of event time")
+
+
+def main(arguments=None):
+    """
+    Run the benchmark from the command line. Returns the process exit code.
+    """
+    parser = argparse.ArgumentParser(description="Replay a synthetic event storm through the event Lambdas.")
+    parser.add_argument("--scale", type=int, default=DEFAULT_SCALE, help="number of MediaLive channels")
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION, help="seconds of events to generate")
+    parser.add_argument("--storm", type=float, default=DEFAULT_STORM,
+                        help="share of the channels and flows that fail over, 0 for background events only")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for the stream")
+    parser.add_argument("--events", help="replay the events in this JSON lines file instead of generating them")
+    parser.add_argument("--save-events", help="write the events to this JSON lines file")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    args = parser.parse_args(arguments)
+    events = None
+    if args.events:
+        with open(args.events, encoding="utf-8") as stream:
+            events = [(entry["seconds"], entry["kind"], entry["event"]) for entry in map(json.loads, stream)]
+    results, events = run_benchmark(args.scale, args.duration, args.storm, args.seed, events)
+    print_results(results)
+    if args.save_events:
+        with open(args.save_events, "w", encoding="utf-8") as output:
+            for seconds, kind, event in events:
+                output.write(json.dumps({"seconds": seconds, "kind": kind, "event": event}) + "\n")
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as output:
+            json.dump(results, output, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
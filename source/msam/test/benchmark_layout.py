@@ -0,0 +1,172 @@
+"""
+Offline benchmark for the layered layout engine in autolayout.py.
+
+Synthetic diagrams of signal pipelines are generated, each a MediaConnect flow
+feeding a MediaLive input and channel, a MediaPackage channel and its origin
+endpoints and a CloudFront distribution. Some channels share a MediaConnect
+flow, some pipelines loop back to form cycles, and a share of the nodes have
+no connections. A full layout of every node and an incremental placement of a
+share of new nodes are timed at each size, and the time per node is reported
+so growth beyond linear is easy to spot.
+
+Launch from the source/msam/ folder:
+python -m test.benchmark_layout
+python -m test.benchmark_layout --nodes 1000 5000 20000 --new 0.2
+python -m test.benchmark_layout --save baseline.json
+python -m test.benchmark_layout --baseline baseline.json
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault("CACHE_ITEM_TTL", "7200")
+os.environ.setdefault("CONTENT_TABLE_NAME", "content_table")
+os.environ.setdefault("LAYOUT_TABLE_NAME", "layout_table")
+os.environ.setdefault("SETTINGS_TABLE_NAME", "settings_table")
+os.environ.setdefault("SOLUTION_ID", "AwsSolution/SO0166/benchmark")
+# the layout modules create DynamoDB resources on import, the benchmark makes no calls
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-west-2")
+
+# pylint: disable=C0413
+from chalicelib import autolayout
+
+DEFAULT_NODES = [500, 1000, 5000]
+
+# share of the nodes placed incrementally onto the rest of the diagram
+DEFAULT_NEW = 0.1
+
+# slowdown allowed against the baseline before a run counts as a regression
+DEFAULT_TOLERANCE = 1.5
+
+# timings below this many seconds are too noisy to compare
+MIN_COMPARED_SECONDS = 0.05
+
+# node kinds of one pipeline, from source to sink
+PIPELINE = ["flow", "input", "channel", "package", "endpoint-hls", "endpoint-dash", "distribution"]
+
+
+def synthetic_diagram(size, seed=0):
+    """
+    Return the node ARNs and connection items of a diagram with about this many nodes.
+    """
+    # the diagrams only need to be repeatable, they are not used for security
+    generator = random.Random(seed)  # nosec B311
+    nodes = []
+    items = []
+
+    def connect(from_arn, to_arn):
+        items.append({"arn": f"{from_arn}:{to_arn}", "from": from_arn, "to": to_arn})
+
+    for pipeline in range(max(1, size // len(PIPELINE))):
+        arns = {kind: f"arn:benchmark:{kind}:{pipeline}" for kind in PIPELINE}
+        # every third channel takes its source from the previous pipeline's flow
+        if pipeline % 3 == 2:
+            arns["flow"] = f"arn:benchmark:flow:{pipeline - 1}"
+        # the shared flow is already on the diagram
+        nodes.extend(arn for kind, arn in arns.items() if kind != "flow" or pipeline % 3 != 2)
+        connect(arns["flow"], arns["input"])
+        connect(arns["input"], arns["channel"])
+        # standard channels have two pipelines into the package channel
+        connect(arns["channel"], arns["package"])
+        connect(arns["channel"], arns["package"])
+        connect(arns["package"], arns["endpoint-hls"])
+        connect(arns["package"], arns["endpoint-dash"])
+        connect(arns["endpoint-hls"], arns["distribution"])
+        connect(arns["endpoint-dash"], arns["distribution"])
+        if pipeline % 25 == 0:
+            # a monitoring loop back to the flow
+            connect(arns["distribution"], arns["flow"])
+        if pipeline % 5 == 0:
+            nodes.append(f"arn:benchmark:bucket:{pipeline}")
+    generator.shuffle(nodes)
+    return nodes, items
+
+
+def timed(function, *args):
+    """
+    Call a function and return the seconds taken with its result.
+    """
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def run_benchmark(sizes, new_share=DEFAULT_NEW):
+    """
+    Time the full and incremental layouts at each diagram size. Returns a list of result dictionaries.
+    """
+    results = []
+    for size in sorted(sizes):
+        nodes, items = synthetic_diagram(size)
+        seconds, positions = timed(autolayout.arrange, nodes, items)
+        results.append({"mode": "full", "nodes": len(nodes), "placed": len(positions),
+                        "seconds": round(seconds, 4)})
+        added = nodes[:int(len(nodes) * new_share)]
+        existing = {arn: positions[arn] for arn in nodes[len(added):]}
+        seconds, placed = timed(autolayout.place_new, existing, added, items)
+        results.append({"mode": "incremental", "nodes": len(nodes), "placed": len(placed),
+                        "seconds": round(seconds, 4)})
+    return results
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Return descriptions of the results that are slower than the baseline.
+    """
+    expected = {(item["mode"], item["nodes"]): item for item in baseline}
+    regressions = []
+    for result in results:
+        previous = expected.get((result["mode"], result["nodes"]))
+        if previous is None:
+            continue
+        if result["seconds"] > MIN_COMPARED_SECONDS and result["seconds"] > previous["seconds"] * tolerance:
+            regressions.append(f"{result['mode']} at {result['nodes']} nodes: "
+                               f"{result['seconds']}s, baseline {previous['seconds']}s")
+    return regressions
+
+
+def print_results(results):
+    """
+    Print the results as a table.
+    """
+    print(f"{'mode':<12} {'nodes':>7} {'placed':>7} {'seconds':>9} {'us/node':>9}")
+    for result in results:
+        per_node = result["seconds"] / result["nodes"] * 1000000
+        print(f"{result['mode']:<12} {result['nodes']:>7} {result['placed']:>7} {result['seconds']:>9.3f} "
+              f"{per_node:>9.1f}")
+
+
+def main(arguments=None):
+    """
+    Run the benchmark from the command line. Returns the process exit code.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the layered layout engine with synthetic diagrams.")
+    parser.add_argument("--nodes", type=int, nargs="+", default=DEFAULT_NODES, help="diagram sizes to generate")
+    parser.add_argument("--new", type=float, default=DEFAULT_NEW,
+                        help="share of the nodes placed by the incremental layout")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare with the results in this JSON file")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="slowdown against the baseline that counts as a regression")
+    args = parser.parse_args(arguments)
+    results = run_benchmark(args.nodes, args.new)
+    print_results(results)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as output:
+            json.dump(results, output, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as baseline:
+            regressions = compare(results, json.load(baseline), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,492 @@
+"""
+End-to-end load test of the API against a local DynamoDB.
+
+The tables of the DynamoDB stack are created in moto's mock of AWS, or in
+DynamoDB Local with --endpoint-url, and seeded with the synthetic inventory
+of the connection benchmark. The periodic
+connection and tag handlers and the two event Lambdas run against them, then
+simulated browser clients poll the API like the UI does: every /cached
+service on page load, the alarm and event routes at the default 10 second
+update intervals. Requests go through Chalice's local gateway in simulated
+time order, and the latency percentiles and DynamoDB capacity consumed are
+reported per route. moto reports whole or half capacity units per call
+whatever the item size, so use DynamoDB Local for exact capacity figures.
+
+Launch from the source/msam/ folder:
+python -m test.benchmark_load
+python -m test.benchmark_load --clients 50 --duration 600 --scale 500
+python -m test.benchmark_load --endpoint-url http://localhost:8000
+"""
+
+import argparse
+import contextlib
+import datetime
+import json
+import math
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+
+import boto3
+import botocore.handlers
+import moto
+from botocore.awsrequest import AWSResponse
+
+# pylint: disable=C0415
+
+ENVIRONMENT = {
+    "ALARMS_TABLE_NAME": "msam-load-alarms",
+    "CHANNELS_TABLE_NAME": "msam-load-channels",
+    "CLOUDWATCH_EVENTS_TABLE_NAME": "msam-load-cloudwatch-events",
+    "CONTENT_TABLE_NAME": "msam-load-content",
+    "EVENTS_TABLE_NAME": "msam-load-events",
+    "LAYOUT_TABLE_NAME": "msam-load-layout",
+    "NOTES_TABLE_NAME": "msam-load-notes",
+    "SETTINGS_TABLE_NAME": "msam-load-settings",
+    "DELETE_NOTES_FUNCTION": "msam-load-delete-notes",
+    "CACHE_ITEM_TTL": "7200",
+    "ITEM_TTL": "7200",
+    "SOLUTION_ID": "AwsSolution/SO0166/load-test",
+    "BUILD_STAMP": "LOAD_TEST",
+    "VERSION": "0.0.0",
+    "AWS_DEFAULT_REGION": "us-west-2",
+    "EVENTS_TABLE_REGION": "us-west-2"
+}
+
+# the event Lambdas are deployed from their own folder
+EVENTS_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "events")
+
+# key schema and global secondary indexes of the tables of the DynamoDB stack, as (name, type) keys
+TABLES = {
+    "CHANNELS_TABLE_NAME": {"keys": [("channel", "S"), ("id", "S")], "indexes": {}},
+    "EVENTS_TABLE_NAME": {"keys": [("resource_arn", "S"), ("alarm_id", "S")], "indexes": {
+        "AlarmStateIndex": [("alarm_state", "S")],
+        "ResourceAlarmStateIndex": [("resource_arn", "S"), ("alarm_state", "S")],
+        "AlarmStateSourceIndex": [("source", "S"), ("alarm_state", "S")]
+    }},
+    "LAYOUT_TABLE_NAME": {"keys": [("view", "S"), ("id", "S")], "indexes": {"IdIndex": [("id", "S")]}},
+    "SETTINGS_TABLE_NAME": {"keys": [("id", "S")], "indexes": {}},
+    "CONTENT_TABLE_NAME": {"keys": [("arn", "S")],
+                           "indexes": {"ServiceRegionIndex": [("service", "S"), ("region", "S")]}},
+    "ALARMS_TABLE_NAME": {"keys": [("RegionAlarmName", "S"), ("ResourceArn", "S")], "indexes": {
+        "StateValueIndex": [("StateValue", "S")],
+        "RegionAlarmNameIndex": [("RegionAlarmName", "S")],
+        "ResourceArnIndex": [("ResourceArn", "S")]
+    }},
+    "CLOUDWATCH_EVENTS_TABLE_NAME": {"keys": [("resource_arn", "S"), ("timestamp", "N")], "indexes": {}},
+    "NOTES_TABLE_NAME": {"keys": [("resource_arn", "S")], "indexes": {}}
+}
+
+READ_OPERATIONS = ["GetItem", "Query", "Scan", "BatchGetItem"]
+
+WRITE_OPERATIONS = ["PutItem", "DeleteItem", "UpdateItem", "BatchWriteItem"]
+
+# services loaded by the node and connection mappers of the UI when the map opens
+CACHED_SERVICES = [
+    "cloudfront-distribution", "ec2-instance", "link-device", "mediaconnect-flow", "medialive-channel",
+    "medialive-input", "medialive-multiplex", "mediapackage-channel", "mediapackage-origin-endpoint",
+    "mediastore-container", "mediatailor-configuration", "s3", "speke-keyserver", "ssm-managed-instance",
+    "user-defined-node", "user-defined-connection",
+    "cloudfront-distribution-medialive-input", "link-device-medialive-input",
+    "mediaconnect-flow-mediaconnect-flow", "mediaconnect-flow-medialive-input",
+    "medialive-channel-mediaconnect-flow", "medialive-channel-mediapackage-channel",
+    "medialive-channel-mediastore-container", "medialive-channel-medialive-input",
+    "medialive-channel-multiplex", "medialive-channel-s3-bucket", "medialive-input-medialive-channel",
+    "mediapackage-channel-mediapackage-origin-endpoint", "mediapackage-origin-endpoint-cloudfront-distribution",
+    "mediapackage-origin-endpoint-mediatailor-configuration", "mediapackage-origin-endpoint-speke-keyserver",
+    "mediastore-container-cloudfront-distribution", "mediastore-container-medialive-input",
+    "mediastore-container-mediatailor-configuration", "multiplex-mediaconnect-flow",
+    "s3-bucket-cloudfront-distribution", "s3-bucket-medialive-input", "s3-bucket-mediatailor-configuration"
+]
+
+CACHED_ROUTE = "/cached/{service}"
+ALARMS_ROUTE = "/cloudwatch/alarms/{alarm_state}/subscribers"
+EVENTS_ROUTE = "/cloudwatch/events/state/{state}"
+
+# default app-alarm-update-interval and app-event-update-interval settings, in seconds
+ALARM_UPDATE_INTERVAL = 10
+EVENT_UPDATE_INTERVAL = 10
+
+DEFAULT_CLIENTS = 10
+DEFAULT_DURATION = 300
+DEFAULT_SCALE = 100
+
+# one MediaLive channel in this many gets an alarm subscription and an alert
+ALARM_RATIO = 10
+
+# alarm states returned by the local DescribeAlarms, by alarm name, ALARM when missing
+ALARM_STATES = {}
+
+
+class CapacityMeter:
+    """
+    Requests the consumed capacity of every DynamoDB call and totals it under the current label.
+    Calls from every thread count, since the cache writes run on a worker thread.
+    """
+
+    def __init__(self):
+        self.current = None
+        self.totals = {}
+        self.lock = threading.Lock()
+
+    def install(self):
+        """
+        Meter the DynamoDB calls of the sessions made from now on, like moto does,
+        since the cache writer uses a session of its own.
+        """
+        for operation in READ_OPERATIONS + WRITE_OPERATIONS:
+            botocore.handlers.BUILTIN_HANDLERS.append((f"before-parameter-build.dynamodb.{operation}",
+                                                       self.request_capacity))
+        botocore.handlers.BUILTIN_HANDLERS.append(("after-call.dynamodb", self.record))
+
+    def request_capacity(self, params, model, **_):
+        """
+        Ask DynamoDB to return the capacity consumed by a call, and count the items it writes.
+        """
+        params.setdefault("ReturnConsumedCapacity", "TOTAL")
+        label = self.current
+        if label is None or model.name not in WRITE_OPERATIONS:
+            return
+        writes = 1
+        if model.name == "BatchWriteItem":
+            writes = sum(len(requests) for requests in params.get("RequestItems", {}).values())
+        with self.lock:
+            totals = self.totals_for(label)
+            totals["item_writes"] = totals["item_writes"] + writes
+
+    def totals_for(self, label):
+        """
+        Return the totals of a label, created empty on first use.
+        """
+        return self.totals.setdefault(label, {"read_units": 0.0, "write_units": 0.0, "item_writes": 0})
+
+    def record(self, parsed, model, **_):
+        """
+        Add the capacity consumed by a call to the totals of the current label.
+        """
+        capacity = parsed.get("ConsumedCapacity")
+        label = self.current
+        if not capacity or label is None:
+            return
+        entries = capacity if isinstance(capacity, list) else [capacity]
+        units = sum(entry.get("CapacityUnits", 0.0) for entry in entries)
+        kind = "read_units" if model.name in READ_OPERATIONS else "write_units"
+        with self.lock:
+            totals = self.totals_for(label)
+            totals[kind] = totals[kind] + units
+
+    @contextlib.contextmanager
+    def label(self, name):
+        """
+        Total the capacity of the calls made in the block under a label.
+        """
+        self.current = name
+        try:
+            yield
+        finally:
+            self.current = None
+
+
+def table_definitions():
+    """
+    Return the CreateTable requests for the tables of the DynamoDB stack.
+    """
+    definitions = []
+    for variable, table in TABLES.items():
+        indexes = table["indexes"]
+        attributes = dict(table["keys"])
+        for index_keys in indexes.values():
+            attributes.update(dict(index_keys))
+        definition = {
+            "TableName": os.environ[variable],
+            "KeySchema": key_schema(table["keys"]),
+            "AttributeDefinitions": [{"AttributeName": name, "AttributeType": kind}
+                                     for name, kind in attributes.items()],
+            "BillingMode": "PAY_PER_REQUEST"
+        }
+        if indexes:
+            definition["GlobalSecondaryIndexes"] = [
+                {"IndexName": name, "KeySchema": key_schema(index_keys), "Projection": {"ProjectionType": "ALL"}}
+                for name, index_keys in indexes.items()]
+        definitions.append(definition)
+    return definitions
+
+
+def key_schema(keys):
+    """
+    Return the KeySchema for a hash key and an optional range key.
+    """
+    return [{"AttributeName": name, "KeyType": key_type} for (name, _), key_type in zip(keys, ["HASH", "RANGE"])]
+
+
+def create_tables(client):
+    """
+    Create empty tables, replacing any left over from an earlier run against DynamoDB Local.
+    """
+    for definition in table_definitions():
+        try:
+            client.create_table(**definition)
+        except client.exceptions.ResourceInUseException:
+            client.delete_table(TableName=definition["TableName"])
+            client.create_table(**definition)
+
+
+def set_environment():
+    """
+    Give the API and event Lambda modules the table names and settings of the load test,
+    before any of them is imported, and make the event Lambdas importable.
+    moto supplies fake AWS credentials when it starts.
+    """
+    for variable, default in ENVIRONMENT.items():
+        os.environ.setdefault(variable, default)
+    if EVENTS_FOLDER not in sys.path:
+        sys.path.append(EVENTS_FOLDER)
+
+
+def install_backend(endpoint_url=None):
+    """
+    Answer the requests of the default session with moto, passing DynamoDB requests through to
+    DynamoDB Local when an endpoint URL is given, so the load test never reaches AWS.
+    Returns the capacity meter.
+    """
+    config = None
+    if endpoint_url:
+        os.environ["AWS_ENDPOINT_URL_DYNAMODB"] = endpoint_url
+        config = {"core": {"passthrough": {"urls": [f"{re.escape(endpoint_url)}.*"]}}}
+    # moto answers from a handler that sessions copy when they are made
+    moto.mock_aws(config=config).start()
+    meter = CapacityMeter()
+    meter.install()
+    boto3.setup_default_session()
+    session = boto3.DEFAULT_SESSION
+    session.events.register("before-parameter-build.cloudwatch.DescribeAlarms", alarm_names,
+                            unique_id="load-test-alarm-names")
+    session.events.register("before-call.cloudwatch.DescribeAlarms", describe_alarms, unique_id="load-test-alarms")
+    return meter
+
+
+def alarm_names(params, context, **_):
+    """
+    Keep the alarm names of a CloudWatch DescribeAlarms call for the response.
+    """
+    context["load_test_alarm_names"] = params.get("AlarmNames", [])
+
+
+def describe_alarms(context, **_):
+    """
+    Answer CloudWatch DescribeAlarms for the alarm Lambda with the state of every named alarm from ALARM_STATES.
+    """
+    names = context.get("load_test_alarm_names", [])
+    alarms = [{"AlarmName": name, "StateValue": ALARM_STATES.get(name, "ALARM"),
+               "StateUpdatedTimestamp": datetime.datetime.now(datetime.timezone.utc)} for name in names]
+    return AWSResponse(None, 200, {}, None), {"MetricAlarms": alarms, "ResponseMetadata": {"HTTPStatusCode": 200}}
+
+
+def seed_tables(scale):
+    """
+    Store the synthetic inventory and subscribe every tenth MediaLive channel to an alarm.
+    Returns the MediaLive channel ARNs with alarms.
+    """
+    from chalicelib import content
+    from . import benchmark_connections
+    inventory = benchmark_connections.synthetic_inventory(scale)
+    content.put_ddb_items(item for items in inventory.values() for item in items)
+    alarmed = [item["arn"] for item in inventory["medialive-channel"][::ALARM_RATIO]]
+    table = boto3.resource("dynamodb").Table(os.environ["ALARMS_TABLE_NAME"])
+    with table.batch_writer() as batch:
+        for index, arn in enumerate(alarmed):
+            batch.put_item(Item={
+                "RegionAlarmName": f"{benchmark_connections.REGION}:{alarm_name(index)}",
+                "ResourceArn": arn,
+                "StateValue": "OK",
+                "Namespace": "AWS/MediaLive",
+                "Updated": int(time.time())
+            })
+    return alarmed
+
+
+def alarm_name(index):
+    """
+    Return the name of the alarm subscribed by the MediaLive channel with ALARM_RATIO times this index.
+    """
+    return f"channel-alarm-{index}"
+
+
+def alert_event(arn, index):
+    """
+    Return a MediaLive channel alert for the media events Lambda.
+    """
+    return {
+        "version": "0",
+        "id": str(uuid.UUID(int=index)),
+        "detail-type": "MediaLive Channel Alert",
+        "source": "aws.medialive",
+        "account": arn.split(":")[4],
+        "time": datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "region": arn.split(":")[3],
+        "resources": [arn],
+        "detail": {
+            "alarm_state": "SET",
+            "alarm_id": f"alert-{index}",
+            "alert_type": "RTMP Has No Audio/Video",
+            "message": "Waiting for RTMP input",
+            "pipeline": "0",
+            "channel_arn": arn
+        }
+    }
+
+
+def alarm_event(region, alarm_name):
+    """
+    Return a CloudWatch alarm state change for the alarm Lambda.
+    """
+    return {"region": region, "detail-type": "CloudWatch Alarm State Change", "detail": {"alarmName": alarm_name}}
+
+
+def schedule(clients, duration, reload_seconds=0, seed=0):
+    """
+    Return the requests of the simulated browser clients as (seconds, client, route, path) in time order.
+    Each client opens the map at a random moment of the first update interval.
+    """
+    # the start times only need to be repeatable, they are not used for security
+    rng = random.Random(seed)  # nosec B311
+    requests = []
+    for client in range(clients):
+        opened = rng.uniform(0, min(duration, EVENT_UPDATE_INTERVAL))
+        loads = [opened]
+        while reload_seconds and loads[-1] + reload_seconds < duration:
+            loads.append(loads[-1] + reload_seconds)
+        for loaded in loads:
+            requests.extend((loaded, client, CACHED_ROUTE, f"/cached/{service}") for service in CACHED_SERVICES)
+        polls = [(ALARM_UPDATE_INTERVAL, ALARMS_ROUTE, "/cloudwatch/alarms/ALARM/subscribers"),
+                 (EVENT_UPDATE_INTERVAL, EVENTS_ROUTE, "/cloudwatch/events/state/set")]
+        for interval, route, path in polls:
+            requests.extend((when, client, route, path) for when in timeline(opened + interval, duration, interval))
+    return sorted(requests)
+
+
+def timeline(start, end, step):
+    """
+    Return the moments from start up to end at a fixed step.
+    """
+    return [start + step * count for count in range(max(0, math.ceil((end - start) / step)))]
+
+
+def percentile(values, fraction):
+    """
+    Return the nearest-rank percentile of a list of values.
+    """
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def summarize(latencies, meter, errors, duration=None):
+    """
+    Return one result dictionary per label with latency percentiles in milliseconds and capacity units.
+    """
+    results = []
+    for label, seconds in latencies.items():
+        totals = meter.totals_for(label)
+        result = {
+            "route": label,
+            "requests": len(seconds),
+            "errors": errors.get(label, 0),
+            "p50_ms": round(percentile(seconds, 0.5) * 1000, 2),
+            "p99_ms": round(percentile(seconds, 0.99) * 1000, 2),
+            "read_units": totals["read_units"],
+            "write_units": totals["write_units"]
+        }
+        if duration:
+            result["read_units_per_second"] = round(totals["read_units"] / duration, 3)
+        results.append(result)
+    return results
+
+
+def timed(meter, label, latencies, call):
+    """
+    Run a call under a capacity label and record its latency. Returns the call's result.
+    """
+    with meter.label(label):
+        start = time.perf_counter()
+        result = call()
+        latencies.setdefault(label, []).append(time.perf_counter() - start)
+    return result
+
+
+def run_load_test(clients=DEFAULT_CLIENTS, duration=DEFAULT_DURATION, scale=DEFAULT_SCALE, *,
+                  reload_seconds=0, endpoint_url=None, seed=0):
+    """
+    Seed the tables, run the periodic handlers and event Lambdas, then replay the client requests.
+    Returns the setup results and the per-route client results.
+    """
+    set_environment()
+    meter = install_backend(endpoint_url)
+    # the modules create their DynamoDB clients on import, after the backend is in place
+    from chalice.test import Client
+    import app
+    from chalicelib import periodic
+    import cloudwatch_alarm
+    import media_events
+    create_tables(boto3.client("dynamodb"))
+    setup = {}
+    errors = {}
+    latencies = {}
+    with open(os.devnull, "w", encoding="utf-8") as devnull, contextlib.redirect_stdout(devnull):
+        alarmed = timed(meter, "seed", setup, lambda: seed_tables(scale))
+        timed(meter, "periodic update_connections", setup, periodic.update_connections)
+        timed(meter, "periodic update_from_tags", setup, periodic.update_from_tags)
+        for index, arn in enumerate(alarmed):
+            timed(meter, "lambda media_events", setup, lambda: media_events.lambda_handler(alert_event(arn, index), None))
+        for index, arn in enumerate(alarmed[::2]):
+            region = arn.split(":")[3]
+            timed(meter, "lambda cloudwatch_alarm", setup,
+                  lambda: cloudwatch_alarm.lambda_handler(alarm_event(region, alarm_name(index * 2)), None))
+        with Client(app.app) as client:
+            for _, _, route, path in schedule(clients, duration, reload_seconds, seed):
+                response = timed(meter, route, latencies, lambda: client.http.get(path))
+                if response.status_code != 200:
+                    errors[route] = errors.get(route, 0) + 1
+    return summarize(setup, meter, {}), summarize(latencies, meter, errors, duration)
+
+
+def print_results(results):
+    """
+    Print the results as a table.
+    """
+    print(f"{'route':<48} {'requests':>8} {'errors':>6} {'p50 ms':>9} {'p99 ms':>9} {'RCU':>10} {'WCU':>10} {'RCU/s':>8}")
+    for result in results:
+        per_second = result.get("read_units_per_second")
+        print(f"{result['route']:<48} {result['requests']:>8} {result['errors']:>6} {result['p50_ms']:>9.2f} "
+              f"{result['p99_ms']:>9.2f} {result['read_units']:>10.1f} {result['write_units']:>10.1f} "
+              f"{per_second if per_second is not None else '-':>8}")
+
+
+def main(arguments=None):
+    """
+    Run the load test from the command line. Returns the process exit code.
+    """
+    parser = argparse.ArgumentParser(description="Load test the API with simulated browser clients.")
+    parser.add_argument("--clients", type=int, default=DEFAULT_CLIENTS, help="number of browser clients")
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION, help="simulated seconds of polling")
+    parser.add_argument("--scale", type=int, default=DEFAULT_SCALE, help="number of MediaLive channels to seed")
+    parser.add_argument("--reload", type=float, default=0,
+                        help="seconds between page reloads that fetch /cached again, 0 to load once")
+    parser.add_argument("--endpoint-url", help="use DynamoDB Local at this URL instead of moto")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for the client start times")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    args = parser.parse_args(arguments)
+    setup, results = run_load_test(args.clients, args.duration, args.scale, reload_seconds=args.reload,
+                                   endpoint_url=args.endpoint_url, seed=args.seed)
+    print_results(setup + results)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as output:
+            json.dump({"setup": setup, "routes": results}, output, indent=2)
+    return 1 if any(result["errors"] for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+"""
+This module provides an in-memory AWS Config aggregator shared by the unit tests.
+"""
+
+import json
+import re
+
+RESOURCES = [
+    {"arn": "arn:aws:s3:::media-bucket", "resourceId": "media-bucket", "resourceName": "media-bucket",
+     "awsRegion": "us-west-2", "accountId": "111122223333", "resourceType": "AWS::S3::Bucket",
+     "configuration": {"name": "media-bucket", "creationDate": "2022-01-01T00:00:00.000Z"},
+     "tags": [{"key": "MSAM-Diagram", "value": "Sources"}]},
+    {"arn": "arn:aws:ec2:us-west-2:111122223333:instance/i-1", "resourceId": "i-1", "resourceName": None,
+     "awsRegion": "us-west-2", "accountId": "111122223333", "resourceType": "AWS::EC2::Instance",
+     "configuration": {"instanceId": "i-1", "state": {"name": "running"}}, "tags": []},
+    {"arn": "arn:aws:ec2:us-east-1:111122223333:instance/i-2", "resourceId": "i-2", "resourceName": None,
+     "awsRegion": "us-east-1", "accountId": "111122223333", "resourceType": "AWS::EC2::Instance",
+     "configuration": {"instanceId": "i-2"}, "tags": []},
+    {"arn": "arn:aws:cloudfront::111122223333:distribution/E1", "resourceId": "E1", "resourceName": None,
+     "awsRegion": "global", "accountId": "111122223333", "resourceType": "AWS::CloudFront::Distribution",
+     "configuration": {"id": "E1", "distributionConfig": {"origins": {"items": [{"domainName": "origin"}]}}},
+     "tags": []},
+    {"arn": "arn:aws:mediatailor:us-west-2:111122223333:playbackConfiguration/ads", "resourceId": "ads",
+     "resourceName": "ads", "awsRegion": "us-west-2", "accountId": "111122223333",
+     "resourceType": "AWS::MediaTailor::PlaybackConfiguration",
+     "configuration": {"name": "ads", "videoContentSourceUrl": "https://origin"}, "tags": []}
+]
+
+
+class LocalConfigService:  # pylint: disable=R0903
+    """
+    In-memory stand-in for the SelectAggregateResourceConfig API.
+    """
+
+    def __init__(self, resources, page_size=None):
+        self.resources = resources
+        self.page_size = page_size
+        self.calls = 0
+
+    def select_aggregate_resource_config(self, Expression, ConfigurationAggregatorName, Limit, NextToken=None):
+        """
+        Return one page of resources matching the equality conditions in the WHERE clause.
+        """
+        # pylint: disable=C0103,W0613
+        self.calls = self.calls + 1
+        conditions = dict(re.findall(r"(\w+) = '([^']*)'", Expression.split("WHERE", 1)[1]))
+        matches = [resource for resource in self.resources
+                   if all(resource.get(field) == value for field, value in conditions.items())]
+        size = min(Limit, self.page_size or Limit)
+        start = int(NextToken or 0)
+        response = {"Results": [json.dumps(resource) for resource in matches[start:start + size]]}
+        if start + size < len(matches):
+            response["NextToken"] = str(start + size)
+        return response
@@ -19,6 +19,18 @@ from test.test_settings import *
 from test.test_periodic import *
 from test.test_app import *
 from test.test_db import *
+from test.test_concurrency import *
+from test.test_batch import *
+from test.test_diagram import *
+from test.test_graph import *
+from test.test_chains import *
+from test.test_health import *
+from test.test_autolayout import *
+from test.test_throttle import *
+from test.test_inventory import *
+from test.test_account import *
+from test.test_telemetry import *
+from test.test_benchmark_load import *
 
 if __name__ == '__main__':
     unittest.main(verbosity=3)
@@ -0,0 +1,52 @@
+"""
+This module is provides unit tests for the account.py module.
+"""
+
+# pylint: disable=C0415
+
+import unittest
+from unittest.mock import patch
+
+import boto3
+
+
+@patch('boto3.client')
+@patch('boto3.resource')
+class TestAccount(unittest.TestCase):
+    """
+    This class extends TestCase with testing functions
+    """
+
+    def setUp(self):
+        from chalicelib import account
+        account.clear()
+
+    def tearDown(self):
+        from chalicelib import account
+        account.clear()
+
+    def test_caller_identity(self, patched_resource, patched_client):
+        """
+        Test the account_id and partition functions
+        """
+        from chalicelib import account
+        patched_client.return_value.get_caller_identity.return_value = {
+            "Account": "111122223333", "Arn": "arn:aws-cn:sts::111122223333:assumed-role/role/session"}
+        self.assertEqual(account.account_id(), "111122223333")
+        self.assertEqual(account.partition(), "aws-cn")
+        # the identity is retrieved once
+        patched_client.return_value.get_caller_identity.assert_called_once()
+        account.clear()
+        patched_client.return_value.get_caller_identity.return_value = {}
+        self.assertEqual(account.partition(), "aws")
+
+    def test_service_regions(self, patched_resource, patched_client):
+        """
+        Test the service_regions function
+        """
+        from chalicelib import account
+        patched_client.return_value.get_caller_identity.return_value = {"Arn": "arn:aws:sts::1:user/name"}
+        with patch.object(boto3.Session, 'get_available_regions', return_value=["us-east-1"]) as patched_regions:
+            self.assertTrue("us-east-1" in account.service_regions("medialive"))
+            self.assertFalse("eu-west-1" in account.service_regions("medialive"))
+            patched_regions.assert_called_once_with("medialive", partition_name="aws")
@@ -44,6 +44,15 @@ class TestApp(unittest.TestCase):
         app.DYNAMO_RESOURCE.Table.assert_called_once_with('layout_table')
         app.DYNAMO_RESOURCE.Table.return_value.query.assert_called_once()
 
+    def test_get_hydrated_view(self, patched_resource, patched_client):
+        """
+        Test the get_hydrated_view function
+        """
+        import app
+        with patch.object(app.diagram, 'hydrated_view', return_value={}) as patched_view:
+            app.get_hydrated_view("any_view")
+            patched_view.assert_called_once_with("any_view")
+
     def test_delete_view_layout(self, patched_resource, patched_client):
         """
         Test the delete_view_layout function
@@ -58,9 +67,47 @@ class TestApp(unittest.TestCase):
         Test the set_view_layout function
         """
         import app
-        with patch.object(app, 'app', return_value={}):
+        with patch.object(app, 'app') as patched_app, \
+                patch.object(app.node_layout.batch, 'batch_write_items', return_value=[]) as patched_write:
+            patched_app.current_request.json_body = [{"view": "any_view", "id": "node_id", "x": 1, "y": 2}]
             app.set_view_layout()
-            app.DYNAMO_RESOURCE.Table.assert_called_once_with('layout_table')
+            patched_write.assert_called_once()
+            self.assertEqual(patched_write.call_args.args[0], 'layout_table')
+            for body in (None, {"view": "any_view", "id": "node_id"}, [{"view": "any_view"}], ["node_id"]):
+                patched_app.current_request.json_body = body
+                with self.assertRaises(app.BadRequestError):
+                    app.set_view_layout()
+            patched_write.assert_called_once()
+
+    def test_auto_layout_view(self, patched_resource, patched_client):
+        """
+        Test the auto_layout_view function
+        """
+        import app
+        with patch.object(app, 'app') as patched_app, \
+                patch.object(app.autolayout, 'layout_view', return_value={}) as patched_layout:
+            patched_app.current_request.query_params = {"mode": "incremental"}
+            app.auto_layout_view("view")
+            patched_layout.assert_called_with("view", True)
+            patched_app.current_request.query_params = None
+            app.auto_layout_view("view")
+            patched_layout.assert_called_with("view", False)
+
+    def test_delete_view_layouts(self, patched_resource, patched_client):
+        """
+        Test the delete_view_layouts function
+        """
+        import app
+        with patch.object(app, 'app') as patched_app, \
+                patch.object(app.node_layout.batch, 'batch_write_items', return_value=[]) as patched_write:
+            patched_app.current_request.json_body = [{"view": "any_view", "id": "node_id", "x": 1}]
+            self.assertEqual(app.delete_view_layouts(), {"message": "deleted"})
+            patched_write.assert_called_once_with('layout_table', delete_keys=[{"view": "any_view", "id": "node_id"}])
+            for body in (None, 5, [{"id": "node_id"}], [None]):
+                patched_app.current_request.json_body = body
+                with self.assertRaises(app.BadRequestError):
+                    app.delete_view_layouts()
+            patched_write.assert_called_once()
 
     def test_delete_layout_views(self, patched_resource, patched_client):
         """
@@ -167,6 +214,23 @@ class TestApp(unittest.TestCase):
         app.boto3.resource.return_value.Table.assert_called_once_with('content_table')
         app.boto3.resource.return_value.Table.return_value.query.assert_called_once()
 
+    def test_cached_by_arn_list(self, patched_resource, patched_client):
+        """
+        Test the cached_by_arn_list function
+        """
+        import app
+        with patch.object(app, 'app') as patched_app, \
+                patch.object(app.cache.batch, 'batch_get_items', return_value=([], [])) as patched_get:
+            patched_app.current_request.json_body = ["arn-1"]
+            result = app.cached_by_arn_list()
+            patched_get.assert_called_once_with('content_table', [{"arn": "arn-1"}])
+            self.assertEqual(result["missing"], ["arn-1"])
+            for body in (None, {"arns": ["arn-1"]}, ["arn-1", 2]):
+                patched_app.current_request.json_body = body
+                with self.assertRaises(app.BadRequestError):
+                    app.cached_by_arn_list()
+            patched_get.assert_called_once()
+
     def test_put_cached_data(self, patched_resource, patched_client):
         """
         Test the put_cached_data function
@@ -210,7 +274,13 @@ class TestApp(unittest.TestCase):
         Test the incoming_cloudwatch_alarm function
         """
         import app
-        app.incoming_cloudwatch_alarm(MagicMock(), MagicMock())
+        with patch.object(app.health, 'invalidate_health') as patched_invalidate:
+            app.incoming_cloudwatch_alarm(MagicMock(), MagicMock())
+            patched_invalidate.assert_not_called()
+            # only alarm state changes invalidate the health rollup
+            with patch.object(app.cloudwatch_data, 'incoming_cloudwatch_alarm', return_value=True):
+                app.incoming_cloudwatch_alarm(MagicMock(), MagicMock())
+            patched_invalidate.assert_called_once_with()
         app.boto3.resource.assert_called_once()
         app.boto3.resource.return_value.Table.assert_called_once_with('alarms_table')
 
@@ -261,6 +331,31 @@ class TestApp(unittest.TestCase):
         import app
         app.alarms_for_subscriber("arn")
 
+    def test_alarms_for_subscribers(self, patched_resource, patched_client):
+        """
+        Test the alarms_for_subscribers function
+        """
+        import app
+        with patch.object(app, 'app') as patched_app:
+            patched_app.current_request.json_body = ["arn"]
+            alarms = app.alarms_for_subscribers()
+            self.assertEqual(list(alarms.keys()), ["arn"])
+            app.boto3.resource.return_value.Table.assert_called_once_with('alarms_table')
+            too_many = [f"arn-{index}" for index in range(app.cloudwatch_data.EVENT_RESOURCES_LIMIT + 1)]
+            for body in (None, {"arns": ["arn"]}, [1, [2]], too_many):
+                patched_app.current_request.json_body = body
+                with self.assertRaises(app.BadRequestError):
+                    app.alarms_for_subscribers()
+
+    def test_alarm_summaries_for_view(self, patched_resource, patched_client):
+        """
+        Test the alarm_summaries_for_view function
+        """
+        import app
+        app.alarm_summaries_for_view("any_view")
+        app.DYNAMO_RESOURCE.Table.assert_any_call('layout_table')
+        app.DYNAMO_RESOURCE.Table.return_value.query.assert_called_once()
+
     def test_all_subscribed_alarms(self, patched_resource, patched_client):
         """
         Test the all_subscribed_alarms function
@@ -335,6 +430,91 @@ class TestApp(unittest.TestCase):
             app.boto3.resource.return_value.Table.assert_called_once_with('cw_table')
             app.boto3.resource.return_value.Table.return_value.query.assert_called_once()
 
+    def test_get_cloudwatch_events_resources(self, patched_resource, patched_client):
+        """
+        Test the get_cloudwatch_events_resources function
+        """
+        import app
+        # pool threads keep the resources of earlier tests
+        app.cloudwatch_data.concurrency.shutdown()
+        with patch.object(app, 'app') as patched_app:
+            patched_app.current_request.json_body = {"arns": ["arn"]}
+            app.get_cloudwatch_events_resources()
+            app.boto3.resource.return_value.Table.assert_called_once_with('cw_table')
+            app.boto3.resource.return_value.Table.return_value.query.assert_called_once()
+            for body in (None, ["arn"], {"arns": "arn"}, {"arns": [{"arn": "arn"}]}, {"arns": [], "limit": "ten"},
+                         {"arns": ["arn"], "limit": 0}, {"arns": ["arn"], "limit": -5}):
+                patched_app.current_request.json_body = body
+                with self.assertRaises(app.BadRequestError):
+                    app.get_cloudwatch_events_resources()
+            app.boto3.resource.return_value.Table.return_value.query.assert_called_once()
+
+    def test_get_cloudwatch_events_resource_buckets(self, patched_resource, patched_client):
+        """
+        Test the get_cloudwatch_events_resource_buckets function
+        """
+        import app
+        with patch.object(app, 'app') as patched_app:
+            patched_app.current_request.query_params = {"size": "300"}
+            result = app.get_cloudwatch_events_resource_buckets("arn", 0, 1000)
+            self.assertEqual(result["bucket_size"], 300)
+            app.boto3.resource.return_value.Table.assert_called_once_with('cw_table')
+            app.boto3.resource.return_value.Table.return_value.query.assert_called_once()
+            # malformed values are rejected before any query
+            patched_app.current_request.query_params = {"size": "big"}
+            with self.assertRaises(app.BadRequestError):
+                app.get_cloudwatch_events_resource_buckets("arn", 0, 1000)
+            patched_app.current_request.query_params = None
+            with self.assertRaises(app.BadRequestError):
+                app.get_cloudwatch_events_resource_buckets("arn", "yesterday", 1000)
+            app.boto3.resource.return_value.Table.return_value.query.assert_called_once()
+
+    def test_get_cloudwatch_events_resource_bucket(self, patched_resource, patched_client):
+        """
+        Test the get_cloudwatch_events_resource_bucket function
+        """
+        import app
+        with patch.object(app, 'app') as patched_app:
+            patched_app.current_request.query_params = None
+            app.get_cloudwatch_events_resource_bucket("arn", 0)
+            app.boto3.resource.return_value.Table.assert_called_once_with('cw_table')
+            app.boto3.resource.return_value.Table.return_value.query.assert_called_once()
+            patched_app.current_request.query_params = {"size": "1.5"}
+            with self.assertRaises(app.BadRequestError):
+                app.get_cloudwatch_events_resource_bucket("arn", 0)
+
+    def test_graph_routes(self, patched_resource, patched_client):
+        """
+        Test the graph_downstream, graph_upstream, graph_path, graph_health and graph_chains functions
+        """
+        import app
+        with patch.object(app, 'app') as patched_app, \
+                patch.object(app.graph, 'connected_nodes', return_value={}) as patched_nodes, \
+                patch.object(app.graph, 'connection_path', return_value={}) as patched_path:
+            patched_app.current_request.query_params = {"depth": "2"}
+            app.graph_downstream("arn")
+            patched_nodes.assert_called_with("arn", "downstream", "2")
+            patched_app.current_request.query_params = None
+            app.graph_upstream("arn")
+            patched_nodes.assert_called_with("arn", "upstream", None)
+            app.graph_path("arn-1", "arn-2")
+            patched_path.assert_called_once_with("arn-1", "arn-2")
+        with patch.object(app.health, 'get_health', return_value={}) as patched_health:
+            app.graph_health()
+            patched_health.assert_called_once_with()
+        with patch.object(app.chains, 'chains_for_node', return_value=[]) as patched_chains:
+            app.graph_chains("arn")
+            patched_chains.assert_called_once_with("arn")
+
+    def test_get_channel_health(self, patched_resource, patched_client):
+        """
+        Test the get_channel_health function
+        """
+        import app
+        with patch.object(app.health, 'get_channel_health', return_value={}) as patched_health:
+            app.get_channel_health()
+            patched_health.assert_called_once_with()
+
     def test_ping(self, patched_resource, patched_client):
         """
         Test the ping function
@@ -362,8 +542,13 @@ class TestApp(unittest.TestCase):
         Test the update_connections function
         """
         import app
-        app.update_connections(MagicMock(), MagicMock())
-        self.assertEqual(app.boto3.resource.call_count, 68)
+        with patch.object(app.periodic_handlers.chains, 'update_chain_ddb_items') as patched_chains, \
+                patch.object(app.boto3.session, 'Session') as patched_session:
+            app.update_connections(MagicMock(), MagicMock())
+            patched_chains.assert_called_once_with()
+            # the cache writes of each connection type use a session of their own
+            self.assertEqual(patched_session.return_value.resource.call_count, 23)
+        self.assertEqual(app.boto3.resource.call_count, 45)
 
     def test_update_from_tags(self, patched_resource, patched_client):
         """
@@ -396,6 +581,18 @@ class TestApp(unittest.TestCase):
         app.boto3.client.return_value.get_log_events.assert_called_once()
         app.boto3.client.return_value.put_metric_data.assert_called_once()
 
+    def test_refresh_node_connections(self, patched_resource, patched_client):
+        """
+        Test the refresh_node_connections function
+        """
+        import app
+        event = {"version": "0", "id": "1", "source": "msam.events", "detail-type": "MSAM Node Change",
+                 "account": "1234567890", "time": "2022-05-04T20:02:02Z", "region": "us-west-2", "resources": [],
+                 "detail": {"arn": "arn", "service": "medialive-channel", "deleted": True}}
+        with patch.object(app.connections, 'refresh_node_connections', return_value={"message": "refreshed"}) as patched:
+            self.assertEqual(app.refresh_node_connections(event, MagicMock()), {"message": "refreshed"})
+            patched.assert_called_once_with("arn", "medialive-channel", True)
+
     def test_update_ssm_nodes(self, patched_resource, patched_client):
         """
         Test the update_ssm_nodes function
@@ -0,0 +1,112 @@
+"""
+This module is provides unit tests for the autolayout.py module.
+"""
+
+# pylint: disable=C0415
+
+import unittest
+from unittest.mock import patch
+
+
+def edge(from_arn, to_arn):
+    """
+    Return a connection item between two ARNs.
+    """
+    return {"arn": f"{from_arn}:{to_arn}", "from": from_arn, "to": to_arn}
+
+
+# flow -> input -> channel -> (endpoint-1, endpoint-2), a separate input-2 -> channel-2 -> input-2 cycle
+CONNECTIONS = [edge("flow", "input"), edge("input", "channel"), edge("channel", "endpoint-1"),
+               edge("channel", "endpoint-2"), edge("input-2", "channel-2"), edge("channel-2", "input-2"),
+               edge("outside", "flow")]
+
+
+@patch('boto3.client')
+@patch('boto3.resource')
+class TestAutoLayout(unittest.TestCase):
+    """
+    This class extends TestCase with testing functions
+    """
+
+    def test_layers(self, patched_resource, patched_client):
+        """
+        Test the acyclic_successors, assign_layers and order_layers functions
+        """
+        from chalicelib import autolayout
+        following = {"a": {"b": "a:b"}, "b": {"c": "b:c"}, "c": {"a": "c:a", "d": "c:d"}}
+        successors = autolayout.acyclic_successors(["a", "b", "c", "d"], following)
+        # the connection closing the cycle is reversed
+        self.assertEqual(successors, {"a": ["b", "c"], "b": ["c"], "c": ["d"], "d": []})
+        self.assertEqual(autolayout.assign_layers(["a", "b", "c", "d"], successors), [["a"], ["b"], ["c"], ["d"]])
+        # crossed connections are straightened
+        successors = {"a": ["y"], "b": ["x"], "x": [], "y": []}
+        self.assertEqual(autolayout.order_layers([["a", "b"], ["x", "y"]], successors), [["a", "b"], ["y", "x"]])
+
+    def test_arrange(self, patched_resource, patched_client):
+        """
+        Test the arrange function
+        """
+        from chalicelib import autolayout
+        nodes = ["flow", "input", "channel", "endpoint-1", "endpoint-2", "input-2", "channel-2", "note-1", "note-2"]
+        positions = autolayout.arrange(nodes, CONNECTIONS)
+        self.assertEqual(set(positions), set(nodes))
+        self.assertEqual([positions[arn][0] for arn in ["flow", "input", "channel", "endpoint-1"]],
+                         [0, 350, 700, 1050])
+        # the single nodes of a layer are centered on the widest layer
+        self.assertEqual(positions["channel"][1], 125)
+        self.assertEqual({positions["endpoint-1"][1], positions["endpoint-2"][1]}, {0, 250})
+        # the smaller component is stacked below and, being a cycle, starts from its first node
+        self.assertEqual(positions["channel-2"], (0, 750))
+        self.assertEqual(positions["input-2"], (350, 750))
+        # nodes without connections are below the components
+        self.assertEqual(positions["note-1"], (0, 1250))
+        self.assertEqual(positions["note-2"], (350, 1250))
+        self.assertEqual(autolayout.arrange(["note-1"], [], top=100, left=50), {"note-1": (50, 100)})
+
+    def test_place_new(self, patched_resource, patched_client):
+        """
+        Test the place_new function
+        """
+        from chalicelib import autolayout
+        existing = {"input": (350, 0), "channel": (700, 0), "endpoint-1": (1050, 0)}
+        positions = autolayout.place_new(existing, ["flow", "endpoint-2", "channel", "note"], CONNECTIONS)
+        # existing nodes are not moved
+        self.assertNotIn("channel", positions)
+        self.assertEqual(positions["flow"], (0, 0))
+        # the slot next to the channel is taken, so the next row is used
+        self.assertEqual(positions["endpoint-2"], (1050, 250))
+        # unconnected nodes go below the diagram, aligned with its left edge
+        self.assertEqual(positions["note"], (350, 750))
+        # chains of new nodes follow each other
+        positions = autolayout.place_new({"flow": (0, 0)}, ["input", "channel"], CONNECTIONS)
+        self.assertEqual(positions, {"input": (350, 0), "channel": (700, 0)})
+        self.assertEqual(autolayout.place_new({}, ["input-2"], CONNECTIONS), {"input-2": (0, 0)})
+
+    def test_layout_view(self, patched_resource, patched_client):
+        """
+        Test the layout_view and place_nodes functions
+        """
+        from chalicelib import autolayout
+        from botocore.exceptions import ClientError
+        items = [{"view": "view", "id": "flow", "x": 0, "y": 0}, {"view": "view", "id": "input", "x": 350, "y": 0},
+                 {"view": "view", "id": "channel", "x": 0, "y": 0}]
+        with patch.object(autolayout.layout, 'get_view_layout', return_value=items), \
+                patch.object(autolayout.graph, 'cached_connections', return_value=CONNECTIONS), \
+                patch.object(autolayout.layout, 'set_node_layout', return_value={"message": "saved"}) as patched_set:
+            self.assertEqual(autolayout.layout_view("view"), {"message": "saved", "nodes": 3})
+            self.assertEqual(patched_set.call_args.args[0], [{"view": "view", "id": "flow", "x": 0, "y": 0},
+                                                             {"view": "view", "id": "input", "x": 350, "y": 0},
+                                                             {"view": "view", "id": "channel", "x": 700, "y": 0}])
+            # only the nodes at the origin are placed
+            self.assertEqual(autolayout.layout_view("view", incremental=True)["nodes"], 2)
+            self.assertEqual(patched_set.call_args.args[0], [{"view": "view", "id": "channel", "x": 700, "y": 0},
+                                                             {"view": "view", "id": "flow", "x": 0, "y": 0}])
+            autolayout.place_nodes("view", ["channel"])
+            self.assertEqual(patched_set.call_args.args[0], [{"view": "view", "id": "channel", "x": 700, "y": 0}])
+        with patch.object(autolayout.layout, 'get_view_layout', return_value={"exception": "error"}):
+            self.assertEqual(autolayout.layout_view("view"), {"exception": "error"})
+            self.assertEqual(autolayout.place_nodes("view", ["channel"]), {"exception": "error"})
+        with patch.object(autolayout.layout, 'get_view_layout', return_value=items), \
+                patch.object(autolayout.graph, 'cached_connections', side_effect=ClientError({}, "query")):
+            self.assertIn("exception", autolayout.layout_view("view"))
+            self.assertIn("exception", autolayout.place_nodes("view", ["channel"]))
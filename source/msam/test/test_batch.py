@@ -0,0 +1,110 @@
+"""
+This module is provides unit tests for the batch.py module.
+"""
+
+# pylint: disable=C0415
+
+import unittest
+from unittest.mock import patch, MagicMock
+
+
+@patch('boto3.client')
+@patch('boto3.resource')
+class TestBatch(unittest.TestCase):
+    """
+    This class extends TestCase with testing functions
+    """
+
+    def test_chunks(self, patched_resource, patched_client):
+        """
+        Test the chunks function
+        """
+        from chalicelib import batch
+        self.assertEqual(list(batch.chunks(range(5), 2)), [[0, 1], [2, 3], [4]])
+        self.assertEqual(list(batch.chunks([], 2)), [])
+
+    def test_backoff(self, patched_resource, patched_client):
+        """
+        Test the backoff function
+        """
+        from chalicelib import batch
+        with patch.object(batch.time, 'sleep') as patched_sleep:
+            batch.backoff(3)
+            delay = patched_sleep.call_args.args[0]
+            self.assertTrue(0 <= delay <= batch.BATCH_BACKOFF_MILLIS * 8 / 1000)
+
+    def test_batch_get_items(self, patched_resource, patched_client):
+        """
+        Test the batch_get_items function
+        """
+        from chalicelib import batch
+        keys = [{"arn": str(index)} for index in range(150)]
+        mock_resource = MagicMock()
+        mock_resource.batch_get_item.side_effect = [
+            {"Responses": {"table": [{"arn": "0"}]},
+             "UnprocessedKeys": {"table": {"Keys": [{"arn": "1"}]}}},
+            {"Responses": {"table": [{"arn": "1"}]}, "UnprocessedKeys": {}},
+            {"Responses": {"table": [{"arn": "100"}]}}]
+        with patch.object(batch.concurrency, 'thread_resource', return_value=mock_resource), \
+                patch.object(batch, 'backoff') as patched_backoff, \
+                patch.object(batch.concurrency, 'map_concurrent',
+                             side_effect=lambda function, items: [function(item) for item in items]):
+            items, unprocessed = batch.batch_get_items("table", keys)
+            self.assertEqual(items, [{"arn": "0"}, {"arn": "1"}, {"arn": "100"}])
+            self.assertEqual(unprocessed, [])
+            self.assertEqual(mock_resource.batch_get_item.call_count, 3)
+            patched_backoff.assert_called_once_with(0)
+            first_request = mock_resource.batch_get_item.call_args_list[0].kwargs["RequestItems"]
+            self.assertEqual(len(first_request["table"]["Keys"]), 100)
+            # retries are limited and leftover keys are returned
+            mock_resource.batch_get_item.reset_mock(side_effect=True)
+            mock_resource.batch_get_item.return_value = {"UnprocessedKeys": {"table": {"Keys": [{"arn": "1"}]}}}
+            items, unprocessed = batch.batch_get_items("table", [{"arn": "1"}])
+            self.assertEqual(items, [])
+            self.assertEqual(unprocessed, [{"arn": "1"}])
+            self.assertEqual(mock_resource.batch_get_item.call_count, batch.BATCH_RETRIES + 1)
+
+    def test_batch_get_items_concurrent(self, patched_resource, patched_client):
+        """
+        Test the batch_get_items function with worker threads
+        """
+        from chalicelib import batch
+        keys = [{"arn": str(index)} for index in range(250)]
+        patched_resource.return_value.batch_get_item.side_effect = \
+            lambda RequestItems: {"Responses": {"table": RequestItems["table"]["Keys"]}}
+        items, unprocessed = batch.batch_get_items("table", keys)
+        self.assertEqual(sorted(item["arn"] for item in items), sorted(key["arn"] for key in keys))
+        self.assertEqual(unprocessed, [])
+        self.assertEqual(patched_resource.return_value.batch_get_item.call_count, 3)
+
+    def test_batch_write_items(self, patched_resource, patched_client):
+        """
+        Test the batch_write_items function
+        """
+        from chalicelib import batch
+        puts = [{"arn": str(index)} for index in range(30)]
+        mock_resource = MagicMock()
+        mock_resource.batch_write_item.side_effect = [
+            {"UnprocessedItems": {"table": [{"PutRequest": {"Item": {"arn": "1"}}}]}},
+            {"UnprocessedItems": {}},
+            {}]
+        with patch.object(batch.concurrency, 'thread_resource', return_value=mock_resource), \
+                patch.object(batch, 'backoff') as patched_backoff, \
+                patch.object(batch.concurrency, 'map_concurrent',
+                             side_effect=lambda function, items: [function(item) for item in items]):
+            unprocessed = batch.batch_write_items("table", puts, [{"arn": "old"}])
+            self.assertEqual(unprocessed, [])
+            self.assertEqual(mock_resource.batch_write_item.call_count, 3)
+            patched_backoff.assert_called_once_with(0)
+            calls = mock_resource.batch_write_item.call_args_list
+            self.assertEqual(len(calls[0].kwargs["RequestItems"]["table"]), 25)
+            self.assertEqual(calls[1].kwargs["RequestItems"], {"table": [{"PutRequest": {"Item": {"arn": "1"}}}]})
+            self.assertEqual(calls[2].kwargs["RequestItems"]["table"][-1], {"DeleteRequest": {"Key": {"arn": "old"}}})
+            # retries are limited and leftover requests are returned
+            mock_resource.batch_write_item.reset_mock(side_effect=True)
+            mock_resource.batch_write_item.return_value = {
+                "UnprocessedItems": {"table": [{"DeleteRequest": {"Key": {"arn": "old"}}}]}}
+            unprocessed = batch.batch_write_items("table", delete_keys=[{"arn": "old"}])
+            self.assertEqual(unprocessed, [{"DeleteRequest": {"Key": {"arn": "old"}}}])
+            self.assertEqual(mock_resource.batch_write_item.call_count, batch.BATCH_RETRIES + 1)
+            self.assertEqual(batch.batch_write_items("table"), [])
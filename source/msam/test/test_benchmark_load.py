@@ -0,0 +1,53 @@
+"""
+This module is provides unit tests for the benchmark_load.py and benchmark_events.py load tests.
+"""
+
+# pylint: disable=C0415
+
+import json
+import os
+# the benchmarks run in their own process with a fixed command line of this repository's modules
+import subprocess  # nosec B404
+import sys
+import tempfile
+import unittest
+
+
+class TestBenchmarkLoad(unittest.TestCase):
+    """
+    This class extends TestCase with testing functions
+    """
+
+    def test_benchmark_load(self):
+        """
+        Test the load test end to end at a small scale, in its own process
+        """
+        from . import benchmark_load
+        self.assertEqual(benchmark_load.percentile([3, 1, 2, 4], 0.5), 2)
+        self.assertEqual(benchmark_load.percentile([3, 1, 2, 4], 0.99), 4)
+        requests = benchmark_load.schedule(2, 30)
+        self.assertEqual(len([request for request in requests if request[2] == benchmark_load.CACHED_ROUTE]),
+                         2 * len(benchmark_load.CACHED_SERVICES))
+        self.assertEqual(requests, sorted(requests))
+        folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        result = subprocess.run([sys.executable, "-m", "test.benchmark_load", "--clients", "2", "--duration", "30",
+                                 "--scale", "5"], cwd=folder, capture_output=True, text=True, check=False)  # nosec B603
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn(benchmark_load.ALARMS_ROUTE, result.stdout)
+
+    def test_benchmark_events(self):
+        """
+        Test the event storm benchmark at a small scale, in its own process
+        """
+        folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        with tempfile.TemporaryDirectory() as directory:
+            stream = os.path.join(directory, "storm.jsonl")
+            result = subprocess.run([sys.executable, "-m", "test.benchmark_events", "--scale", "20",
+                                     "--duration", "200", "--storm", "1", "--save-events", stream],
+                                    cwd=folder, capture_output=True, text=True, check=False)  # nosec B603
+            self.assertEqual(result.returncode, 0, result.stderr)
+            with open(stream, encoding="utf-8") as events:
+                kinds = {json.loads(line)["kind"] for line in events}
+        self.assertEqual(kinds, {"MediaLive alert", "MediaConnect alert", "MediaStore object", "CloudWatch alarm",
+                                 "MediaPackage HarvestJob"})
+        self.assertIn("peak write capacity", result.stdout)
@@ -117,6 +117,59 @@ class TestCache(unittest.TestCase):
         cache.cached_by_arn(ARN)
         self.assertTrue(internal_exception_raised())
 
+    @patch('os.environ')
+    @patch('boto3.resource')
+    @patch('boto3.client')
+    def test_cached_by_arns(self, patched_env, patched_resource,
+                            patched_client):
+        """
+        Test the cached_by_arns function
+        """
+        from chalicelib import cache
+        with patch.object(cache.batch, 'batch_get_items', return_value=([{"arn": ARN}], [])) as patched_get:
+            items = cache.cached_by_arns([ARN, ARN])
+            patched_get.assert_called_once_with('content_table', [{"arn": ARN}])
+            self.assertEqual(items, [{"arn": ARN}])
+        with patch.object(cache.batch, 'batch_get_items', side_effect=ClientError({}, 'unittest')):
+            self.assertTrue("message" in cache.cached_by_arns([ARN]))
+
+    @patch('os.environ')
+    @patch('boto3.resource')
+    @patch('boto3.client')
+    def test_cached_by_arn_list(self, patched_env, patched_resource,
+                                patched_client):
+        """
+        Test the cached_by_arn_list function
+        """
+        from chalicelib import cache
+        request_obj = MagicMock()
+        request_obj.json_body = ["found", "missing", "found", "slow"]
+        with patch.object(cache.batch, 'batch_get_items',
+                          return_value=([{"arn": "found"}], [{"arn": "slow"}])) as patched_get:
+            result = cache.cached_by_arn_list(request_obj)
+            patched_get.assert_called_once_with(
+                'content_table', [{"arn": "found"}, {"arn": "missing"}, {"arn": "slow"}])
+            self.assertEqual(result, {"items": [{"arn": "found"}], "missing": ["missing"], "unprocessed": ["slow"]})
+        # ARNs over the limit are returned unprocessed
+        with patch.object(cache, 'CACHED_ARNS_LIMIT', 1), \
+                patch.object(cache.batch, 'batch_get_items', return_value=([], [])) as patched_get:
+            result = cache.cached_by_arn_list(request_obj)
+            patched_get.assert_called_once_with('content_table', [{"arn": "found"}])
+            self.assertEqual(result["missing"], ["found"])
+            self.assertEqual(result["unprocessed"], ["missing", "slow"])
+        # items that would overflow the response are returned unprocessed
+        request_obj.json_body = ["large-1", "small", "large-2"]
+        items = [{"arn": "large-2", "data": "x" * 80}, {"arn": "small", "data": ""},
+                 {"arn": "large-1", "data": "x" * 80}]
+        with patch.object(cache, 'CACHED_ARNS_RESPONSE_BYTES', 150), \
+                patch.object(cache.batch, 'batch_get_items', return_value=(items, [])):
+            result = cache.cached_by_arn_list(request_obj)
+            self.assertEqual([item["arn"] for item in result["items"]], ["large-1", "small"])
+            self.assertEqual(result["unprocessed"], ["large-2"])
+            self.assertEqual(result["missing"], [])
+        with patch.object(cache.batch, 'batch_get_items', side_effect=ClientError({}, 'unittest')):
+            self.assertTrue("message" in cache.cached_by_arn_list(request_obj))
+
     @patch('os.environ')
     @patch('boto3.resource')
     @patch('boto3.client')
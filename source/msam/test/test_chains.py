@@ -0,0 +1,126 @@
+"""
+This module is provides unit tests for the chains.py module.
+"""
+
+# pylint: disable=C0415
+
+import json
+import unittest
+from unittest.mock import patch
+
+
+def edge(from_arn, to_arn, suffix=""):
+    """
+    Return a connection item between two ARNs.
+    """
+    return {"arn": f"{from_arn}:{to_arn}{suffix}", "from": from_arn, "to": to_arn}
+
+
+# link -> input -> channel (two pipelines) -> package -> (endpoint-1, endpoint-2)
+# flow-a <-> flow-b is a separate component made only of a cycle
+CONNECTIONS = [edge("link", "input"), edge("input", "channel"), edge("channel", "package", ":0"),
+               edge("channel", "package", ":1"), edge("package", "endpoint-1"), edge("package", "endpoint-2"),
+               edge("flow-a", "flow-b"), edge("flow-b", "flow-a")]
+
+
+@patch('boto3.client')
+@patch('boto3.resource')
+class TestChains(unittest.TestCase):
+    """
+    This class extends TestCase with testing functions
+    """
+
+    def test_components(self, patched_resource, patched_client):
+        """
+        Test the components function
+        """
+        from chalicelib import chains
+        index = chains.graph.adjacency_index(CONNECTIONS)
+        self.assertEqual(chains.components(index), [
+            ["channel", "endpoint-1", "endpoint-2", "input", "link", "package"], ["flow-a", "flow-b"]])
+
+    def test_component_chains(self, patched_resource, patched_client):
+        """
+        Test the successors and component_chains functions
+        """
+        from chalicelib import chains
+        following = chains.successors(chains.graph.adjacency_index(CONNECTIONS))
+        # one link is kept for each pair of nodes
+        self.assertEqual(following["channel"], {"package": "channel:package:0"})
+        found, truncated = chains.component_chains(
+            ["channel", "endpoint-1", "endpoint-2", "input", "link", "package"], following)
+        self.assertFalse(truncated)
+        self.assertEqual([nodes for nodes, _ in found], [
+            ["link", "input", "channel", "package", "endpoint-1"],
+            ["link", "input", "channel", "package", "endpoint-2"]])
+        self.assertEqual(found[0][1], ["link:input", "input:channel", "channel:package:0", "package:endpoint-1"])
+        found, truncated = chains.component_chains(
+            ["channel", "endpoint-1", "endpoint-2", "input", "link", "package"], following, limit=1)
+        self.assertTrue(truncated)
+        self.assertEqual(len(found), 1)
+        # a cycle still produces a chain
+        found, _ = chains.component_chains(["flow-a", "flow-b"], following)
+        self.assertEqual(found, [(["flow-a", "flow-b"], ["flow-a:flow-b"])])
+        # a node fed only from a cycle starts its own chain
+        following = chains.successors(chains.graph.adjacency_index(
+            [edge("a", "b"), edge("c", "d"), edge("d", "c"), edge("d", "b")]))
+        found, _ = chains.component_chains(["a", "b", "c", "d"], following)
+        self.assertEqual([nodes for nodes, _ in found], [["a", "b"], ["c", "d", "b"]])
+
+    def test_chain_ddb_items(self, patched_resource, patched_client):
+        """
+        Test the chain_ddb_items function
+        """
+        from chalicelib import chains
+        items = chains.chain_ddb_items(CONNECTIONS)
+        self.assertEqual([item["service"] for item in items[:5]], ["signal-chain", "signal-chain", "signal-component",
+                                                                   "signal-chain", "signal-component"])
+        # one membership item for each node of each chain, found by the node ARN in its region
+        members = items[5:]
+        self.assertEqual(len(members), 12)
+        self.assertEqual([item["chain"] for item in members if item["region"] == "channel"],
+                         [items[0]["arn"], items[1]["arn"]])
+        self.assertEqual({item["service"] for item in members}, {"signal-chain-member"})
+        self.assertEqual(members[0]["data"], items[0]["data"])
+        component = json.loads(items[2]["data"])
+        self.assertEqual(component["chains"], [items[0]["arn"], items[1]["arn"]])
+        self.assertEqual(json.loads(items[0]["data"])["component"], items[2]["arn"])
+        self.assertEqual(json.loads(items[1]["data"])["sink"], "endpoint-2")
+        # identifiers are stable between passes
+        self.assertEqual([item["arn"] for item in chains.chain_ddb_items(list(reversed(CONNECTIONS)))],
+                         [item["arn"] for item in items])
+
+    def test_update_chain_ddb_items(self, patched_resource, patched_client):
+        """
+        Test the update_chain_ddb_items function
+        """
+        from chalicelib import chains
+        from botocore.exceptions import ClientError
+        stale = {"arn": "arn:msam:signal-chain:global:old"}
+        with patch.object(chains.graph, 'query_connections', return_value=(CONNECTIONS, True)), \
+                patch.object(chains.content, 'put_ddb_items') as patched_put, \
+                patch.object(chains.cache, 'query_by_service', side_effect=[[stale], [], []]):
+            chains.update_chain_ddb_items()
+            self.assertEqual(len(patched_put.call_args.args[0]), 17)
+        batch = patched_resource.return_value.Table.return_value.batch_writer.return_value.__enter__.return_value
+        batch.delete_item.assert_called_once_with(Key={"arn": stale["arn"]})
+        with patch.object(chains.graph, 'query_connections', side_effect=ClientError({}, "query")):
+            chains.update_chain_ddb_items()
+        # chains are not rebuilt from incomplete connections
+        with patch.object(chains.graph, 'query_connections', return_value=(CONNECTIONS, False)), \
+                patch.object(chains.content, 'put_ddb_items') as patched_put:
+            chains.update_chain_ddb_items()
+            patched_put.assert_not_called()
+
+    def test_chains_for_node(self, patched_resource, patched_client):
+        """
+        Test the chains_for_node function
+        """
+        from chalicelib import chains
+        items = chains.chain_ddb_items(CONNECTIONS)
+        members = [item for item in items if item.get("region") == "channel"]
+        with patch.object(chains.cache, 'cached_by_service_region', return_value=members) as patched_query:
+            self.assertEqual(chains.chains_for_node("channel"), items[:2])
+            patched_query.assert_called_once_with("signal-chain-member", "channel")
+        with patch.object(chains.cache, 'cached_by_service_region', return_value={"message": "error"}):
+            self.assertEqual(chains.chains_for_node("channel"), {"message": "error"})
@@ -41,9 +41,17 @@ class TestChannels(unittest.TestCase):
         patched_resource.return_value.Table.return_value = mock_table
 
         # test CHANNEL_NAME not in list
-        with patch.object(settings, 'get_setting', return_value=[CHANNEL_NAME]):
-            channels.delete_channel_nodes(CHANNEL_NAME)
+        with patch.object(settings, 'get_setting', return_value=[CHANNEL_NAME]), \
+                patch.object(channels, 'channel_node_ids', return_value=["A", "B"]), \
+                patch.object(channels.batch, 'batch_write_items', return_value=[]) as patched_write:
+            self.assertEqual(channels.delete_channel_nodes(CHANNEL_NAME), {"message": "done"})
             self.assertTrue(channels.DYNAMO_RESOURCE.Table.return_value.delete_item.call_count == 0)
+            patched_write.assert_called_once_with('channels_table', delete_keys=[{'channel': 'NO-CHANNEL', 'id': 'A'},
+                                                                                 {'channel': 'NO-CHANNEL', 'id': 'B'}])
+            # deletes left unprocessed are reported
+            patched_write.return_value = [{"DeleteRequest": {"Key": {"channel": "NO-CHANNEL", "id": "B"}}}]
+            self.assertEqual(channels.delete_channel_nodes(CHANNEL_NAME),
+                             {"exception": "1 channel nodes not deleted"})
 
         
         mock_table.query.side_effect = ClientError({"Error": {"Code": "400", "Message": "SomeClientError"}}, "query")
@@ -80,25 +88,29 @@ class TestChannels(unittest.TestCase):
         """                    
         from chalicelib import channels
         from chalicelib import settings
-        channels.set_channel_nodes(CHANNEL_NAME, NODE_IDS)
+        with patch.object(channels.batch, 'batch_write_items', return_value=[]) as patched_write:
+            self.assertEqual(channels.set_channel_nodes(CHANNEL_NAME, NODE_IDS + ["A"]), {"message": "saved"})
+            patched_write.assert_called_once_with('channels_table', [{'channel': 'NO-CHANNEL', 'id': node_id}
+                                                                     for node_id in NODE_IDS])
         channels.DYNAMO_RESOURCE.Table.assert_any_call('channels_table')
         channels.DYNAMO_RESOURCE.Table.assert_any_call('settings_table')
         channels.DYNAMO_RESOURCE.Table.return_value.get_item.assert_called_once_with(Key={'id': 'channels'})
-        channels.DYNAMO_RESOURCE.Table.return_value.put_item.assert_any_call(Item={'channel': 'NO-CHANNEL', 'id': 'A'})
-        channels.DYNAMO_RESOURCE.Table.return_value.put_item.assert_any_call(Item={'channel': 'NO-CHANNEL', 'id': 'B'})
-        channels.DYNAMO_RESOURCE.Table.return_value.put_item.assert_any_call(Item={'channel': 'NO-CHANNEL', 'id': 'C'})
-        channels.DYNAMO_RESOURCE.Table.return_value.put_item.assert_any_call(Item={'channel': 'NO-CHANNEL', 'id': 'Z'})
-        channels.DYNAMO_RESOURCE.Table.return_value.put_item.assert_any_call(Item={'id': 'channels', 'value': ['NO-CHANNEL']})    
+        channels.DYNAMO_RESOURCE.Table.return_value.put_item.assert_any_call(Item={'id': 'channels', 'value': ['NO-CHANNEL']})
+        channels.DYNAMO_RESOURCE.reset_mock()
+        # only nodes missing from the channel are written
+        with patch.object(channels, 'channel_node_ids', return_value=["A", "B"]), \
+                patch.object(channels.batch, 'batch_write_items', return_value=[{"PutRequest": {}}]) as patched_write:
+            self.assertIn("exception", channels.set_channel_nodes(CHANNEL_NAME, NODE_IDS))
+            patched_write.assert_called_once_with('channels_table', [{'channel': 'NO-CHANNEL', 'id': 'C'},
+                                                                     {'channel': 'NO-CHANNEL', 'id': 'Z'}])
         channels.DYNAMO_RESOURCE.reset_mock()
         # test exception
         with patch.object(settings, 'get_setting', 
-                    side_effect=ClientError({"Error": {"Code": "400", "Message": "SomeClientError"}}, "get_setting")):
-            channels.set_channel_nodes(CHANNEL_NAME, NODE_IDS)
+                    side_effect=ClientError({"Error": {"Code": "400", "Message": "SomeClientError"}}, "get_setting")), \
+                patch.object(channels.batch, 'batch_write_items', return_value=[]) as patched_write:
+            self.assertIn("exception", channels.set_channel_nodes(CHANNEL_NAME, NODE_IDS))
             channels.DYNAMO_RESOURCE.Table.assert_called_once_with('channels_table')
-            channels.DYNAMO_RESOURCE.Table.return_value.put_item.assert_any_call(Item={'channel': 'NO-CHANNEL', 'id': 'A'})
-            channels.DYNAMO_RESOURCE.Table.return_value.put_item.assert_any_call(Item={'channel': 'NO-CHANNEL', 'id': 'B'})
-            channels.DYNAMO_RESOURCE.Table.return_value.put_item.assert_any_call(Item={'channel': 'NO-CHANNEL', 'id': 'C'})
-            channels.DYNAMO_RESOURCE.Table.return_value.put_item.assert_any_call(Item={'channel': 'NO-CHANNEL', 'id': 'Z'})
+            patched_write.assert_called_once()
 
 
     @patch('os.environ')
@@ -145,13 +157,40 @@ class TestChannels(unittest.TestCase):
         patched_resource.return_value.Table.return_value = mock_table
 
         # test CHANNEL_NAME not in list
-        with patch.object(settings, 'put_setting', return_value=[CHANNEL_NAME]):
-            channels.delete_all_channels()
+        with patch.object(settings, 'put_setting', return_value=[CHANNEL_NAME]), \
+                patch.object(channels.DYNAMO_RESOURCE.Table.return_value, 'scan',
+                             return_value={"Items": [{"channel": "tile", "id": "A"}]}), \
+                patch.object(channels.batch, 'batch_write_items', return_value=[]) as patched_write:
+            self.assertEqual(channels.delete_all_channels(), {"message": "done"})
             channels.DYNAMO_RESOURCE.Table.assert_called_once_with('channels_table')
             channels.DYNAMO_RESOURCE.Table.return_value.scan.assert_called_once_with(ProjectionExpression='channel,id')
+            patched_write.assert_called_once_with('channels_table', delete_keys=[{'channel': 'tile', 'id': 'A'}])
+            # deletes left unprocessed are reported
+            patched_write.return_value = [{"DeleteRequest": {"Key": {"channel": "tile", "id": "A"}}}]
+            self.assertEqual(channels.delete_all_channels(), {"exception": "1 channel nodes not deleted"})
             channels.DYNAMO_RESOURCE.Table.reset_mock()
         
         with patch.object(settings, 'put_setting', 
                         side_effect=ClientError({"Error": {"Code": "400", "Message": "SomeClientError"}}, "put_setting")):
             channels.delete_all_channels()
             self.assertRaises(ClientError)
+
+    @patch('os.environ')
+    @patch('boto3.resource')
+    @patch('boto3.client')
+    def test_channel_members(self, patched_env, patched_resource,
+                             patched_client):
+        """
+        Test the channel_members function
+        """
+        from chalicelib import channels
+        mock_table = MagicMock()
+        mock_table.scan.side_effect = [
+            {"Items": [{"channel": "tile-1", "id": "A"}, {"channel": "tile-2", "id": "B"}], "LastEvaluatedKey": "token"},
+            {"Items": [{"channel": "tile-1", "id": "C"}]}]
+        with patch.object(channels, 'DYNAMO_RESOURCE') as patched_dynamo, \
+                patch.object(channels, 'get_channel_list', return_value=["tile-1", "empty"]):
+            patched_dynamo.Table.return_value = mock_table
+            members = channels.channel_members()
+        self.assertEqual(members, {"tile-1": ["A", "C"], "empty": [], "tile-2": ["B"]})
+        self.assertEqual(mock_table.scan.call_count, 2)
@@ -2,7 +2,7 @@
 This module is provides unit tests for the cloudwatch.py module.
 """
 
-# pylint: disable=C0415,W0201
+# pylint: disable=C0415,W0201,R0904
 
 from datetime import datetime
 import unittest
@@ -51,8 +51,11 @@ class TestCloudWatch(unittest.TestCase):
         mock_table.put_item.return_value = {}
         patched_resource.return_value.Table.return_value = mock_table
         # with namespace
-        cloudwatch.update_alarm_records(REGION, ALARM, [ARN])
+        self.assertTrue(cloudwatch.update_alarm_records(REGION, ALARM, [ARN]))
         cloudwatch.boto3.resource.return_value.Table.return_value.put_item.assert_called_once()
+        # a record already in the same state is not a change
+        mock_table.put_item.return_value = {"Attributes": {"StateValue": ALARM["StateValue"]}}
+        self.assertFalse(cloudwatch.update_alarm_records(REGION, ALARM, [ARN]))
         # exception
         mock_table.put_item.side_effect = CLIENT_ERROR
         cloudwatch.update_alarm_records(REGION, ALARM, [ARN])
@@ -99,8 +102,8 @@ class TestCloudWatch(unittest.TestCase):
         mock_obj.describe_alarms.return_value = {"CompositeAlarms": [ALARM], "MetricAlarms": [ALARM]}
         patched_client.return_value = mock_obj
         original_method = cloudwatch.update_alarm_records
-        cloudwatch.update_alarm_records = MagicMock()
-        cloudwatch.update_alarms(REGION, [ALARM])
+        cloudwatch.update_alarm_records = MagicMock(side_effect=[False, True])
+        self.assertTrue(cloudwatch.update_alarms(REGION, [ALARM]))
         self.assertEqual(cloudwatch.update_alarm_records.call_count, 2)
         cloudwatch.update_alarm_records.assert_any_call(
             'us-west-2',
@@ -142,6 +145,47 @@ class TestCloudWatch(unittest.TestCase):
         self.assertRaises(ClientError)
 
 
+    def test_alarms_for_subscribers(self, patched_env, patched_resource,
+                                    patched_client):
+        """
+        Test the alarms_for_subscribers function
+        """
+        from chalicelib import cloudwatch
+        # pool threads keep the resources of earlier tests
+        cloudwatch.concurrency.shutdown()
+        def query(**kwargs):
+            arn = kwargs["KeyConditionExpression"].get_expression()["values"][1]
+            if arn == "arn-3":
+                raise CLIENT_ERROR
+            if arn == "arn-2":
+                return {"Items": []}
+            return {"Items": [{"RegionAlarmName": "us-west-2:alarm", "ResourceArn": arn, "StateValue": "ALARM"}]}
+        patched_resource.return_value.Table.return_value.query.side_effect = query
+        alarms = cloudwatch.alarms_for_subscribers(["arn-1", "arn-2", "arn-1", "arn-3"])
+        self.assertEqual(list(alarms.keys()), ["arn-1", "arn-2", "arn-3"])
+        self.assertEqual(alarms["arn-1"][0]["AlarmName"], "alarm")
+        self.assertEqual(alarms["arn-1"][0]["Region"], "us-west-2")
+        self.assertEqual(alarms["arn-2"], [])
+        self.assertEqual(alarms["arn-3"], [])
+
+    def test_alarm_summaries_for_view(self, patched_env, patched_resource,
+                                      patched_client):
+        """
+        Test the alarm_summaries_for_view function
+        """
+        from chalicelib import cloudwatch
+        alarms = {
+            "arn-1": [{"StateValue": "ALARM"}, {"StateValue": "OK"}, {"StateValue": "ALARM"}],
+            "arn-2": []
+        }
+        with patch.object(cloudwatch.layout, 'get_view_layout', return_value=[{"id": "arn-1"}, {"id": "arn-2"}]):
+            with patch.object(cloudwatch, 'alarms_for_subscribers', return_value=alarms) as patched_alarms:
+                summaries = cloudwatch.alarm_summaries_for_view("view")
+                patched_alarms.assert_called_once_with(["arn-1", "arn-2"])
+        self.assertEqual(summaries, [{"ResourceArn": "arn-1", "AlarmCount": 3, "States": {"ALARM": 2, "OK": 1}}])
+        with patch.object(cloudwatch.layout, 'get_view_layout', return_value={"exception": "error"}):
+            self.assertEqual(cloudwatch.alarm_summaries_for_view("view"), [])
+
     def test_all_subscribed_alarms(self, patched_env, patched_resource,
                                    patched_client):
         """
@@ -227,6 +271,85 @@ class TestCloudWatch(unittest.TestCase):
         cloudwatch.get_cloudwatch_events_resource(ARN)
         self.assertRaises(ClientError)
 
+    def test_get_cloudwatch_events_resources(self, patched_env,
+                                             patched_resource, patched_client):
+        """
+        Test the get_cloudwatch_events_resources function
+        """
+        from chalicelib import cloudwatch
+        # pool threads keep the resources of earlier tests
+        cloudwatch.concurrency.shutdown()
+        events = {
+            "arn-1": [{"resource_arn": "arn-1", "timestamp": 5}, {"resource_arn": "arn-1", "timestamp": 1}],
+            "arn-2": [{"resource_arn": "arn-2", "timestamp": 4}, {"resource_arn": "arn-2", "timestamp": 2}]
+        }
+        def query(**kwargs):
+            arn = kwargs["KeyConditionExpression"].get_expression()["values"][0].get_expression()["values"][1]
+            if arn == "arn-3":
+                raise CLIENT_ERROR
+            return {"Items": events[arn]}
+        patched_resource.return_value.Table.return_value.query.side_effect = query
+        request_obj = MagicMock()
+        request_obj.json_body = {"arns": ["arn-1", "arn-2", "arn-1", "arn-3"], "start_time": 1, "end_time": 10, "limit": 500}
+        cw_events = cloudwatch.get_cloudwatch_events_resources(request_obj)
+        self.assertEqual([cw_event["timestamp"] for cw_event in cw_events], [5, 4, 2, 1])
+        self.assertEqual(patched_resource.return_value.Table.return_value.query.call_count, 3)
+        self.assertEqual(patched_resource.return_value.Table.return_value.query.call_args.kwargs["Limit"], 100)
+
+    def test_get_cloudwatch_events_resource_buckets(self, patched_env,
+                                                    patched_resource, patched_client):
+        """
+        Test the get_cloudwatch_events_resource_buckets function
+        """
+        from chalicelib import cloudwatch
+        mock_table = MagicMock()
+        mock_table.query.side_effect = [
+            {"Items": [{"timestamp": 1000, "type": "A"}, {"timestamp": 61500, "type": "A"}],
+             "LastEvaluatedKey": "key"},
+            {"Items": [{"timestamp": 2000, "type": "B"}, {"timestamp": 3000, "type": "A"}]}]
+        patched_resource.return_value.Table.return_value = mock_table
+        result = cloudwatch.get_cloudwatch_events_resource_buckets(ARN, "1000", "120000", "60")
+        self.assertEqual(mock_table.query.call_count, 2)
+        self.assertEqual(result["total"], 4)
+        self.assertEqual(result["bucket_size"], 60)
+        self.assertEqual(result["buckets"], [
+            {"start": 1000, "end": 60999, "total": 3, "types": {"A": 2, "B": 1}},
+            {"start": 61000, "end": 120999, "total": 1, "types": {"A": 1}}])
+        # buckets are widened for large windows
+        mock_table.query.side_effect = None
+        mock_table.query.return_value = {"Items": []}
+        result = cloudwatch.get_cloudwatch_events_resource_buckets(ARN, 0, 86400000 * 7, 1)
+        self.assertEqual(result["bucket_size"], 420)
+
+        mock_table.query.side_effect = CLIENT_ERROR
+        result = cloudwatch.get_cloudwatch_events_resource_buckets(ARN, 0, 1)
+        self.assertEqual(result["buckets"], [])
+
+    def test_get_cloudwatch_events_resource_bucket(self, patched_env,
+                                                   patched_resource, patched_client):
+        """
+        Test the get_cloudwatch_events_resource_bucket function
+        """
+        from chalicelib import cloudwatch
+        mock_table = MagicMock()
+        mock_table.query.side_effect = [
+            {"Items": [{"timestamp": 2000}], "LastEvaluatedKey": "key"},
+            {"Items": [{"timestamp": 1000}]}]
+        patched_resource.return_value.Table.return_value = mock_table
+        cw_events = cloudwatch.get_cloudwatch_events_resource_bucket(ARN, "1000", "60")
+        self.assertEqual(cw_events, [{"timestamp": 2000}, {"timestamp": 1000}])
+        self.assertEqual(mock_table.query.call_args.kwargs["ScanIndexForward"], False)
+
+        # paging stops once the limit is reached
+        mock_table.query.side_effect = [
+            {"Items": [{"timestamp": 3000}, {"timestamp": 2000}], "LastEvaluatedKey": "key"},
+            {"Items": [{"timestamp": 1000}]}]
+        with patch.object(cloudwatch, 'EVENT_BUCKET_EVENTS_LIMIT', 1):
+            self.assertEqual(cloudwatch.get_cloudwatch_events_resource_bucket(ARN, 1000), [{"timestamp": 3000}])
+
+        mock_table.query.side_effect = CLIENT_ERROR
+        self.assertEqual(cloudwatch.get_cloudwatch_events_resource_bucket(ARN, 1000), [])
+
     def test_incoming_cloudwatch_alarm(self, patched_env, patched_resource,
                                        patched_client):
         """
@@ -236,8 +359,12 @@ class TestCloudWatch(unittest.TestCase):
         SNS_ARN = "arn:aws:sns:us-east-1:123456789012:mystack-mytopic-NZJ5JSMVGFIE"
         EVENT = {"Records": [{"Sns": {"TopicArn": SNS_ARN, "Message": "\"this message\""}}]}
         with patch.object(cloudwatch, 'subscribers_to_alarm', return_value=[SUBSCRIBER]):
-            cloudwatch.incoming_cloudwatch_alarm(EVENT, None)
+            self.assertTrue(cloudwatch.incoming_cloudwatch_alarm(EVENT, None))
             self.assertEqual(cloudwatch.boto3.resource.return_value.Table.return_value.put_item.call_count, 1)
+            # a notification repeating the stored state is not a change
+            cloudwatch.boto3.resource.return_value.Table.return_value.put_item.return_value = {
+                "Attributes": {"StateValue": None}}
+            self.assertFalse(cloudwatch.incoming_cloudwatch_alarm(EVENT, None))
         #exception
         with patch.object(cloudwatch, 'subscribers_to_alarm', side_effect=CLIENT_ERROR):
             cloudwatch.incoming_cloudwatch_alarm(EVENT, None)
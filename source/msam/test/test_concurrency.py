@@ -0,0 +1,82 @@
+"""
+This module is provides unit tests for the concurrency.py module.
+"""
+
+# pylint: disable=C0415
+
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+
+@patch('boto3.client')
+@patch('boto3.resource')
+class TestConcurrency(unittest.TestCase):
+    """
+    This class extends TestCase with testing functions
+    """
+
+    def test_map_concurrent(self, patched_resource, patched_client):
+        """
+        Test the map_concurrent function
+        """
+        from chalicelib import concurrency
+
+        def slow_square(value):
+            # finish in reverse order to prove the results keep item order
+            time.sleep((5 - value) * 0.01)
+            return value * value
+
+        self.assertEqual(concurrency.map_concurrent(slow_square, range(5)), [0, 1, 4, 9, 16])
+        self.assertEqual(concurrency.map_concurrent(slow_square, []), [])
+        self.assertEqual(concurrency.map_concurrent(slow_square, [2], max_workers=0), [4])
+
+    def test_shared_pool(self, patched_resource, patched_client):
+        """
+        Test the executor and shutdown functions and nested map_concurrent calls
+        """
+        from chalicelib import concurrency
+        concurrency.shutdown()
+
+        def thread_name(_):
+            time.sleep(0.01)
+            return threading.current_thread().name
+
+        first = set(concurrency.map_concurrent(thread_name, range(8)))
+        second = set(concurrency.map_concurrent(thread_name, range(8)))
+        # the same pool threads serve every call
+        self.assertTrue(second <= set(thread.name for thread in threading.enumerate()))
+        self.assertTrue(all(name.startswith("msam") for name in first | second))
+        self.assertIs(concurrency.executor(), concurrency.executor())
+        # a call from a pool thread runs inline instead of waiting for a free thread
+        nested = concurrency.map_concurrent(lambda _: concurrency.map_concurrent(thread_name, range(4)), range(8))
+        self.assertTrue(all(len(set(names)) == 1 for names in nested))
+        # max_workers bounds the threads used by one call
+        self.assertEqual(len(set(concurrency.map_concurrent(thread_name, range(8), max_workers=2))), 2)
+
+        def fail(_):
+            raise ValueError("failed")
+
+        with self.assertRaises(ValueError):
+            concurrency.map_concurrent(fail, range(4))
+        concurrency.shutdown()
+        self.assertIsNone(concurrency.EXECUTOR_STATE["executor"])
+
+    def test_thread_resource(self, patched_resource, patched_client):
+        """
+        Test the thread_resource function
+        """
+        from chalicelib import concurrency
+        patched_resource.side_effect = lambda *args, **kwargs: object()
+        main_resource = concurrency.thread_resource('dynamodb')
+        self.assertIs(concurrency.thread_resource('dynamodb'), main_resource)
+        other = []
+        thread = threading.Thread(target=lambda: other.append(concurrency.thread_resource('dynamodb')))
+        thread.start()
+        thread.join()
+        self.assertIsNot(other[0], main_resource)
+        patched_resource.assert_called_with('dynamodb', config=concurrency.MSAM_BOTO3_CONFIG)
+        concurrency.shutdown()
+        self.assertIsNot(concurrency.thread_resource('dynamodb'), main_resource)
+        concurrency.shutdown()
@@ -4,6 +4,7 @@ This module is provides unit tests for the connections.py module.
 
 # pylint: disable=C0415,W0201,R0904
 
+import json
 import unittest
 from unittest.mock import patch
 from botocore.exceptions import ClientError
@@ -209,8 +210,9 @@ class TestConnections(unittest.TestCase):
         Test the update_connection_ddb_items function
         """
         from chalicelib import connections, content
-        connections.update_connection_ddb_items()
-        
+        with patch.object(content.boto3.session, 'Session'):
+            connections.update_connection_ddb_items()
+
         with patch.object(content, 'put_ddb_items', side_effect=CLIENT_ERROR):
             connections.update_connection_ddb_items()
             self.assertRaises(ClientError)
@@ -249,6 +251,12 @@ class TestConnections(unittest.TestCase):
         with patch.object(cache, 'cached_by_service', side_effect=(CACHED_ML_CHANNELS_2, CACHED_MP_CHANNELS)):
             items = connections.medialive_channel_mediapackage_channel_ddb_items()
             self.assertEqual(len(items), 0)
+        # every channel is matched, not just the first
+        channels = [{"data": json.dumps({"Arn": f"channel-{index}", "ChannelClass": "STANDARD", "Destinations": [
+            {"MediaPackageSettings": [{"ChannelId": "MyLiveStreaming"}], "Settings": []}]})} for index in range(3)]
+        with patch.object(cache, 'cached_by_service', side_effect=(channels, CACHED_MP_CHANNELS)):
+            items = connections.medialive_channel_mediapackage_channel_ddb_items()
+            self.assertEqual(len(items), 6)
         # exception
         with patch.object(cache, 'cached_by_service', side_effect=CLIENT_ERROR):
             items = connections.medialive_channel_mediapackage_channel_ddb_items()
@@ -446,6 +454,13 @@ class TestConnections(unittest.TestCase):
         with patch.object(cache, 'cached_by_service', side_effect=(CACHED_MC_FLOWS, CACHED_ML_INPUTS)):
             items = connections.mediaconnect_flow_medialive_input_ddb_items()
             self.assertEqual(len(items), 0)
+        # every output of every flow is matched, not just the first
+        flows = [{"arn": f"flow-{index}", "data": json.dumps({"FlowArn": f"flow-{index}", "Outputs": [
+            {"MediaLiveInputArn": f"input-{index}-a"}, {"MediaLiveInputArn": f"input-{index}-b"}]})}
+                 for index in range(2)]
+        with patch.object(cache, 'cached_by_service', side_effect=(flows,)):
+            items = connections.mediaconnect_flow_medialive_input_ddb_items()
+            self.assertEqual([item["to"] for item in items], ["input-0-a", "input-0-b", "input-1-a", "input-1-b"])
         # exception
         with patch.object(cache, 'cached_by_service', side_effect=CLIENT_ERROR):
             items = connections.mediaconnect_flow_medialive_input_ddb_items()
@@ -581,3 +596,52 @@ class TestConnections(unittest.TestCase):
         with patch.object(cache, 'cached_by_service', side_effect=CLIENT_ERROR):
             items = connections.medialive_channel_mediaconnect_flow_ddb_items()
             self.assertEqual(len(items), 0)
+
+    def test_refresh_node_connections(self, patched_env, patched_resource,
+                                      patched_client):
+        """
+        Test the node_matchers and refresh_node_connections functions
+        """
+        from chalicelib import connections
+        names = [matcher.__name__ for matcher in connections.node_matchers("medialive-multiplex")]
+        self.assertEqual(names, ["medialive_channel_multiplex_ddb_items", "multiplex_mediaconnect_flow_ddb_items"])
+        self.assertEqual(len(connections.node_matchers("mediapackage-origin-endpoint")), 5)
+        arn = "arn:aws:medialive:us-west-2:1234567890:multiplex:1"
+        found = connections.connection_to_ddb_item("channel", arn, "medialive-channel-multiplex", {})
+        other = connections.connection_to_ddb_item("channel", "other", "medialive-channel-multiplex", {})
+        cached = [{"arn": found["arn"]}, {"arn": "channel:stale"}]
+        matchers = [lambda: [found, other], lambda: []]
+        with patch.object(connections, 'node_matchers', return_value=matchers), \
+                patch.object(connections, 'cached_node_connections', return_value=cached), \
+                patch.object(connections.batch, 'batch_write_items', return_value=[]) as patched_write:
+            result = connections.refresh_node_connections(arn, "medialive-multiplex")
+            self.assertEqual(result, {"message": "refreshed", "connections": 1, "removed": 1})
+            # only the node's connections are written or removed
+            patched_write.assert_called_once_with(connections.cache.CONTENT_TABLE_NAME, [found], [{"arn": "channel:stale"}])
+            connections.refresh_node_connections(arn, "medialive-multiplex", deleted=True)
+            self.assertEqual(patched_write.call_args.args[1:], ([], cached))
+            patched_write.return_value = [{}]
+            self.assertIn("exception", connections.refresh_node_connections(arn, "medialive-multiplex"))
+        with patch.object(connections, 'node_matchers', return_value=[]), \
+                patch.object(connections, 'cached_node_connections', side_effect=CLIENT_ERROR):
+            self.assertIn("exception", connections.refresh_node_connections(arn, "medialive-multiplex"))
+        # only the connection types of the node are searched
+        patched_resource.return_value.Table.return_value.query.return_value = {"Items": [{"arn": "connection"}]}
+        self.assertEqual(connections.cached_node_connections(arn, "medialive-multiplex"),
+                         [{"arn": "connection"}, {"arn": "connection"}])
+
+    def test_benchmark_connections(self, patched_env, patched_resource,
+                                   patched_client):
+        """
+        Test the connection matcher benchmark at a small scale
+        """
+        from chalicelib import connections
+        from . import benchmark_connections
+        results = benchmark_connections.run_benchmark([20], memory=False)
+        self.assertEqual(len(results), len(connections.matchers()))
+        found = {result["matcher"]: result["connections"] for result in results}
+        self.assertGreater(found["mediapackage_channel_mediapackage_endpoint"], 0)
+        self.assertGreater(found["mediaconnect_flow_mediaconnect_flow"], 0)
+        self.assertEqual(benchmark_connections.compare(results, results), [])
+        slower = [dict(result, seconds=result["seconds"] + 1) for result in results]
+        self.assertEqual(len(benchmark_connections.compare(slower, results)), len(results))
@@ -21,8 +21,40 @@ class TestContent(unittest.TestCase):
         Test the put_ddb_item function
         """
         from chalicelib import content
-        content.put_ddb_items(["us-east-1"])
-        content.boto3.resource.assert_called_once()
-        content.boto3.resource.return_value.Table.assert_called_once_with('content_table')
-        content.boto3.resource.return_value.Table.return_value.put_item.assert_called_once_with(Item='us-east-1')
+        with patch.object(content.boto3.session, 'Session') as patched_session:
+            content.put_ddb_items(["us-east-1"])
+        patched_session.assert_called_once_with()
+        resource = patched_session.return_value.resource
+        resource.assert_called_once_with('dynamodb', config=content.MSAM_BOTO3_CONFIG)
+        resource.return_value.Table.assert_called_once_with('content_table')
+        table = resource.return_value.Table.return_value
+        table.batch_writer.assert_called_once_with(overwrite_by_pkeys=["arn"])
+        table.batch_writer.return_value.__enter__.return_value.put_item.assert_called_once_with(Item='us-east-1')
         print()
+
+    def test_put_ddb_items_stream(self, patched_env, patched_resource,
+                                  patched_client):
+        """
+        Test the put_ddb_items function with a generator and a failing writer
+        """
+        from botocore.exceptions import ClientError
+        from chalicelib import content
+        with patch.object(content.boto3.session, 'Session') as patched_session:
+            table = patched_session.return_value.resource.return_value.Table.return_value
+            batch = table.batch_writer.return_value.__enter__.return_value
+            content.put_ddb_items(f"item-{index}" for index in range(content.WRITE_QUEUE_SIZE * 3))
+            self.assertEqual(batch.put_item.call_count, content.WRITE_QUEUE_SIZE * 3)
+
+            # items produced before a discovery error are still written
+            def failing_items():
+                yield "item"
+                raise ClientError({"Error": {"Code": "400", "Message": "SomeClientError"}}, "list_channels")
+            batch.put_item.reset_mock()
+            with self.assertRaises(ClientError):
+                content.put_ddb_items(failing_items())
+            batch.put_item.assert_called_once_with(Item="item")
+
+            # write errors are raised to the caller
+            batch.put_item.side_effect = ClientError({"Error": {"Code": "400", "Message": "SomeClientError"}}, "batch_write_item")
+            with self.assertRaises(ClientError):
+                content.put_ddb_items(f"item-{index}" for index in range(content.WRITE_QUEUE_SIZE * 3))
@@ -0,0 +1,64 @@
+"""
+This module is provides unit tests for the diagram.py module.
+"""
+
+# pylint: disable=C0415
+
+import unittest
+from unittest.mock import patch
+
+VIEW = "view_id"
+LAYOUT = [{"view": VIEW, "id": "arn-1", "x": 0, "y": 0}, {"view": VIEW, "id": "arn-2", "x": 10, "y": 0}]
+CONNECTIONS = [{"arn": "arn-1:arn-2", "from": "arn-1", "to": "arn-2"},
+               {"arn": "arn-1:arn-3", "from": "arn-1", "to": "arn-3"}]
+
+
+@patch('boto3.client')
+@patch('boto3.resource')
+class TestDiagram(unittest.TestCase):
+    """
+    This class extends TestCase with testing functions
+    """
+
+    def test_view_connections(self, patched_resource, patched_client):
+        """
+        Test the view_connections function
+        """
+        from chalicelib import diagram
+        from botocore.exceptions import ClientError
+        diagram.graph.CONNECTION_CACHE.update({"updated": 0, "items": None, "index": None})
+        with patch.object(diagram.cache, 'query_by_service', return_value=CONNECTIONS) as patched_query:
+            edges = diagram.view_connections({"arn-1", "arn-2"})
+            self.assertEqual(patched_query.call_count, len(diagram.graph.connections.CONNECTION_SERVICES))
+        # one copy of the matching connection per service
+        self.assertEqual(edges, [CONNECTIONS[0]] * len(diagram.graph.connections.CONNECTION_SERVICES))
+        diagram.graph.CONNECTION_CACHE.update({"updated": 0, "items": None, "index": None})
+        with patch.object(diagram.cache, 'query_by_service', side_effect=ClientError({}, "query")):
+            self.assertEqual(diagram.view_connections({"arn-1", "arn-2"}), [])
+
+    def test_hydrated_view(self, patched_resource, patched_client):
+        """
+        Test the hydrated_view function
+        """
+        from chalicelib import diagram
+        with patch.object(diagram.layout, 'get_view_layout', return_value=LAYOUT), \
+                patch.object(diagram.cache, 'cached_by_arns', return_value=[{"arn": "arn-1"}]) as patched_nodes, \
+                patch.object(diagram, 'view_connections', return_value=[CONNECTIONS[0]]), \
+                patch.object(diagram.cloudwatch, 'alarms_for_subscribers',
+                             return_value={"arn-1": [{"AlarmName": "alarm"}], "arn-2": []}), \
+                patch.object(diagram.notes, 'get_resource_notes_batch',
+                             return_value={"arn-2": {"notes": "note"}}) as patched_notes:
+            result = diagram.hydrated_view(VIEW)
+            patched_nodes.assert_called_once_with(["arn-1", "arn-2"])
+            patched_notes.assert_called_once_with(["arn-1", "arn-2", "arn-1:arn-2"])
+        self.assertEqual(result, {
+            "view": VIEW,
+            "layout": LAYOUT,
+            "nodes": [{"arn": "arn-1"}],
+            "connections": [CONNECTIONS[0]],
+            "alarms": {"arn-1": [{"AlarmName": "alarm"}]},
+            "notes": {"arn-2": {"notes": "note"}}
+        })
+        # layout errors are passed back
+        with patch.object(diagram.layout, 'get_view_layout', return_value={"exception": "error"}):
+            self.assertEqual(diagram.hydrated_view(VIEW), {"exception": "error"})
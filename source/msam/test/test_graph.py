@@ -0,0 +1,106 @@
+"""
+This module is provides unit tests for the graph.py module.
+"""
+
+# pylint: disable=C0415
+
+import unittest
+from unittest.mock import patch
+
+
+def edge(from_arn, to_arn):
+    """
+    Return a connection item between two ARNs.
+    """
+    return {"arn": f"{from_arn}:{to_arn}", "from": from_arn, "to": to_arn}
+
+
+# flow -> input -> channel -> package -> (endpoint-1, endpoint-2), endpoint-1 -> cdn
+CONNECTIONS = [edge("flow", "input"), edge("input", "channel"), edge("channel", "package"),
+               edge("package", "endpoint-1"), edge("package", "endpoint-2"), edge("endpoint-1", "cdn"),
+               edge("input", "cdn"), {"arn": "partial", "from": "flow"}]
+
+
+@patch('boto3.client')
+@patch('boto3.resource')
+class TestGraph(unittest.TestCase):
+    """
+    This class extends TestCase with testing functions
+    """
+
+    def setUp(self):
+        from chalicelib import graph
+        graph.CONNECTION_CACHE.update({"updated": 0, "items": None, "index": None})
+
+    def test_cached_connections(self, patched_resource, patched_client):
+        """
+        Test the query_connections, cached_connections and connection_index functions
+        """
+        from chalicelib import graph
+        from botocore.exceptions import ClientError
+        services = len(graph.connections.CONNECTION_SERVICES)
+        with patch.object(graph.cache, 'query_by_service', return_value=CONNECTIONS[:1]) as patched_query:
+            items = graph.cached_connections()
+            self.assertEqual(patched_query.call_count, services)
+            # the connections and their index are reused until they expire
+            self.assertIs(graph.cached_connections(), items)
+            self.assertEqual(list(graph.connection_index()[graph.DOWNSTREAM]), ["flow"])
+            self.assertEqual(patched_query.call_count, services)
+            graph.CONNECTION_CACHE["updated"] = 0
+            graph.cached_connections()
+            self.assertEqual(patched_query.call_count, services * 2)
+        self.assertEqual(items, CONNECTIONS[:1] * services)
+        graph.CONNECTION_CACHE.update({"updated": 0, "items": None, "index": None})
+        with patch.object(graph.cache, 'query_by_service', side_effect=ClientError({}, "query")):
+            self.assertEqual(graph.query_connections(), ([], False))
+            # incomplete connections are not kept
+            self.assertEqual(graph.cached_connections(), [])
+        self.assertIsNone(graph.CONNECTION_CACHE["items"])
+
+    def test_traverse(self, patched_resource, patched_client):
+        """
+        Test the adjacency_index and traverse functions
+        """
+        from chalicelib import graph
+        index = graph.adjacency_index(CONNECTIONS)
+        self.assertNotIn("partial", [item["arn"] for item in index[graph.DOWNSTREAM]["flow"]])
+        result = graph.traverse(index, "input", graph.DOWNSTREAM, 2)
+        self.assertEqual(result["nodes"], [{"arn": "channel", "depth": 1}, {"arn": "cdn", "depth": 1},
+                                           {"arn": "package", "depth": 2}])
+        self.assertEqual([item["arn"] for item in result["connections"]],
+                         ["input:channel", "input:cdn", "channel:package"])
+        result = graph.traverse(index, "cdn", graph.UPSTREAM, 10)
+        self.assertEqual({node["arn"]: node["depth"] for node in result["nodes"]},
+                         {"endpoint-1": 1, "input": 1, "package": 2, "flow": 2, "channel": 3})
+        self.assertEqual(graph.traverse(index, "unknown", graph.UPSTREAM, 10)["nodes"], [])
+
+    def test_shortest_path(self, patched_resource, patched_client):
+        """
+        Test the shortest_path function
+        """
+        from chalicelib import graph
+        index = graph.adjacency_index(CONNECTIONS)
+        self.assertEqual([item["arn"] for item in graph.shortest_path(index, "flow", "cdn")],
+                         ["flow:input", "input:cdn"])
+        self.assertEqual(len(graph.shortest_path(index, "flow", "endpoint-2")), 4)
+        # paths only follow connections downstream
+        self.assertEqual(graph.shortest_path(index, "cdn", "flow"), [])
+        self.assertEqual(graph.shortest_path(index, "flow", "flow"), [])
+
+    def test_api_entry_points(self, patched_resource, patched_client):
+        """
+        Test the parse_depth, connected_nodes and connection_path functions
+        """
+        from chalicelib import graph
+        self.assertEqual(graph.parse_depth(None), graph.DEFAULT_DEPTH)
+        self.assertEqual(graph.parse_depth("bad"), graph.DEFAULT_DEPTH)
+        self.assertEqual(graph.parse_depth("0"), 1)
+        self.assertEqual(graph.parse_depth("1000"), graph.MAX_DEPTH)
+        with patch.object(graph, 'query_connections', return_value=(CONNECTIONS, True)):
+            result = graph.connected_nodes("package%3A1", graph.DOWNSTREAM, "1")
+            self.assertEqual(result["arn"], "package:1")
+            self.assertEqual(result["depth"], 1)
+            result = graph.connection_path("flow", "endpoint-1")
+            self.assertEqual(result["nodes"], ["flow", "input", "channel", "package", "endpoint-1"])
+            self.assertEqual(len(result["connections"]), 4)
+            self.assertEqual(graph.connection_path("cdn", "flow")["nodes"], [])
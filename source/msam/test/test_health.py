@@ -0,0 +1,133 @@
+"""
+This module is provides unit tests for the health.py module.
+"""
+
+# pylint: disable=C0415
+
+import unittest
+from unittest.mock import patch
+
+
+def edge(from_arn, to_arn):
+    """
+    Return a connection item between two ARNs.
+    """
+    return {"arn": f"{from_arn}:{to_arn}", "from": from_arn, "to": to_arn}
+
+
+# flow -> input -> channel -> package, a separate input-2 -> channel-2
+CONNECTIONS = [edge("flow", "input"), edge("input", "channel"), edge("channel", "package"),
+               edge("input-2", "channel-2")]
+
+
+@patch('boto3.client')
+@patch('boto3.resource')
+class TestHealth(unittest.TestCase):
+    """
+    This class extends TestCase with testing functions
+    """
+
+    def setUp(self):
+        from chalicelib import health
+        health.HEALTH_CACHE.update({"version": None, "updated": 0, "health": None})
+
+    def test_node_health(self, patched_resource, patched_client):
+        """
+        Test the node_health function
+        """
+        from chalicelib import health
+        index = health.graph.adjacency_index(CONNECTIONS)
+        nodes = health.node_health({"input": 2}, {"channel": 1}, index)
+        self.assertEqual(nodes["input"], {"alarms": 2, "alerts": 0, "status": "unhealthy", "impacted_by": []})
+        self.assertEqual(nodes["channel"], {"alarms": 0, "alerts": 1, "status": "unhealthy", "impacted_by": ["input"]})
+        self.assertEqual(nodes["package"], {"alarms": 0, "alerts": 0, "status": "impacted",
+                                            "impacted_by": ["channel", "input"]})
+        # nodes upstream of a problem and unconnected nodes are healthy
+        self.assertNotIn("flow", nodes)
+        self.assertNotIn("channel-2", nodes)
+        with patch.object(health, 'MAX_IMPACT_CAUSES', 1):
+            self.assertEqual(health.node_health({"input": 2}, {"channel": 1}, index)["package"]["impacted_by"],
+                             ["channel"])
+
+    def test_tile_health(self, patched_resource, patched_client):
+        """
+        Test the tile_health function
+        """
+        from chalicelib import health
+        nodes = health.node_health({"input": 2}, {"channel": 1}, health.graph.adjacency_index(CONNECTIONS))
+        state_counts = {"ALARM": {"input": 2}, "OK": {"input": 1, "channel-2": 3}, "INSUFFICIENT_DATA": {}}
+        tiles = health.tile_health({"tile-1": ["flow", "input", "channel", "package"], "tile-2": ["package"],
+                                    "tile-3": ["input-2", "channel-2"], "empty": []}, nodes, state_counts)
+        self.assertEqual(tiles["tile-1"], {"nodes": 4, "alarms": 2,
+                                           "alarm_states": {"ALARM": 2, "OK": 1, "INSUFFICIENT_DATA": 0},
+                                           "alerts": 1, "unhealthy": 2, "impacted": 1, "status": "unhealthy"})
+        self.assertEqual(tiles["tile-2"]["status"], "impacted")
+        self.assertEqual(tiles["tile-3"]["status"], "ok")
+        self.assertEqual(tiles["tile-3"]["alarm_states"], {"ALARM": 0, "OK": 3, "INSUFFICIENT_DATA": 0})
+        self.assertEqual(tiles["empty"], {"nodes": 0, "alarms": 0,
+                                          "alarm_states": {"ALARM": 0, "OK": 0, "INSUFFICIENT_DATA": 0},
+                                          "alerts": 0, "unhealthy": 0, "impacted": 0, "status": "ok"})
+
+    def test_health_version(self, patched_resource, patched_client):
+        """
+        Test the health_version and invalidate_health functions
+        """
+        from chalicelib import health
+        from botocore.exceptions import ClientError
+        table = patched_resource.return_value.Table.return_value
+        table.get_item.return_value = {"Item": {"arn": health.HEALTH_VERSION_ARN, "version": 4}}
+        self.assertEqual(health.health_version(), 4)
+        table.get_item.return_value = {}
+        self.assertEqual(health.health_version(), 0)
+        table.get_item.side_effect = ClientError({}, "get_item")
+        self.assertIsNone(health.health_version())
+        health.invalidate_health()
+        table.update_item.assert_called_once_with(Key={"arn": health.HEALTH_VERSION_ARN},
+                                                  UpdateExpression="ADD version :one",
+                                                  ExpressionAttributeValues={":one": 1})
+        table.update_item.side_effect = ClientError({}, "update_item")
+        health.invalidate_health()
+
+    def test_get_health(self, patched_resource, patched_client):
+        """
+        Test the compute_health and get_health functions
+        """
+        from chalicelib import health
+        from botocore.exceptions import ClientError
+        with patch.object(health, 'health_version', side_effect=[1, 1, 2, None]), \
+                patch.object(health.cloudwatch, 'subscribed_with_state',
+                             return_value=[{"ResourceArn": "input", "AlarmCount": 2}]) as patched_alarms, \
+                patch.object(health.cloudwatch, 'get_cloudwatch_events_state',
+                             return_value=[{"resource_arn": "channel"}, {"resource_arn": "channel"}]), \
+                patch.object(health.graph, 'connection_index',
+                             return_value=health.graph.adjacency_index(CONNECTIONS)), \
+                patch.object(health.channels, 'channel_members', return_value={"tile": ["package"]}):
+            result = health.get_health()
+            self.assertEqual(result["version"], 1)
+            self.assertEqual(result["nodes"]["channel"]["alerts"], 2)
+            self.assertEqual(result["channels"]["tile"]["status"], "impacted")
+            self.assertEqual(result["channels"]["tile"]["alarm_states"], {"ALARM": 0, "OK": 0, "INSUFFICIENT_DATA": 0})
+            # each alarm state is read once per rollup
+            self.assertEqual([call.args[0] for call in patched_alarms.call_args_list], health.ALARM_STATES)
+            # the same version is served from memory
+            self.assertIs(health.get_health(), result)
+            self.assertEqual(patched_alarms.call_count, len(health.ALARM_STATES))
+            # a new version or an unreadable one is recomputed
+            health.get_health()
+            health.get_health()
+            self.assertEqual(patched_alarms.call_count, 3 * len(health.ALARM_STATES))
+        with patch.object(health, 'health_version', return_value=3), \
+                patch.object(health, 'compute_health', side_effect=ClientError({}, "query")):
+            self.assertIn("message", health.get_health())
+
+    def test_get_channel_health(self, patched_resource, patched_client):
+        """
+        Test the get_channel_health function
+        """
+        from chalicelib import health
+        tiles = {"tile": {"nodes": 1, "alarms": 0, "alarm_states": {"ALARM": 0, "OK": 1, "INSUFFICIENT_DATA": 0},
+                          "alerts": 0, "unhealthy": 0, "impacted": 0, "status": "ok"}}
+        with patch.object(health, 'get_health', return_value={"nodes": {}, "channels": tiles}):
+            self.assertEqual(health.get_channel_health(), tiles)
+        with patch.object(health, 'get_health', return_value={"message": "error"}):
+            self.assertEqual(health.get_channel_health(), {"message": "error"})
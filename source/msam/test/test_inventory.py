@@ -0,0 +1,57 @@
+"""
+This module is provides unit tests for the inventory.py module.
+"""
+
+# pylint: disable=C0415
+
+import unittest
+from unittest.mock import patch
+
+from .config_service import LocalConfigService, RESOURCES
+
+
+@patch('boto3.client')
+@patch('boto3.resource')
+class TestInventory(unittest.TestCase):
+    """
+    This class extends TestCase with testing functions
+    """
+
+    def test_pascal_case(self, patched_resource, patched_client):
+        """
+        Test the pascal_case and tag_map functions
+        """
+        from chalicelib import inventory
+        self.assertEqual(inventory.pascal_case({"a": [{"bC": 1}], "d": "e"}), {"A": [{"BC": 1}], "D": "e"})
+        self.assertEqual(inventory.tag_map([{"key": "k", "value": "v"}]), {"k": "v"})
+        self.assertEqual(inventory.tag_map(None), {})
+
+    def test_select_resources(self, patched_resource, patched_client):
+        """
+        Test the select_resources function
+        """
+        from chalicelib import inventory
+        service = LocalConfigService(RESOURCES, page_size=2)
+        pages = list(inventory.select_resources(service, "aggregator", "SELECT arn WHERE accountId = '111122223333'"))
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        self.assertEqual(service.calls, 3)
+
+    def test_config_nodes(self, patched_resource, patched_client):
+        """
+        Test the config_nodes function
+        """
+        from chalicelib import inventory
+        service = LocalConfigService(RESOURCES, page_size=1)
+        nodes = list(inventory.config_nodes(service, "aggregator", "ec2-instance", "us-west-2"))
+        self.assertEqual(nodes, [("arn:aws:ec2-instance:us-west-2::i-1",
+                                  {"InstanceId": "i-1", "State": {"Name": "running"}, "Tags": {}})])
+        arn, config = next(inventory.config_nodes(service, "aggregator", "s3", "global"))
+        self.assertEqual(arn, "arn:aws:s3:::media-bucket")
+        self.assertEqual(config["Name"], "media-bucket")
+        self.assertEqual(config["Tags"], {"MSAM-Diagram": "Sources"})
+        arn, config = next(inventory.config_nodes(service, "aggregator", "cloudfront-distribution", "global"))
+        self.assertEqual(config["Origins"]["Items"][0]["DomainName"], "origin")
+        self.assertEqual(config["ARN"], arn)
+        arn, config = next(inventory.config_nodes(service, "aggregator", "mediatailor-configuration", "us-west-2"))
+        self.assertEqual(config["PlaybackConfigurationArn"], arn)
+        self.assertEqual(config["VideoContentSourceUrl"], "https://origin")
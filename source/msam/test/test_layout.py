@@ -53,15 +53,32 @@ class TestLayout(unittest.TestCase):
             "x": 875,
             "y": 578
         }]
-        mock_table = MagicMock()
-        mock_table.put_item.return_value = {}
-        patched_resource.return_value.Table.return_value = mock_table
-        layout.set_node_layout(layout_items)
-        layout.DYNAMO_RESOURCE.Table.return_value.put_item.assert_called_once_with(Item=layout_items[0])
+        with patch.object(layout.batch, 'batch_write_items', return_value=[]) as patched_write:
+            # repeated positions for a node are written once, the last one wins
+            moved = dict(layout_items[0], x=900)
+            self.assertEqual(layout.set_node_layout(layout_items + [moved]), {"message": "saved"})
+            patched_write.assert_called_once_with('layout_table', [moved])
+        with patch.object(layout.batch, 'batch_write_items', return_value=[{"PutRequest": {}}]):
+            self.assertIn("exception", layout.set_node_layout(layout_items))
 
-        mock_table.put_item.side_effect = self.CLIENT_ERROR
-        layout.set_node_layout(layout_items)
-        self.assertRaises(ClientError)
+        with patch.object(layout.batch, 'batch_write_items', side_effect=self.CLIENT_ERROR):
+            self.assertIn("exception", layout.set_node_layout(layout_items))
+
+    def test_delete_node_layouts(self, patched_env, patched_resource):
+        """
+        Test the delete_node_layouts function
+        """
+        from chalicelib import layout
+        layout_keys = [{"view": "view_name", "id": "a"}, {"view": "view_name", "id": "b", "x": 1},
+                       {"view": "view_name", "id": "a"}]
+        with patch.object(layout.batch, 'batch_write_items', return_value=[]) as patched_write:
+            self.assertEqual(layout.delete_node_layouts(layout_keys), {"message": "deleted"})
+            patched_write.assert_called_once_with('layout_table', delete_keys=[{"view": "view_name", "id": "a"},
+                                                                               {"view": "view_name", "id": "b"}])
+        with patch.object(layout.batch, 'batch_write_items', return_value=[{"DeleteRequest": {}}]):
+            self.assertIn("exception", layout.delete_node_layouts(layout_keys))
+        with patch.object(layout.batch, 'batch_write_items', side_effect=self.CLIENT_ERROR):
+            self.assertIn("exception", layout.delete_node_layouts(layout_keys))
 
     def test_delete_node_layout(self, patched_env, patched_resource):
         """
@@ -102,10 +119,14 @@ class TestLayout(unittest.TestCase):
         Test the remove_all_diagrams function
         """
         from chalicelib import layout
-        with patch.object(layout.DYNAMO_RESOURCE.Table.return_value, 'scan', return_value={"Items":[{"view":"this_view", "id": "view_id"}]}):
+        with patch.object(layout.DYNAMO_RESOURCE.Table.return_value, 'scan', return_value={"Items":[{"view":"this_view", "id": "view_id"}]}), \
+                patch.object(layout.batch, 'batch_write_items', return_value=[]) as patched_write:
             result = layout.remove_all_diagrams()
-            layout.DYNAMO_RESOURCE.Table.return_value.delete_item.assert_called_once()
+            patched_write.assert_called_once_with('layout_table', delete_keys=[{"view": "this_view", "id": "view_id"}])
             self.assertEqual(result, {'message': 'done'})
+            # deletes left unprocessed are reported
+            patched_write.return_value = [{"DeleteRequest": {"Key": {"view": "this_view", "id": "view_id"}}}]
+            self.assertEqual(layout.remove_all_diagrams(), {"exception": "1 node positions not deleted"})
 
         with patch.object(layout.DYNAMO_RESOURCE.Table.return_value, 'scan', side_effect=ClientError({"Error": {"Code": "400", "Message": "SomeClientError"}}, 'remove_all_diagrams')):
             result = layout.remove_all_diagrams()
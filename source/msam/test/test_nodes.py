@@ -6,7 +6,7 @@ This module provides unit tests for the nodes.py module.
 
 import unittest
 import boto3
-from unittest.mock import patch
+from unittest.mock import patch, MagicMock
 from botocore.exceptions import ClientError
 
 ARN = 'THIS-IS-NOT-AN-ARN'
@@ -21,6 +21,11 @@ class TestNodes(unittest.TestCase):
     This class extends TestCase with testing functions
     """
 
+    def setUp(self):
+        from chalicelib import account
+        # region availability is memoized, clear it for the patched values
+        account.clear()
+
     def test_update_regional_ddb_items(self, patched_env, patched_resource,
                                        patched_client):
         """
@@ -28,7 +33,8 @@ class TestNodes(unittest.TestCase):
         """
         from chalicelib import nodes
         from chalicelib import content
-        nodes.update_regional_ddb_items("us-east-1")
+        with patch.object(content.boto3.session, 'Session'):
+            nodes.update_regional_ddb_items("us-east-1")
         with patch.object(content, 'put_ddb_items', side_effect=CLIENT_ERROR):
             nodes.update_regional_ddb_items("us-east-1")
             self.assertRaises(ClientError)
@@ -40,7 +46,8 @@ class TestNodes(unittest.TestCase):
         """
         from chalicelib import nodes
         from chalicelib import content
-        nodes.update_regional_ssm_ddb_items("us-east-1")
+        with patch.object(content.boto3.session, 'Session'):
+            nodes.update_regional_ssm_ddb_items("us-east-1")
         # test exception
         with patch.object(content, 'put_ddb_items',
                             side_effect=ClientError({"Error": {"Code": "400", "Message": "SomeClientError"}}, "update_regional_ssm_ddb_items")):
@@ -54,13 +61,50 @@ class TestNodes(unittest.TestCase):
         """
         from chalicelib import nodes
         from chalicelib import content
-        nodes.update_global_ddb_items()
+        with patch.object(content.boto3.session, 'Session'):
+            nodes.update_global_ddb_items()
         # test exception
         with patch.object(content, 'put_ddb_items',
                             side_effect=ClientError({"Error": {"Code": "400", "Message": "SomeClientError"}}, "update_global_ddb_items")):
             nodes.update_global_ddb_items()
             self.assertRaises(ClientError)
 
+    def test_discovered_ddb_items(self, patched_env, patched_resource,
+                                  patched_client):
+        """
+        Test the discovered_ddb_items function
+        """
+        from chalicelib import nodes
+        from .config_service import LocalConfigService, RESOURCES
+        describe = MagicMock(return_value=["described"])
+        with patch.object(nodes.msam_settings, 'get_setting', return_value=None):
+            self.assertEqual(nodes.discovered_ddb_items("ec2-instance", "us-west-2", describe, "us-west-2"), ["described"])
+            describe.assert_called_once_with("us-west-2")
+        backends = {"aggregator": "aggregator", "services": {"ec2-instance": "config", "medialive-channel": "config"}}
+        with patch.object(nodes.msam_settings, 'get_setting', return_value=backends), \
+                patch.object(nodes, 'discovery_client', return_value=LocalConfigService(RESOURCES)):
+            items = list(nodes.discovered_ddb_items("ec2-instance", "us-west-2", describe, "us-west-2"))
+            self.assertEqual(len(items), 1)
+            self.assertEqual(items[0]["arn"], "arn:aws:ec2-instance:us-west-2::i-1")
+            self.assertEqual(items[0]["service"], "ec2-instance")
+            self.assertEqual(items[0]["region"], "us-west-2")
+            # services without a Config resource type always use describe calls
+            self.assertEqual(nodes.discovered_ddb_items("medialive-channel", "us-west-2", describe, "us-west-2"),
+                             ["described"])
+        # the instance states and tag keys of describe_instances apply to Config instances too
+        resources = [dict(RESOURCES[1], resourceId=f"i-{state}", configuration={"state": {"name": state}},
+                          tags=[{"key": "Encoder", "value": "yes"}] if state == "stopped" else [])
+                     for state in ("running", "stopped", "terminated")]
+        settings = {nodes.INVENTORY_BACKENDS_SETTING: backends, nodes.EC2_TAG_KEYS_SETTING: None}
+        with patch.object(nodes.msam_settings, 'get_setting', side_effect=settings.get), \
+                patch.object(nodes, 'discovery_client', return_value=LocalConfigService(resources)):
+            items = nodes.discovered_ddb_items("ec2-instance", "us-west-2", describe, "us-west-2")
+            self.assertEqual([item["arn"] for item in items],
+                             ["arn:aws:ec2-instance:us-west-2::i-running", "arn:aws:ec2-instance:us-west-2::i-stopped"])
+            settings[nodes.EC2_TAG_KEYS_SETTING] = ["Encoder"]
+            items = nodes.discovered_ddb_items("ec2-instance", "us-west-2", describe, "us-west-2")
+            self.assertEqual([item["arn"] for item in items], ["arn:aws:ec2-instance:us-west-2::i-stopped"])
+
     def test_s3_bucket_ddb_items(self, patched_env, patched_resource,
                                        patched_client):
         """
@@ -68,7 +112,7 @@ class TestNodes(unittest.TestCase):
         """
         from chalicelib import nodes
         with patch.object(nodes, 's3_buckets', return_value=[{"Name": "mybucket"}]):
-            items = nodes.s3_bucket_ddb_items()
+            items = list(nodes.s3_bucket_ddb_items())
             self.assertEqual(len(items), 1)
 
 
@@ -79,7 +123,7 @@ class TestNodes(unittest.TestCase):
         """
         from chalicelib import nodes
         with patch.object(nodes, 'cloudfront_distributions', return_value=[{"ARN": "some-arn"}]):
-            items = nodes.cloudfront_distribution_ddb_items()
+            items = list(nodes.cloudfront_distribution_ddb_items())
             self.assertEqual(len(items), 1)
 
     def test_medialive_channel_ddb_items(self, patched_env, patched_resource,
@@ -89,7 +133,7 @@ class TestNodes(unittest.TestCase):
         """
         from chalicelib import nodes
         with patch.object(nodes, 'medialive_channels', return_value=[{"Arn": "some-arn"}]):
-            items = nodes.medialive_channel_ddb_items("us-east-1")
+            items = list(nodes.medialive_channel_ddb_items("us-east-1"))
             self.assertEqual(len(items), 1)
 
     def test_medialive_input_ddb_items(self, patched_env, patched_resource,
@@ -99,7 +143,7 @@ class TestNodes(unittest.TestCase):
         """
         from chalicelib import nodes
         with patch.object(nodes, 'medialive_inputs', return_value=[{"Arn": "some-arn"}]):
-            items = nodes.medialive_input_ddb_items("us-east-1")
+            items = list(nodes.medialive_input_ddb_items("us-east-1"))
             self.assertEqual(len(items), 1)
 
     def test_medialive_multiplex_ddb_items(self, patched_env, patched_resource,
@@ -109,7 +153,7 @@ class TestNodes(unittest.TestCase):
         """
         from chalicelib import nodes
         with patch.object(nodes, 'medialive_multiplexes', return_value=[{"Arn": "some-arn"}]):
-            items = nodes.medialive_multiplex_ddb_items("us-east-1")
+            items = list(nodes.medialive_multiplex_ddb_items("us-east-1"))
             self.assertEqual(len(items), 1)
 
     def test_mediapackage_channel_ddb_items(self, patched_env, patched_resource,
@@ -119,7 +163,7 @@ class TestNodes(unittest.TestCase):
         """
         from chalicelib import nodes
         with patch.object(nodes, 'mediapackage_channels', return_value=[{"Arn": "some-arn"}]):
-            items = nodes.mediapackage_channel_ddb_items("us-east-1")
+            items = list(nodes.mediapackage_channel_ddb_items("us-east-1"))
             self.assertEqual(len(items), 1)
 
     def test_mediapackage_origin_endpoint_ddb_items(self, patched_env, patched_resource,
@@ -129,7 +173,7 @@ class TestNodes(unittest.TestCase):
         """
         from chalicelib import nodes
         with patch.object(nodes, 'mediapackage_origin_endpoints', return_value=[{"Arn": "some-arn"}]):
-            items = nodes.mediapackage_origin_endpoint_ddb_items("us-east-1")
+            items = list(nodes.mediapackage_origin_endpoint_ddb_items("us-east-1"))
             self.assertEqual(len(items), 1)
 
     def test_mediastore_container_ddb_items(self, patched_env, patched_resource,
@@ -139,7 +183,7 @@ class TestNodes(unittest.TestCase):
         """
         from chalicelib import nodes
         with patch.object(nodes, 'mediastore_containers', return_value=[{"ARN": "some-arn"}]):
-            items = nodes.mediastore_container_ddb_items("us-east-1")
+            items = list(nodes.mediastore_container_ddb_items("us-east-1"))
             self.assertEqual(len(items), 1)
 
     def test_mediaconnect_flow_ddb_items(self, patched_env, patched_resource,
@@ -149,7 +193,7 @@ class TestNodes(unittest.TestCase):
         """
         from chalicelib import nodes
         with patch.object(nodes, 'mediaconnect_flows', return_value=[{"FlowArn": "some-arn"}]):
-            items = nodes.mediaconnect_flow_ddb_items("us-east-1")
+            items = list(nodes.mediaconnect_flow_ddb_items("us-east-1"))
             self.assertEqual(len(items), 1)
 
 
@@ -160,7 +204,7 @@ class TestNodes(unittest.TestCase):
         """
         from chalicelib import nodes
         with patch.object(nodes, 'mediatailor_configurations', return_value=[{"PlaybackConfigurationArn": "some-arn"}]):
-            items = nodes.mediatailor_configuration_ddb_items("us-east-1")
+            items = list(nodes.mediatailor_configuration_ddb_items("us-east-1"))
             self.assertEqual(len(items), 1)
 
     def test_ssm_managed_instance_ddb_items(self, patched_env, patched_resource,
@@ -169,9 +213,12 @@ class TestNodes(unittest.TestCase):
         Test the ssm_managed_instance_ddb_items function
         """
         from chalicelib import nodes
-        with patch.object(nodes, 'ssm_managed_instances', return_value=[{"Id": "some-arn"}]):
-            items = nodes.ssm_managed_instance_ddb_items("us-east-1")
+        with patch.object(nodes, 'ssm_managed_instances', return_value=[{"Id": "some-arn"}]), \
+                patch.object(nodes.account, 'partition', return_value="aws-cn"), \
+                patch.object(nodes.account, 'account_id', return_value="1234567890"):
+            items = list(nodes.ssm_managed_instance_ddb_items("cn-north-1"))
             self.assertEqual(len(items), 1)
+            self.assertEqual(items[0]["arn"], "arn:aws-cn:ssm-managed-instance:cn-north-1:1234567890:instance/some-arn")
 
     def test_ec2_instance_ddb_items(self, patched_env, patched_resource,
                                        patched_client):
@@ -180,7 +227,7 @@ class TestNodes(unittest.TestCase):
         """
         from chalicelib import nodes
         with patch.object(nodes, 'ec2_instances', return_value=[{"InstanceId": "some-arn"}]):
-            items = nodes.ec2_instance_ddb_items("us-east-1")
+            items = list(nodes.ec2_instance_ddb_items("us-east-1"))
             self.assertEqual(len(items), 1)
 
     def test_link_device_ddb_items(self, patched_env, patched_resource,
@@ -190,9 +237,88 @@ class TestNodes(unittest.TestCase):
         """
         from chalicelib import nodes
         with patch.object(nodes, 'link_devices', return_value=[{"Arn": "some-arn"}]):
-            items = nodes.link_device_ddb_items("us-east-1")
+            items = list(nodes.link_device_ddb_items("us-east-1"))
             self.assertEqual(len(items), 1)
 
+    def test_enrich_items(self, patched_env, patched_resource,
+                          patched_client):
+        """
+        Test the enrich_items function
+        """
+        import time
+        from chalicelib import nodes
+
+        def slow_describe(item):
+            # finish in reverse order to prove the results keep item order
+            time.sleep((5 - item) * 0.01)
+            return {"Id": item}
+
+        items = nodes.enrich_items("s3", "global", slow_describe, range(5))
+        self.assertEqual(items, [{"Id": index} for index in range(5)])
+
+    def test_discovery_client(self, patched_env, patched_resource,
+                              patched_client):
+        """
+        Test the discovery_client function
+        """
+        from chalicelib import nodes
+        with patch.object(nodes.throttle, 'register', side_effect=lambda client, *args: client) as patched_register:
+            nodes.discovery_client("medialive", REGION)
+            patched_client.assert_called_with("medialive", region_name=REGION, config=nodes.MSAM_BOTO3_CONFIG)
+            patched_register.assert_called_with(patched_client.return_value, "medialive", REGION)
+            nodes.discovery_client("s3", "global")
+            patched_client.assert_called_with("s3", config=nodes.MSAM_BOTO3_CONFIG)
+
+    def test_throttle_settings(self, patched_env, patched_resource,
+                               patched_client):
+        """
+        Test the apply_rate_limits and save_throttle_stats functions
+        """
+        from decimal import Decimal
+        from chalicelib import nodes
+        with patch.object(nodes.msam_settings, 'get_setting', return_value={"medialive": 2}), \
+                patch.object(nodes.throttle, 'configure') as patched_configure:
+            nodes.apply_rate_limits()
+            patched_configure.assert_called_once_with({"medialive": 2})
+        stats = {"medialive:us-east-1": {"throttles": 3, "wait_seconds": 1.5, "rate": 2.5, "max_rate": 5}}
+        with patch.object(nodes.msam_settings, 'get_setting', return_value={"s3:global": {"throttles": 0}}), \
+                patch.object(nodes.throttle, 'stats', return_value=stats) as patched_stats, \
+                patch.object(nodes.msam_settings, 'put_setting') as patched_put:
+            nodes.save_throttle_stats()
+            patched_stats.assert_called_once_with(reset=True)
+            saved = patched_put.call_args.args[1]
+            self.assertEqual(patched_put.call_args.args[0], nodes.THROTTLE_STATS_SETTING)
+            self.assertEqual(saved["s3:global"], {"throttles": 0})
+            self.assertEqual(saved["medialive:us-east-1"]["wait_seconds"], Decimal("1.5"))
+            self.assertTrue("updated" in saved["medialive:us-east-1"])
+
+    def test_bulk_resource_tags(self, patched_env, patched_resource,
+                                patched_client):
+        """
+        Test the bulk_resource_tags function
+        """
+        from chalicelib import nodes
+        with patch.object(nodes.msam_settings, 'get_setting', return_value=None):
+            self.assertIsNone(nodes.bulk_resource_tags("s3"))
+        patched_client.return_value.get_resources.side_effect = [
+            {"ResourceTagMappingList": [{"ResourceARN": "arn-1", "Tags": [{"Key": "k", "Value": "v"}]}],
+             "PaginationToken": "token"},
+            {"ResourceTagMappingList": [{"ResourceARN": "arn-2", "Tags": []}], "PaginationToken": ""}]
+        with patch.object(nodes.msam_settings, 'get_setting', return_value=nodes.TAGGING_API_BACKEND):
+            tags = nodes.bulk_resource_tags("cloudfront:distribution", [REGION])
+            self.assertEqual(tags, {"arn-1": {"k": "v"}, "arn-2": {}})
+            patched_client.return_value.get_resources.assert_called_with(
+                ResourceTypeFilters=["cloudfront:distribution"], PaginationToken="token")
+            # enabled regions are searched by default
+            patched_client.return_value.get_resources.side_effect = None
+            patched_client.return_value.get_resources.return_value = {"ResourceTagMappingList": []}
+            with patch.object(nodes.cache, 'regions',
+                              return_value=[{"RegionName": REGION}, {"RegionName": "global"}]):
+                self.assertEqual(nodes.bulk_resource_tags("s3"), {})
+            # errors fall back to per-resource tags
+            patched_client.return_value.get_resources.side_effect = CLIENT_ERROR
+            self.assertIsNone(nodes.bulk_resource_tags("s3", [REGION]))
+
     def test_node_to_ddb_item(self, patched_env, patched_resource,
                                        patched_client):
         """
@@ -213,13 +339,18 @@ class TestNodes(unittest.TestCase):
         from chalicelib import nodes
         patched_client.return_value.list_distributions.return_value = {"DistributionList": {"Items": [{"ARN": ARN, "LastModifiedTime": "time"}]}}
         patched_client.return_value.list_tags_for_resource.return_value = {'Tags': {'Items': [{'Key': 'string', 'Value': 'string'}]}}
-        items = nodes.cloudfront_distributions()
+        items = list(nodes.cloudfront_distributions())
         self.assertEqual(len(items), 1)
 
         patched_client.return_value.list_tags_for_resource.side_effect = CLIENT_ERROR
-        items = nodes.cloudfront_distributions()
+        items = list(nodes.cloudfront_distributions())
         self.assertEqual(len(items), 1)
 
+        with patch.object(nodes, 'bulk_resource_tags', return_value={ARN: {"k": "v"}}) as patched_tags:
+            items = list(nodes.cloudfront_distributions())
+            patched_tags.assert_called_once_with("cloudfront:distribution", ["us-east-1"])
+            self.assertEqual(items[0]["Tags"], {"k": "v"})
+
     def test_s3_buckets(self, patched_env, patched_resource,
                                        patched_client):
         """
@@ -228,13 +359,19 @@ class TestNodes(unittest.TestCase):
         from chalicelib import nodes
         patched_client.return_value.list_buckets.return_value = {"Buckets": [{"Name": "BucketName", "CreationDate": "time"}]}
         patched_client.return_value.get_bucket_tagging.return_value = {'TagSet': [{'Key': 'string', 'Value': 'string'}]}
-        buckets = nodes.s3_buckets()
+        buckets = list(nodes.s3_buckets())
         self.assertEqual(len(buckets), 1)
 
         patched_client.return_value.get_bucket_tagging.side_effect = CLIENT_ERROR
-        buckets = nodes.s3_buckets()
+        buckets = list(nodes.s3_buckets())
         self.assertEqual(len(buckets), 1)
 
+        patched_client.return_value.get_bucket_tagging.reset_mock()
+        with patch.object(nodes, 'bulk_resource_tags', return_value={"arn:aws:s3:::BucketName": {"k": "v"}}):
+            buckets = list(nodes.s3_buckets())
+            self.assertEqual(buckets[0]["Tags"], {"k": "v"})
+            patched_client.return_value.get_bucket_tagging.assert_not_called()
+
     def test_mediapackage_channels(self, patched_env, patched_resource,
                                        patched_client):
         """
@@ -245,7 +382,7 @@ class TestNodes(unittest.TestCase):
         patched_client.return_value.list_channels.side_effect =[{"Channels": ["channelA"], "NextToken": "token"},
                 {"Channels": ["channelA"]}]
         with patch.object(boto3.Session, 'get_available_regions', return_value = [REGION]):
-            items = nodes.mediapackage_channels(REGION)
+            items = list(nodes.mediapackage_channels(REGION))
             self.assertEqual(len(items), 2)
 
     def test_mediapackage_origin_endpoints(self, patched_env, patched_resource,
@@ -258,7 +395,7 @@ class TestNodes(unittest.TestCase):
         patched_client.return_value.list_origin_endpoints.side_effect = [{"OriginEndpoints": ["channelA"], "NextToken": "token"},
         {"OriginEndpoints": ["channelA"]}]
         with patch.object(boto3.Session, 'get_available_regions', return_value = [REGION]):
-            items = nodes.mediapackage_origin_endpoints(REGION)
+            items = list(nodes.mediapackage_origin_endpoints(REGION))
             self.assertEqual(len(items), 2)
 
     def test_medialive_channels(self, patched_env, patched_resource,
@@ -271,7 +408,7 @@ class TestNodes(unittest.TestCase):
         patched_client.return_value.list_channels.side_effect = [{"Channels": ["channelA"], "NextToken": "token"},
             {"Channels": ["channelA"]}]
         with patch.object(boto3.Session, 'get_available_regions', return_value = [REGION]):
-            items = nodes.medialive_channels(REGION)
+            items = list(nodes.medialive_channels(REGION))
             self.assertEqual(len(items), 2)
 
     def test_medialive_inputs(self, patched_env, patched_resource,
@@ -284,7 +421,7 @@ class TestNodes(unittest.TestCase):
         patched_client.return_value.list_inputs.side_effect = [{"Inputs": ["channelA"], "NextToken": "token"},
             {"Inputs": ["channelA"]}]
         with patch.object(boto3.Session, 'get_available_regions', return_value = [REGION]):
-            items = nodes.medialive_inputs(REGION)
+            items = list(nodes.medialive_inputs(REGION))
             self.assertEqual(len(items), 2)
 
     def test_medialive_multiplexes(self, patched_env, patched_resource,
@@ -298,7 +435,7 @@ class TestNodes(unittest.TestCase):
             {"Multiplexes": [{"Id": "channelA"}]}]
         patched_client.return_value.describe_multiplex.side_effect = [{"ResponseMetadata":"data"}, {"ResponseMetadata":"data"}]
         with patch.object(boto3.Session, 'get_available_regions', return_value = [REGION]):
-            items = nodes.medialive_multiplexes(REGION)
+            items = list(nodes.medialive_multiplexes(REGION))
             self.assertEqual(len(items), 2)
 
     def test_mediastore_containers(self, patched_env, patched_resource,
@@ -311,7 +448,7 @@ class TestNodes(unittest.TestCase):
         patched_client.return_value.list_containers.side_effect = [{"Containers": [{"ARN": ARN, "CreationTime": "time"}], "NextToken": "token"},
             {"Containers": [{"ARN": ARN , "CreationTime": "time"}]}]
         with patch.object(boto3.Session, 'get_available_regions', return_value = [REGION]):
-            items = nodes.mediastore_containers(REGION)
+            items = list(nodes.mediastore_containers(REGION))
             self.assertEqual(len(items), 2)
 
     def test_mediaconnect_flows(self, patched_env, patched_resource,
@@ -324,8 +461,22 @@ class TestNodes(unittest.TestCase):
         patched_client.return_value.list_flows.side_effect =  [{"Flows": [{"FlowArn": ARN}], "NextToken": "token"},
             {"Flows": [{"FlowArn": ARN}]}]
         with patch.object(boto3.Session, 'get_available_regions', return_value = [REGION]):
-            items = nodes.mediaconnect_flows(REGION)
+            items = list(nodes.mediaconnect_flows(REGION))
             self.assertEqual(len(items), 2)
+            # flows that cannot be described are skipped
+            patched_client.return_value.list_flows.side_effect = [{"Flows": [{"FlowArn": ARN}]}]
+            patched_client.return_value.describe_flow.side_effect = CLIENT_ERROR
+            self.assertEqual(list(nodes.mediaconnect_flows(REGION)), [])
+            # tags come from the tagging API when it is enabled
+            patched_client.return_value.list_flows.side_effect = [{"Flows": [{"FlowArn": ARN}]}]
+            patched_client.return_value.describe_flow.side_effect = None
+            patched_client.return_value.describe_flow.return_value = {"Flow": {"FlowArn": ARN}}
+            patched_client.return_value.list_tags_for_resource.reset_mock()
+            with patch.object(nodes, 'bulk_resource_tags', return_value={ARN: {"k": "v"}}) as patched_tags:
+                items = list(nodes.mediaconnect_flows(REGION))
+                patched_tags.assert_called_once_with("mediaconnect:flow", [REGION])
+            self.assertEqual(items[0]["Tags"], {"k": "v"})
+            patched_client.return_value.list_tags_for_resource.assert_not_called()
 
     def test_mediatailor_configurations(self, patched_env, patched_resource,
                                        patched_client):
@@ -337,7 +488,7 @@ class TestNodes(unittest.TestCase):
         patched_client.return_value.list_playback_configurations.side_effect =  [{"Items": [{"Name": ARN}], "NextToken": "token"},
             {"Items": [{"Name": ARN}]}]
         with patch.object(boto3.Session, 'get_available_regions', return_value = [REGION]):
-            items = nodes.mediatailor_configurations(REGION)
+            items = list(nodes.mediatailor_configurations(REGION))
             self.assertEqual(len(items), 2)
 
     def test_ssm_managed_instances(self, patched_env, patched_resource,
@@ -347,11 +498,40 @@ class TestNodes(unittest.TestCase):
         """
         from chalicelib import nodes
 
+        patched_client.return_value.get_resources.return_value = {"ResourceTagMappingList": [
+            {"ResourceARN": "arn:aws:ssm:us-west-2:111122223333:managed-instance/mi-instance",
+             "Tags": [{"Key": "MSAM-NodeType", "Value": "ElementalLive"}]}]}
         patched_client.return_value.get_inventory.side_effect =  [{"Entities": [{"Id": "mi-instance"}], "NextToken": "token"},
             {"Entities": [{"Id": "mi-instance"}]}]
         with patch.object(boto3.Session, 'get_available_regions', return_value = [REGION]):
-            items = nodes.ssm_managed_instances(REGION)
+            items = list(nodes.ssm_managed_instances(REGION))
             self.assertEqual(len(items), 2)
+            self.assertEqual(items[0]["Tags"], {"MSAM-NodeType": "ElementalLive"})
+            patched_client.return_value.get_resources.assert_called_once_with(
+                ResourceTypeFilters=["ssm:managed-instance"], TagFilters=[{"Key": "MSAM-NodeType"}])
+            patched_client.return_value.list_tags_for_resource.assert_not_called()
+            # filters are kept on every page and only tagged instances are requested
+            filters = patched_client.return_value.get_inventory.call_args.kwargs["Filters"]
+            self.assertEqual(filters[-1]["Values"], ["mi-instance"])
+            self.assertEqual(patched_client.return_value.get_inventory.call_args.kwargs["NextToken"], "token")
+
+            # no tagged instances from the tagging API, tags are read per instance
+            patched_client.return_value.get_resources.return_value = {"ResourceTagMappingList": []}
+            patched_client.return_value.get_inventory.side_effect = [{"Entities": [{"Id": "mi-instance"}]}]
+            patched_client.return_value.list_tags_for_resource.return_value = {
+                "TagList": [{"Key": "MSAM-NodeType", "Value": "ElementalLive"}]}
+            self.assertEqual([item["Id"] for item in nodes.ssm_managed_instances(REGION)], ["mi-instance"])
+            patched_client.return_value.list_tags_for_resource.assert_called_once_with(
+                ResourceType='ManagedInstance', ResourceId="mi-instance")
+
+            # tags are read per instance when the tagging API fails
+            patched_client.return_value.get_resources.side_effect = CLIENT_ERROR
+            patched_client.return_value.get_inventory.side_effect = [
+                {"Entities": [{"Id": "mi-instance"}, {"Id": "mi-untagged"}]}]
+            patched_client.return_value.list_tags_for_resource.side_effect = [
+                {"TagList": [{"Key": "MSAM-NodeType", "Value": "ElementalLive"}]}, {"TagList": []}]
+            items = list(nodes.ssm_managed_instances(REGION))
+            self.assertEqual([item["Id"] for item in items], ["mi-instance"])
 
     def test_ec2_instances(self, patched_env, patched_resource,
                                        patched_client):
@@ -382,8 +562,25 @@ class TestNodes(unittest.TestCase):
             }]
         }]
         with patch.object(boto3.Session, 'get_available_regions', return_value = [REGION]):
-            items = nodes.ec2_instances(REGION)
+            items = list(nodes.ec2_instances(REGION))
             self.assertEqual(len(items), 2)
+            # filters and page size are kept on every page
+            kwargs = patched_client.return_value.describe_instances.call_args.kwargs
+            self.assertEqual(kwargs["MaxResults"], nodes.EC2_PAGE_SIZE)
+            self.assertEqual(kwargs["NextToken"], "token")
+
+    def test_ec2_filters(self, patched_env, patched_resource,
+                         patched_client):
+        """
+        Test the ec2_filters function
+        """
+        from chalicelib import nodes
+        # all instances are selected unless tag keys are set
+        for setting in (None, [], "MSAM-NodeType"):
+            with patch.object(nodes.msam_settings, 'get_setting', return_value=setting):
+                self.assertEqual(nodes.ec2_filters(), [{"Name": "instance-state-name", "Values": nodes.EC2_INSTANCE_STATES}])
+        with patch.object(nodes.msam_settings, 'get_setting', return_value=["Encoder"]):
+            self.assertEqual(nodes.ec2_filters()[1], {"Name": "tag-key", "Values": ["Encoder"]})
 
     def test_link_devices(self, patched_env, patched_resource,
                                        patched_client):
@@ -395,5 +592,5 @@ class TestNodes(unittest.TestCase):
         patched_client.return_value.list_input_devices.side_effect =  [{"InputDevices": [{"Id": "mi-instance"}], "NextToken": "token"},
             {"InputDevices": [{"Id": "mi-instance"}]}]
         with patch.object(boto3.Session, 'get_available_regions', return_value = [REGION]):
-            items = nodes.link_devices(REGION)
+            items = list(nodes.link_devices(REGION))
             self.assertEqual(len(items), 2)
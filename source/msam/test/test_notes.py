@@ -39,6 +39,19 @@ class TestNotes(unittest.TestCase):
             notes.NOTES_TABLE.scan.assert_called_once()
             self.assertTrue("exception" in result)
 
+    def test_get_resource_notes_batch(self, patched_env, patched_resource,
+                                      patched_client):
+        """
+        Test the get_resource_notes_batch function
+        """
+        from chalicelib import notes
+        with patch.object(notes.batch, 'batch_get_items', return_value=([NOTE], [])) as patched_get:
+            result = notes.get_resource_notes_batch([ARN, ARN])
+            patched_get.assert_called_once_with('notes_table', [{"resource_arn": ARN}])
+            self.assertEqual(result, {ARN: NOTE})
+        with patch.object(notes.batch, 'batch_get_items', side_effect=CLIENT_ERROR):
+            self.assertEqual(notes.get_resource_notes_batch([ARN]), {})
+
     def test_get_resource_notes(self, patched_env, patched_resource,
                               patched_client):
         """
@@ -30,9 +30,16 @@ class TestPeriodic(unittest.TestCase):
         self.assertTrue(result)
         # with actual return values
         with patch.object(cloudwatch, 'all_subscribed_alarms',
-                            return_value=[{'Region': 'us-east-1', 'AlarmName': 'this-alarm'}]):
-            result = periodic.update_alarms()
+                            return_value=[{'Region': 'us-east-1', 'AlarmName': 'this-alarm'}]), \
+                patch.object(periodic.health, 'invalidate_health') as patched_invalidate:
+            with patch.object(cloudwatch, 'update_alarms', return_value=False):
+                result = periodic.update_alarms()
             self.assertTrue(result)
+            # the health rollup is only invalidated when an alarm changes state
+            patched_invalidate.assert_not_called()
+            with patch.object(cloudwatch, 'update_alarms', return_value=True):
+                periodic.update_alarms()
+            patched_invalidate.assert_called_once_with()
         # test with Exception
         with patch.object(cloudwatch, 'all_subscribed_alarms',  
                             side_effect=ClientError({"Error": {"Code": "400", "Message": "SomeClientError"}}, "all_subscribed_alarms")):
@@ -48,8 +55,9 @@ class TestPeriodic(unittest.TestCase):
         Test the update_connections function
         """
         from chalicelib import periodic
-        from chalicelib import connections
-        result = periodic.update_connections()
+        from chalicelib import connections, content
+        with patch.object(content.boto3.session, 'Session'):
+            result = periodic.update_connections()
         self.assertTrue(result)
         with patch.object(connections, 'update_connection_ddb_items', 
                             side_effect=ClientError({"Error": {"Code": "400", "Message": "SomeClientError"}}, "update_connections")):
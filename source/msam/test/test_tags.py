@@ -25,11 +25,16 @@ class TestTags(unittest.TestCase):
         mock_table = MagicMock()
         mock_table.scan.return_value = {"Items": [{"data": data, "arn": "some-arn"}]}
         patched_resource.return_value.Table.return_value = mock_table
-        tags.update_diagrams()
-
-        # diagram exists
-        with patch.object(settings, 'get_setting', return_value = [{"name": "new-diagram", "view_id": "NewDiagram"}]):
+        # placement is covered by the autolayout tests
+        with patch.object(tags.layout, 'has_node', return_value=False), \
+                patch.object(tags.autolayout, 'place_nodes') as patched_place:
             tags.update_diagrams()
+            patched_place.assert_called_once_with("new_diagram", ["some-arn"])
+
+            # diagram exists
+            with patch.object(settings, 'get_setting', return_value = [{"name": "new-diagram", "view_id": "NewDiagram"}]):
+                tags.update_diagrams()
+                patched_place.assert_called_with("NewDiagram", ["some-arn"])
         with patch.object(settings, 'get_setting', 
                     side_effect=ClientError({"Error": {"Code": "400", "Message": "SomeClientError"}}, "get_setting")):
             tags.update_diagrams()
@@ -57,10 +62,11 @@ class TestTags(unittest.TestCase):
         mock_table = MagicMock()
         mock_table.scan.return_value = {"Items": [{"data": data, "arn": "some-arn"}]}
         patched_resource.return_value.Table.return_value = mock_table
-        tags.update_tiles()
-
-        with patch.object(channels, 'get_channel_nodes', return_value = [{"name": "new-tile", "id": "newtile"}]):
+        # tile membership writes are covered by the channels tests
+        with patch.object(channels.batch, 'batch_write_items', return_value=[]):
             tags.update_tiles()
+            with patch.object(channels, 'get_channel_nodes', return_value = [{"name": "new-tile", "id": "newtile"}]):
+                tags.update_tiles()
         with patch.object(channels, 'get_channel_nodes', 
                     side_effect=ClientError({"Error": {"Code": "400", "Message": "SomeClientError"}}, "get_channel_nodes")):
             tags.update_tiles()
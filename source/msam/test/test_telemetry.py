@@ -0,0 +1,84 @@
+"""
+This module is provides unit tests for the telemetry.py module.
+"""
+
+# pylint: disable=C0415
+
+import unittest
+from unittest.mock import patch
+
+from botocore.exceptions import ClientError
+
+CLIENT_ERROR = ClientError({"Error": {"Code": "400", "Message": "SomeClientError"}}, "ClientError")
+
+
+@patch('boto3.client')
+@patch('boto3.resource')
+class TestTelemetry(unittest.TestCase):
+    """
+    This class extends TestCase with testing functions
+    """
+
+    def setUp(self):
+        from chalicelib import telemetry
+        self.records = []
+        self.previous = telemetry.set_sink(self.records.append)
+
+    def tearDown(self):
+        from chalicelib import telemetry
+        telemetry.set_sink(self.previous)
+
+    def test_measure(self, patched_resource, patched_client):
+        """
+        Test the measure function
+        """
+        from chalicelib import telemetry
+        items = [{"arn": "arn-1"}, {"arn": "arn-2"}]
+        with telemetry.measure("medialive-channel", "us-west-2") as measurement:
+            self.assertEqual(list(measurement.count(items)), items)
+            measurement.api_call(event_name="before-call.medialive.ListChannels")
+            measurement.api_response(response=(None, {"Error": {"Code": "ThrottlingException"}}),
+                                     event_name="needs-retry.medialive.ListChannels")
+            measurement.api_response(response=(None, {}), event_name="needs-retry.medialive.ListChannels")
+            # the cache writes are not counted as calls or throttles
+            measurement.api_call(event_name="before-call.dynamodb.BatchWriteItem")
+            measurement.api_response(response=(None, {"Error": {"Code": "ThrottlingException"}}),
+                                     event_name="needs-retry.dynamodb.BatchWriteItem")
+        record = self.records[0]
+        self.assertEqual(record["Operation"], "medialive-channel")
+        self.assertEqual(record["Region"], "us-west-2")
+        self.assertEqual(record["Items"], 2)
+        self.assertEqual(record["BytesWritten"], sum(telemetry.item_bytes(item) for item in items))
+        self.assertEqual(record["ApiCalls"], 1)
+        self.assertEqual(record["Throttles"], 1)
+        self.assertEqual(record["Errors"], 0)
+        metrics = record["_aws"]["CloudWatchMetrics"][0]
+        self.assertEqual(metrics["Namespace"], telemetry.NAMESPACE)
+        self.assertEqual({metric["Name"] for metric in metrics["Metrics"]}, set(telemetry.METRIC_UNITS))
+        # the record is emitted when the block raises
+        with self.assertRaises(ClientError):
+            with telemetry.measure("s3-bucket", "global"):
+                raise CLIENT_ERROR
+        self.assertEqual(self.records[1]["Errors"], 1)
+
+    def test_put_measured(self, patched_resource, patched_client):
+        """
+        Test the put_measured function
+        """
+        from chalicelib import telemetry
+        with patch.object(telemetry.content, 'put_ddb_items', side_effect=list) as patched_put:
+            telemetry.put_measured("link-devices", "us-west-2", lambda: [{"arn": "arn-1"}])
+            patched_put.assert_called_once()
+        self.assertEqual(self.records[0]["Items"], 1)
+
+    def test_connection_matchers(self, patched_resource, patched_client):
+        """
+        Test that every connection matcher is measured
+        """
+        from chalicelib import connections
+        from chalicelib import telemetry
+        with patch.object(telemetry.content, 'put_ddb_items', side_effect=list), \
+                patch.object(connections.cache, 'cached_by_service', return_value=[]):
+            connections.update_connection_ddb_items()
+        self.assertEqual(len(self.records), len(connections.matchers()))
+        self.assertEqual(self.records[0]["Operation"], "medialive_channel_mediapackage_channel")
@@ -0,0 +1,93 @@
+"""
+This module is provides unit tests for the throttle.py module.
+"""
+
+# pylint: disable=C0415
+
+import time
+import unittest
+from unittest.mock import patch, MagicMock
+
+
+@patch('boto3.client')
+@patch('boto3.resource')
+class TestThrottle(unittest.TestCase):
+    """
+    This class extends TestCase with testing functions
+    """
+
+    def tearDown(self):
+        from chalicelib import throttle
+        throttle.TOKEN_BUCKETS.clear()
+        throttle.CONFIGURED_LIMITS.clear()
+
+    def test_token_bucket(self, patched_resource, patched_client):
+        """
+        Test the TokenBucket class
+        """
+        from chalicelib import throttle
+        bucket = throttle.TokenBucket(100)
+        started = time.monotonic()
+        for _ in range(6):
+            bucket.acquire()
+        # one token is available at once, the next five arrive 10 ms apart
+        self.assertGreaterEqual(time.monotonic() - started, 0.045)
+        self.assertGreater(bucket.wait_seconds, 0)
+        self.assertEqual(bucket.concurrency(), throttle.MAX_CONCURRENCY)
+        bucket.throttled()
+        bucket.throttled()
+        self.assertEqual(bucket.throttles, 2)
+        self.assertEqual(bucket.rate, 25)
+        self.assertEqual(bucket.concurrency(), 2)
+        bucket.succeeded()
+        self.assertEqual(bucket.rate, 27)
+        bucket.set_max_rate(10)
+        self.assertEqual(bucket.rate, 10)
+        for _ in range(20):
+            bucket.throttled()
+        self.assertEqual(bucket.rate, throttle.MIN_CALLS_PER_SECOND)
+        self.assertEqual(bucket.concurrency(), 1)
+
+    def test_token_bucket_registry(self, patched_resource, patched_client):
+        """
+        Test the token_bucket and configure functions
+        """
+        from chalicelib import throttle
+        bucket = throttle.token_bucket('medialive', 'us-west-2')
+        self.assertIs(throttle.token_bucket('medialive', 'us-west-2'), bucket)
+        self.assertIsNot(throttle.token_bucket('medialive', 'eu-west-1'), bucket)
+        self.assertEqual(bucket.max_rate, throttle.SERVICE_CALLS_PER_SECOND['medialive'])
+        self.assertEqual(throttle.token_bucket('s3', 'global').max_rate, throttle.CALLS_PER_SECOND)
+        # values that are not numbers are ignored
+        throttle.configure({"medialive": 3, "medialive:eu-west-1": "1.5", "s3": 0, "mediastore": "fast"})
+        self.assertEqual(bucket.max_rate, 3)
+        self.assertEqual(throttle.token_bucket('medialive', 'eu-west-1').max_rate, 1.5)
+        self.assertEqual(throttle.token_bucket('s3', 'global').max_rate, throttle.CALLS_PER_SECOND)
+        self.assertEqual(throttle.token_bucket('mediastore', 'global').max_rate,
+                         throttle.SERVICE_CALLS_PER_SECOND['mediastore'])
+        throttle.configure(None)
+        self.assertEqual(bucket.max_rate, throttle.SERVICE_CALLS_PER_SECOND['medialive'])
+
+    def test_register(self, patched_resource, patched_client):
+        """
+        Test the register and stats functions
+        """
+        from chalicelib import throttle
+        client = MagicMock()
+        self.assertIs(throttle.register(client, 'mediaconnect', 'us-west-2'), client)
+        handlers = {call.args[0]: call.args[1] for call in client.meta.events.register.call_args_list}
+        self.assertNotIn("before-call", handlers)
+        handlers["before-send"]()
+        handlers["needs-retry"](response=(None, {"Error": {"Code": "TooManyRequestsException"}}))
+        handlers["needs-retry"](response=(None, {"Error": {"Code": "NotFoundException"}}))
+        handlers["needs-retry"](response=None)
+        # failed calls do not move the rate back up
+        handlers["after-call"](http_response=MagicMock(status_code=429), parsed={})
+        handlers["after-call"](http_response=MagicMock(status_code=200), parsed={"Error": {"Code": "Throttling"}})
+        self.assertEqual(throttle.stats()["mediaconnect:us-west-2"]["rate"], 5)
+        handlers["after-call"](http_response=MagicMock(status_code=200), parsed={})
+        stats = throttle.stats(reset=True)["mediaconnect:us-west-2"]
+        self.assertEqual(stats["throttles"], 1)
+        self.assertEqual(stats["rate"], 5.2)
+        self.assertEqual(stats["max_rate"], 10)
+        self.assertEqual(throttle.stats()["mediaconnect:us-west-2"]["throttles"], 0)